@@ -0,0 +1,69 @@
+"""Sequential vs async fan-out of user lookups.
+
+Runs against a local stand-in table whose get_item sleeps for a fixed
+latency, so the numbers show how much of the per-call latency the async API
+overlaps rather than the speed of any real endpoint.
+
+    python -m benchmarks.aio_fanout --calls 50 --latency 0.01
+"""
+import argparse, asyncio, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lambdas.refactor_db import codec, user
+from lambdas.refactor_db.aio import user as aio_user
+
+ORG_ID = 'ORG-benchmark'
+
+class LatencyClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_item(self, TableName: str, Key: dict, **kwargs):
+        time.sleep(self.latency)
+        return {'Item': codec.encode_item({
+            'hashKey': Key['hashKey']['S'],
+            'rangeKey': Key['rangeKey']['S'],
+            'orgId': Key['hashKey']['S'],
+            'userId': Key['rangeKey']['S'],
+            'email': f"{Key['rangeKey']['S']}@example.com",
+            'createdAt': 0,
+        })}
+
+class LatencyTable:
+    table_name = 'benchmark'
+
+    def __init__(self, latency: float):
+        self.low_level_client = LatencyClient(latency)
+
+def sequential(table: LatencyTable, userIds: list[str]):
+    return [user.find(table, ORG_ID, userId, consistent=True) for userId in userIds]
+
+async def fan_out(table: LatencyTable, userIds: list[str]):
+    return await asyncio.gather(*[aio_user.find(table, ORG_ID, userId, consistent=True) for userId in userIds])
+
+def timed(func: callable, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.01, help="seconds per stand-in get_item")
+    args = parser.parse_args(argv)
+
+    table = LatencyTable(args.latency)
+    userIds = [f'USER-{i}' for i in range(args.calls)]
+
+    expected, sequential_time = timed(sequential, table, userIds)
+    result, async_time = timed(asyncio.run, fan_out(table, userIds))
+    assert result == expected
+
+    print(f"calls: {args.calls}, latency: {args.latency * 1000:.1f}ms")
+    print(f"sequential: {sequential_time * 1000:8.1f}ms")
+    print(f"async:      {async_time * 1000:8.1f}ms")
+    print(f"speedup:    {sequential_time / async_time:8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Cold-start budget for the user Lambda.
+
+Measures, in fresh interpreters, how long `import lambdas.user` takes and
+how long the first invocation takes after it. The first invocation runs the
+`cache_stats` action, which creates the DynamoDB resource (importing boto3)
+without calling the network. Exits 1 when the median of either number is
+over its budget.
+
+    python -m benchmarks.cold_start --runs 5 --import-budget-ms 150 --invoke-budget-ms 1500
+"""
+import argparse, json, os, statistics, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 150
+INVOKE_BUDGET_MS = 1500
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import lambdas.user
+imported = time.perf_counter()
+lambdas.user.handler({'action': 'cache_stats'}, {})
+invoked = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'invoke_ms': (invoked - imported) * 1000,
+}))
+"""
+
+def measure():
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    env.setdefault('AWS_REGION', 'us-east-1')
+    env.setdefault('TABLE_NAME', 'REFACTOR_TABLE')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--invoke-budget-ms', type=float, default=INVOKE_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.runs)]
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    invoke_ms = statistics.median(run['invoke_ms'] for run in runs)
+
+    print(f"runs: {args.runs}")
+    print(f"import:           {import_ms:8.1f}ms (budget {args.import_budget_ms:.0f}ms)")
+    print(f"first invocation: {invoke_ms:8.1f}ms (budget {args.invoke_budget_ms:.0f}ms)")
+
+    over = import_ms > args.import_budget_ms or invoke_ms > args.invoke_budget_ms
+    if over:
+        print("over budget")
+
+    return 1 if over else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""Load test the user handler with a weighted mix of fixture events.
+
+The event fixtures in tests/events/user are templates: each request takes
+one, fills in ids and emails of users the generator created (so adds never
+collide and deletes, restores and destroys find users in the right state)
+and runs it through `lambdas.user.handler`. Requests run either back to back
+on --concurrency threads, or arrive at a fixed --rate and are timed from
+when they should have started, so a backlog shows up as latency.
+
+Runs against a MemoryTable with a simulated per-call latency by default;
+--live uses the TABLE_NAME table and removes the orgs it seeded afterwards.
+
+    python -m benchmarks.load --concurrency 16 --duration 30
+    python -m benchmarks.load --rate 200 --mix find=60,update=20,add=20
+"""
+import argparse, contextlib, copy, glob, itertools, json, os, random, statistics, sys, threading, time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lambdas.user import handler
+from lambdas.refactor_db import cache, connection, id, org, user
+from lambdas.refactor_db.memory import MemoryTable
+
+EVENTS_DIR = os.path.join(ROOT, 'tests', 'events', 'user')
+
+# fixture name -> weight; mostly reads, like the production traffic
+DEFAULT_MIX = {
+    'find': 40,
+    'find-fields': 10,
+    'find-by-email': 15,
+    'find-many': 5,
+    'find-all-page': 5,
+    'find-all': 1,
+    'add': 8,
+    'update': 10,
+    'delete': 3,
+    'restore': 2,
+    'destroy': 1,
+}
+
+# actions the generator knows how to fill in
+ACTIONS = {'warmup', 'cache_stats', 'add', 'batch_add', 'find', 'find_many', 'find_by_email', 'find_all',
+           'update', 'delete', 'restore', 'destroy', 'force_destroy'}
+
+def load_templates(directory: str = EVENTS_DIR):
+    """Fixture name -> event, for every fixture with an action the generator supports."""
+    templates = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path) as f:
+            event = json.load(f)
+        if isinstance(event, dict) and event.get('action') in ACTIONS:
+            templates[os.path.splitext(os.path.basename(path))[0]] = event
+
+    return templates
+
+def parse_mix(text: str | None, templates: dict):
+    if not text:
+        mix = {name: weight for name, weight in DEFAULT_MIX.items() if name in templates}
+    else:
+        mix = {}
+        for part in text.split(','):
+            name, _, weight = part.partition('=')
+            mix[name.strip()] = float(weight or 1)
+
+    unknown = sorted(set(mix) - set(templates))
+    if unknown:
+        raise Exception(f"Error: no event fixture for: {', '.join(unknown)} (have: {', '.join(sorted(templates))})")
+
+    return mix
+
+class Pool:
+    """The users the generator has made, by state, shared by every worker.
+
+    A user being updated, deleted, restored or destroyed is taken out of the
+    pool until its request finishes, so no two writes race on one user.
+    Reads pick any live user.
+    """
+
+    def __init__(self, orgIds: list[str], seed: int | None = None):
+        self.orgIds = orgIds
+        self.run = uuid4().hex[:8]
+        self._counter = itertools.count()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # state -> orgId -> users
+        self._users = {'live': defaultdict(list), 'deleted': defaultdict(list)}
+
+    def new_user(self, orgId: str | None = None):
+        n = next(self._counter)
+        return {'orgId': orgId or self.org(), 'userId': f'USER-load-{self.run}-{n}', 'email': f'load-{self.run}-{n}@example.com'}
+
+    def new_email(self):
+        return f'load-{self.run}-{next(self._counter)}@example.com'
+
+    def put(self, state: str, item: dict):
+        with self._lock:
+            self._users[state][item['orgId']].append(item)
+
+    def _orgs(self, state: str, count: int = 1):
+        return [orgId for orgId, users in self._users[state].items() if len(users) >= count]
+
+    def pick(self, count: int = 1):
+        """`count` live users of one org, left in the pool; None if no org has that many."""
+        with self._lock:
+            orgs = self._orgs('live', count)
+            if not orgs:
+                return None
+            return self._random.sample(self._users['live'][self._random.choice(orgs)], count)
+
+    def take(self, state: str):
+        """Remove and return a random user in `state`; None if there is none."""
+        with self._lock:
+            orgs = self._orgs(state)
+            if not orgs:
+                return None
+            users = self._users[state][self._random.choice(orgs)]
+            i = self._random.randrange(len(users))
+            users[i], users[-1] = users[-1], users[i]
+            return users.pop()
+
+    def org(self):
+        with self._lock:
+            return self._random.choice(self.orgIds)
+
+def synthesize(templates: dict, name: str, pool: Pool):
+    """Fill in the `name` template for the pool's current users.
+
+    Returns (label, event, done) where done(ok) puts the users the event
+    took back in the pool. When the pool has no user in the state the event
+    needs, an `add` is made instead.
+    """
+    event = copy.deepcopy(templates[name])
+
+    def done(ok):
+        pass
+
+    match event['action']:
+        case 'add':
+            item = pool.new_user()
+            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
+                # keep a fixture's deliberately invalid org, e.g. add-bad-org
+                item['orgId'] = event['orgId']
+            event.update(item)
+
+            def done(ok):
+                if ok:
+                    pool.put('live', item)
+        case 'batch_add':
+            orgId = pool.org()
+            items = [pool.new_user(orgId) for _ in event['users']]
+            event['orgId'] = orgId
+            event['users'] = [{**template, 'userId': item['userId'], 'email': item['email']} for template, item in zip(event['users'], items)]
+
+            def done(ok):
+                if ok:
+                    for item in items:
+                        pool.put('live', item)
+        case 'find' | 'find_by_email' | 'find_many':
+            users = pool.pick(len(event.get('userIds', [None])))
+            if users is None:
+                return synthesize(templates, 'add', pool) if 'add' in templates else (name, {'action': 'cache_stats'}, done)
+            event['orgId'] = users[0]['orgId']
+            if 'userId' in event:
+                event['userId'] = users[0]['userId']
+            if 'userIds' in event:
+                event['userIds'] = [item['userId'] for item in users]
+            if 'email' in event:
+                event['email'] = users[0]['email']
+            if event['action'] == 'find_by_email':
+                del event['orgId']
+        case 'find_all':
+            event['orgId'] = pool.org()
+        case 'update' | 'delete' | 'restore' | 'destroy' | 'force_destroy':
+            state = 'deleted' if event['action'] in ('restore', 'destroy') else 'live'
+            item = pool.take(state)
+            if item is None:
+                return synthesize(templates, 'add', pool) if 'add' in templates else (name, {'action': 'cache_stats'}, done)
+            event['orgId'] = item['orgId']
+            event['userId'] = item['userId']
+
+            after = {'update': 'live', 'delete': 'deleted', 'restore': 'live'}.get(event['action'])
+            updated = item
+            if event['action'] == 'update':
+                # update writes the whole user; a template email means an email change
+                updated = {**item, 'email': pool.new_email() if 'email' in event else item['email']}
+                event['email'] = updated['email']
+                event.setdefault('username', 'LoadTest')
+
+            def done(ok):
+                if not ok:
+                    pool.put(state, item)
+                elif after is not None:
+                    pool.put(after, updated)
+
+    return name, event, done
+
+def _invoke(event: dict):
+    started = time.perf_counter()
+    try:
+        response = handler(event, None)
+        error = None if response['statusCode'] == 200 else json.loads(response['body']).get('error', response['body'])
+    except Exception as e:
+        error = str(e)
+
+    return time.perf_counter() - started, error
+
+def seed(table: any, users: int, pool: Pool):
+    for orgId in pool.orgIds:
+        org.add(table, {'orgId': orgId, 'name': 'load test'})
+        items = [pool.new_user(orgId) for _ in range(users)]
+        for start in range(0, len(items), 1000):
+            user.batch_add(table, [{**item, 'username': 'LoadTest'} for item in items[start:start + 1000]])
+        for item in items:
+            pool.put('live', item)
+
+def run(table: any, mix: dict, templates: dict | None = None, concurrency: int = 8, rate: float | None = None,
+        duration: float = 10.0, requests: int | None = None, orgs: int = 2, users: int = 100,
+        seed_value: int | None = None, quiet: bool = True):
+    """Seed `orgs` orgs of `users` users, run the mix, and return the raw samples.
+
+    Samples are (label, finished, latency, error) with `finished` in seconds
+    since the start of the run.
+    """
+    templates = templates or load_templates()
+    pool = Pool([f'ORG-load-{uuid4().hex[:8]}-{i}' for i in range(orgs)], seed_value)
+    seed(table, users, pool)
+    cache.users.clear()
+    cache.emails.clear()
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    chooser = random.Random(seed_value)
+    choose_lock = threading.Lock()
+    samples = []
+    issued = itertools.count()
+
+    def next_request():
+        if requests is not None and next(issued) >= requests:
+            return None
+        with choose_lock:
+            name = chooser.choices(names, weights)[0]
+        return synthesize(templates, name, pool)
+
+    def execute(request, scheduled):
+        label, event, done = request
+        latency, error = _invoke(event)
+        done(error is None)
+        finished = time.perf_counter()
+        # in --rate mode latency counts from when the request should have started
+        if scheduled is not None:
+            latency = finished - scheduled
+        samples.append((label, finished - started, latency, error))
+
+    with contextlib.ExitStack() as stack:
+        # refactor_db prints every failed condition; keep them out of the report
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+
+        started = time.perf_counter()
+        deadline = started + duration
+
+        if rate is None:
+            def worker():
+                while time.perf_counter() < deadline:
+                    request = next_request()
+                    if request is None:
+                        return
+                    execute(request, None)
+
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for i in itertools.count():
+                    scheduled = started + i / rate
+                    if scheduled >= deadline:
+                        break
+                    time.sleep(max(0.0, scheduled - time.perf_counter()))
+                    request = next_request()
+                    if request is None:
+                        break
+                    executor.submit(execute, request, scheduled)
+
+        elapsed = time.perf_counter() - started
+
+    return {'samples': samples, 'elapsed': elapsed, 'orgIds': pool.orgIds}
+
+def _percentile(values: list[float], p: float):
+    # nearest rank on sorted values
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+def _latencies(samples: list):
+    values = sorted(latency * 1000 for _, _, latency, _ in samples)
+    return {
+        'p50_ms': round(_percentile(values, 50), 3),
+        'p95_ms': round(_percentile(values, 95), 3),
+        'p99_ms': round(_percentile(values, 99), 3),
+        'mean_ms': round(statistics.fmean(values), 3),
+    }
+
+def summarize(result: dict, interval: float = 1.0):
+    samples = result['samples']
+    by_label = defaultdict(list)
+    for sample in samples:
+        by_label[sample[0]].append(sample)
+
+    actions = {}
+    for label, group in sorted(by_label.items()):
+        errors = Counter(error for *_, error in group if error is not None)
+        actions[label] = {
+            'requests': len(group),
+            'errors': sum(errors.values()),
+            'error_rate': round(sum(errors.values()) / len(group), 4),
+            **_latencies(group),
+            'top_errors': errors.most_common(3),
+        }
+
+    buckets = defaultdict(list)
+    for sample in samples:
+        buckets[int(sample[1] // interval)].append(sample)
+    timeline = [
+        {
+            'start': round(bucket * interval, 3),
+            'requests': len(group),
+            'errors': sum(1 for *_, error in group if error is not None),
+            'throughput': round(len(group) / interval, 1),
+            **_latencies(group),
+        }
+        for bucket, group in sorted(buckets.items())
+    ]
+
+    errors = sum(action['errors'] for action in actions.values())
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'elapsed': round(result['elapsed'], 3),
+        'throughput': round(len(samples) / result['elapsed'], 1) if result['elapsed'] else 0.0,
+        **(_latencies(samples) if samples else {}),
+        'actions': actions,
+        'timeline': timeline,
+    }
+
+def _print(summary: dict):
+    print(f"{'action':<16} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, action in summary['actions'].items():
+        print(f"{label:<16} {action['requests']:>9} {action['error_rate']:>7.2%} "
+              f"{action['p50_ms']:>9.2f} {action['p95_ms']:>9.2f} {action['p99_ms']:>9.2f}")
+        for error, count in action['top_errors']:
+            print(f"    {count} x {error[:100]}")
+
+    print(f"\n{'second':>8} {'req/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for bucket in summary['timeline']:
+        print(f"{bucket['start']:>8.1f} {bucket['throughput']:>9.1f} {bucket['errors']:>7} "
+              f"{bucket['p50_ms']:>9.2f} {bucket['p95_ms']:>9.2f}")
+
+    print(f"\n{summary['requests']} requests in {summary['elapsed']:.1f}s: {summary['throughput']:.1f} req/s, "
+          f"{summary['error_rate']:.2%} errors, p50 {summary.get('p50_ms', 0):.2f}ms, "
+          f"p95 {summary.get('p95_ms', 0):.2f}ms, p99 {summary.get('p99_ms', 0):.2f}ms")
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', help="comma separated fixture=weight, e.g. find=60,update=20,add=20")
+    parser.add_argument('--concurrency', type=int, default=8, help="worker threads")
+    parser.add_argument('--rate', type=float, help="requests per second; back to back when not given")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run for")
+    parser.add_argument('--requests', type=int, help="stop after this many requests")
+    parser.add_argument('--orgs', type=int, default=2, help="orgs to seed")
+    parser.add_argument('--users', type=int, default=100, help="users to seed per org")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds per timeline row")
+    parser.add_argument('--latency', type=float, default=0.005, help="simulated seconds per DynamoDB call")
+    parser.add_argument('--jitter', type=float, default=0.002, help="simulated extra seconds per call, up to")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of simulated calls throttled")
+    parser.add_argument('--seed', type=int, help="random seed for the mix and the users it picks")
+    parser.add_argument('--live', action='store_true', help="use the TABLE_NAME table instead of a MemoryTable")
+    parser.add_argument('--keep', action='store_true', help="with --live, keep the seeded orgs")
+    parser.add_argument('--output', help="write the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    templates = load_templates()
+    mix = parse_mix(args.mix, templates)
+
+    if args.live:
+        table = connection.table()
+    else:
+        os.environ.setdefault('TABLE_NAME', 'REFACTOR_TABLE')
+        table = connection.register(MemoryTable(os.environ['TABLE_NAME'], latency=args.latency, jitter=args.jitter,
+                                                throttle_rate=args.throttle_rate, seed=args.seed))
+
+    result = run(table, mix, templates, args.concurrency, args.rate, args.duration, args.requests,
+                 args.orgs, args.users, args.seed)
+    summary = summarize(result, args.interval)
+    _print(summary)
+
+    if args.live and not args.keep:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            for orgId in result['orgIds']:
+                org.destroy(table, orgId, force=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({**vars(args), 'mix': mix, **summary}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Per-operation benchmarks for refactor_db.user and refactor_db.org.
+
+Every public function runs against a MemoryTable seeded with each of the
+requested org sizes. For each call we record wall time, Python CPU time,
+round trips (DynamoDB calls) and the capacity units DynamoDB would bill,
+plus peak allocations from a separate tracemalloc pass. Results are written
+as JSON so runs can be compared between commits.
+
+    python -m benchmarks.operations --users 1,1000 --repeat 50 --output before.json
+    python -m benchmarks.operations --users 1,1000 --repeat 50 --baseline before.json
+"""
+import argparse, json, os, platform, statistics, subprocess, sys, time, tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lambdas.refactor_db import cache, org, user
+from lambdas.refactor_db.memory import MemoryTable
+
+ORG_ID = 'ORG-benchmark'
+SEED_CHUNK = 1000
+# tracemalloc slows calls down, so allocations come from a few extra calls
+ALLOCATION_REPEAT = 5
+
+class Context:
+    """The seeded table plus counters for the unique ids cases need."""
+
+    def __init__(self, table: MemoryTable, users: int):
+        self.table = table
+        self.users = users
+        self.userIds = [f'USER-benchmark-{i}' for i in range(users)]
+        self.counter = 0
+        self.org_deleted = False
+
+    def unique(self, prefix: str):
+        self.counter += 1
+        return f'{prefix}-benchmark-new-{self.counter}'
+
+    def new_user(self, orgId: str = ORG_ID):
+        userId = self.unique('USER')
+        return {'orgId': orgId, 'userId': userId, 'email': f'{userId.lower()}@example.com', 'username': 'benchmark'}
+
+    def pick(self, i: int):
+        return self.userIds[i % self.users]
+
+def _user(userId: str, orgId: str = ORG_ID):
+    return {'orgId': orgId, 'userId': userId, 'email': f'{userId.lower()}@example.com', 'username': 'benchmark'}
+
+def seed(table: MemoryTable, users: int, orgId: str = ORG_ID):
+    org.add(table, {'orgId': orgId, 'name': 'benchmark'})
+    userIds = [f'USER-benchmark-{i}' for i in range(users)]
+    for start in range(0, users, SEED_CHUNK):
+        user.batch_add(table, [_user(userId, orgId) for userId in userIds[start:start + SEED_CHUNK]])
+
+def _org(ctx: Context, deleted: bool):
+    # put ORG_ID in the state the timed call starts from; the call flips it
+    if ctx.org_deleted != deleted:
+        if deleted:
+            org.delete(ctx.table, {'orgId': ORG_ID})
+        else:
+            org.restore(ctx.table, ORG_ID)
+
+    ctx.org_deleted = not deleted
+    return ORG_ID
+
+def _deleted_org(ctx: Context):
+    orgId = ctx.unique('ORG')
+    seed(ctx.table, ctx.users, orgId)
+    org.delete(ctx.table, {'orgId': orgId})
+    return orgId
+
+def _deleted_user(ctx: Context):
+    item = ctx.new_user()
+    user.add(ctx.table, item)
+    user.delete(ctx.table, item)
+    return item
+
+# name -> (setup(ctx, i) returning the call's arguments, function, org wide)
+# Org wide cases read or write every user in the org, and run --heavy-repeat
+# times instead of --repeat. Cases run in this order; org cases leave ORG_ID restored.
+CASES = {
+    'user.add': (lambda ctx, i: (ctx.table, ctx.new_user()), user.add, False),
+    'user.find': (lambda ctx, i: (cache.users.clear(), (ctx.table, ORG_ID, ctx.pick(i)))[1], user.find, False),
+    'user.find (cached)': (lambda ctx, i: (ctx.table, ORG_ID, ctx.pick(0)), user.find, False),
+    'user.find (consistent)': (lambda ctx, i: (ctx.table, ORG_ID, ctx.pick(i), False, None, True), user.find, False),
+    'user.find_many (25)': (lambda ctx, i: (ctx.table, ORG_ID, [ctx.pick(i + j) for j in range(25)]), user.find_many, False),
+    'user.find_by_email': (lambda ctx, i: (cache.users.clear(), cache.emails.clear(), (ctx.table, f'{ctx.pick(i).lower()}@example.com'))[2], user.find_by_email, False),
+    'user.find_by_email (consistent)': (lambda ctx, i: (ctx.table, f'{ctx.pick(i).lower()}@example.com', False, None, True), user.find_by_email, False),
+    'user.find_page (100)': (lambda ctx, i: (ctx.table, ORG_ID, 100), user.find_page, False),
+    'user.find_all': (lambda ctx, i: (ctx.table, ORG_ID), user.find_all, True),
+    'user.update': (lambda ctx, i: (ctx.table, {**_user(ctx.pick(i)), 'username': f'updated {i}'}), user.update, False),
+    'user.update (new email)': (lambda ctx, i: (ctx.table, {**_user(ctx.pick(i)), 'email': f'{ctx.unique("email")}@example.com'}), user.update, False),
+    'user.delete': (lambda ctx, i: (ctx.table, _user(ctx.pick(i))), user.delete, False),
+    'user.restore': (lambda ctx, i: (ctx.table, ORG_ID, ctx.pick(i)), user.restore, False),
+    'user.destroy': (lambda ctx, i: (ctx.table, ORG_ID, _deleted_user(ctx)['userId']), user.destroy, False),
+    'org.add': (lambda ctx, i: (ctx.table, {'orgId': ctx.unique('ORG'), 'name': 'benchmark'}), org.add, False),
+    'org.find': (lambda ctx, i: (ctx.table, ORG_ID), org.find, False),
+    'org.find_all': (lambda ctx, i: (ctx.table, ORG_ID), org.find_all, False),
+    'org.update': (lambda ctx, i: (ctx.table, {'orgId': ORG_ID, 'orgName': f'benchmark {i}'}), org.update, False),
+    'org.delete': (lambda ctx, i: (ctx.table, {'orgId': _org(ctx, False)}), org.delete, True),
+    'org.restore': (lambda ctx, i: (ctx.table, _org(ctx, True)), org.restore, True),
+    'org.destroy': (lambda ctx, i: (ctx.table, _deleted_org(ctx)), org.destroy, True),
+}
+
+def _call(ctx: Context, setup: callable, func: callable, i: int):
+    args = setup(ctx, i)
+    calls = sum(ctx.table.calls.values())
+    capacity = dict(ctx.table.capacity)
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func(*args)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    if isinstance(result, dict) and 'error' in result:
+        raise Exception(f"{func.__module__}.{func.__name__} failed: {result['error']}")
+
+    return {
+        'wall': wall,
+        'cpu': cpu,
+        'round_trips': sum(ctx.table.calls.values()) - calls,
+        'rcu': ctx.table.capacity['read'] - capacity.get('read', 0),
+        'wcu': ctx.table.capacity['write'] - capacity.get('write', 0),
+    }
+
+def _allocations(ctx: Context, setup: callable, func: callable, i: int):
+    args = setup(ctx, i)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+def _summary(values: list[float], scale: float = 1.0):
+    values = sorted(v * scale for v in values)
+    return {
+        'mean': round(statistics.fmean(values), 4),
+        'p50': round(values[len(values) // 2], 4),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+        'min': round(values[0], 4),
+    }
+
+def run_case(ctx: Context, name: str, repeat: int):
+    setup, func, _ = CASES[name]
+    samples = [_call(ctx, setup, func, i) for i in range(repeat)]
+    allocations = [_allocations(ctx, setup, func, repeat + i) for i in range(min(repeat, ALLOCATION_REPEAT))]
+
+    return {
+        'function': name,
+        'users': ctx.users,
+        'calls': repeat,
+        'wall_ms': _summary([s['wall'] for s in samples], 1000),
+        'cpu_ms': _summary([s['cpu'] for s in samples], 1000),
+        'alloc_peak_kb': round(statistics.fmean(allocations) / 1024, 1),
+        'round_trips': round(statistics.fmean(s['round_trips'] for s in samples), 2),
+        'rcu': round(statistics.fmean(s['rcu'] for s in samples), 2),
+        'wcu': round(statistics.fmean(s['wcu'] for s in samples), 2),
+    }
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run(sizes: list[int], repeat: int, heavy_repeat: int, latency: float = 0.0, only: str | None = None, verbose: bool = True):
+    results = []
+    for users in sizes:
+        table = MemoryTable(latency=latency)
+        cache.users.clear()
+        cache.emails.clear()
+        started = time.perf_counter()
+        seed(table, users)
+        if verbose:
+            print(f"seeded {users} users in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        ctx = Context(table, users)
+        for name, (_, _, org_wide) in CASES.items():
+            if only and only not in name:
+                continue
+            result = run_case(ctx, name, heavy_repeat if org_wide else repeat)
+            results.append(result)
+            if verbose:
+                print(_line(result), file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'latency': latency,
+            'repeat': repeat,
+            'heavy_repeat': heavy_repeat,
+        },
+        'results': results,
+    }
+
+def _line(result: dict, baseline: dict | None = None):
+    line = (
+        f"{result['function']:<34} {result['users']:>7} users "
+        f"wall {result['wall_ms']['p50']:9.3f}ms  cpu {result['cpu_ms']['p50']:9.3f}ms  "
+        f"alloc {result['alloc_peak_kb']:9.1f}KB  trips {result['round_trips']:6.2f}  "
+        f"rcu {result['rcu']:8.2f}  wcu {result['wcu']:7.2f}"
+    )
+    if baseline:
+        line += f"  wall x{result['wall_ms']['p50'] / max(baseline['wall_ms']['p50'], 1e-9):.2f}"
+    return line
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', default='1,1000', help="comma separated users per org, e.g. 1,1000,100000")
+    parser.add_argument('--repeat', type=int, default=20, help="calls per function")
+    parser.add_argument('--heavy-repeat', type=int, default=3, help="calls per org wide function (find_all, org cascades)")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated seconds per DynamoDB call")
+    parser.add_argument('--only', help="only run functions whose name contains this")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare with the results in this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.users.split(',')]
+    report = run(sizes, args.repeat, args.heavy_repeat, args.latency, args.only, verbose=not args.baseline)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r['function'], r['users']): r for r in json.load(f)['results']}
+        for result in report['results']:
+            print(_line(result, baseline.get((result['function'], result['users']))))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
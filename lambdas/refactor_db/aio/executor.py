@@ -0,0 +1,54 @@
+import asyncio, functools, os, weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# Max blocking DynamoDB calls the async API runs at once, per event loop.
+# Keep it at or below DDB_MAX_POOL_CONNECTIONS so calls do not queue for a
+# pooled connection.
+MAX_CONCURRENCY = int(os.environ.get('DDB_ASYNC_CONCURRENCY', 32))
+
+_executor = None
+_semaphores = weakref.WeakKeyDictionary()
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='refactor-db-aio')
+
+    return _executor
+
+def _semaphore():
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    return _semaphores[loop]
+
+async def run(func: callable, *args, **kwargs):
+    """Run a blocking `refactor_db` function on the shared executor."""
+    async with _semaphore():
+        return await asyncio.get_running_loop().run_in_executor(executor(), functools.partial(func, *args, **kwargs))
+
+async def iterate(func: callable, *args, **kwargs):
+    """Drive a blocking generator function on the executor, one item at a time."""
+    iterator = await run(func, *args, **kwargs)
+    done = object()
+    while True:
+        item = await run(next, iterator, done)
+        if item is done:
+            return
+
+        yield item
+
+def wrap(func: callable):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+
+    return wrapper
+
+def wrap_generator(func: callable):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return iterate(func, *args, **kwargs)
+
+    return wrapper
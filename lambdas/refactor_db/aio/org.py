@@ -0,0 +1,18 @@
+from .. import org
+from .executor import wrap, wrap_generator
+
+# Async counterparts of refactor_db.org, with the same arguments and return
+# values. Independent calls overlap when awaited together, e.g. with
+# asyncio.gather.
+
+OBJECT_TYPE = org.OBJECT_TYPE
+
+add = wrap(org.add)
+delete = wrap(org.delete)
+restore = wrap(org.restore)
+destroy = wrap(org.destroy)
+update = wrap(org.update)
+find_pages = wrap_generator(org.find_pages)
+find_page = wrap(org.find_page)
+find_all = wrap(org.find_all)
+find = wrap(org.find)
@@ -0,0 +1,21 @@
+from .. import user
+from .executor import wrap, wrap_generator
+
+# Async counterparts of refactor_db.user, with the same arguments and return
+# values. Independent calls overlap when awaited together, e.g. with
+# asyncio.gather.
+
+OBJECT_TYPE = user.OBJECT_TYPE
+
+add = wrap(user.add)
+batch_add = wrap(user.batch_add)
+delete = wrap(user.delete)
+restore = wrap(user.restore)
+destroy = wrap(user.destroy)
+update = wrap(user.update)
+find_pages = wrap_generator(user.find_pages)
+find_page = wrap(user.find_page)
+find_all = wrap(user.find_all)
+find = wrap(user.find)
+find_many = wrap(user.find_many)
+find_by_email = wrap(user.find_by_email)
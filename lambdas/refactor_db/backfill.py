@@ -0,0 +1,141 @@
+import argparse, json, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from . import codec, connection, errors, shard, trace, user
+from .batch import batch_get
+from .connection import low_level_client
+from .projection import project
+
+WORKERS = 8
+COUNTS = ('scanned', 'updated', 'changed', 'locked', 'duplicates')
+
+def _scan_conditions():
+    # only items in itemTypeIdIndex belong in itemTypeShardIndex
+    return project({
+        'FilterExpression': 'attribute_exists(itemType) AND attribute_exists(id)',
+    }, ['hashKey', 'rangeKey', 'itemType', 'id', 'itemTypeShard', 'orgId', 'userId', 'email'])
+
+def _lock_users(table: any, users: list, dry_run: bool, counts: dict):
+    # users written before email locks existed have none, so their email
+    # could be claimed again by another user
+    locks = batch_get(table, [user._email_key(u['email']) for u in users], fields=['email', 'orgId', 'userId'])
+    owners = {lock['email']: (lock['orgId'], lock['userId']) for lock in locks}
+    for u in users:
+        owner = owners.get(u['email'])
+        if owner == (u['orgId'], u['userId']):
+            continue
+
+        if owner is None and dry_run:
+            counts['locked'] += 1
+            continue
+
+        error = user.claim_email(table, u) if owner is None else errors.already_exists("user email", u['email'])
+        if not error:
+            counts['locked'] += 1
+        elif error['code'] == errors.ALREADY_EXISTS:
+            # two users share the email; it stays with the lock's owner
+            print(f"Error: {u['orgId']} {u['userId']}: {error['error']}")
+            counts['duplicates'] += 1
+        elif error['code'] == errors.CONFLICT:
+            counts['changed'] += 1
+        else:
+            raise Exception(error['error'])
+
+@trace.traced('backfill.backfill_segment')
+def backfill_segment(table: any, segment: int, total_segments: int, page_size: int | None = None,
+                     dry_run: bool = False, verbose: bool = False):
+    """Set itemTypeShard and email locks on the items of one scan segment that lack them.
+
+    An item is only updated while its id is the one its shard was computed
+    from; an item whose email changed meanwhile got its shard and lock from
+    that write. Running it again skips items that are already right.
+    """
+    conditions = dict(_scan_conditions(), TableName=table.table_name, Segment=segment, TotalSegments=total_segments)
+    if page_size is not None:
+        conditions['Limit'] = page_size
+
+    client = low_level_client(table)
+    counts = {key: 0 for key in COUNTS}
+    while True:
+        response = client.scan(**conditions)
+        items = [codec.decode_item(item) for item in response.get('Items', [])]
+        users = [item for item in items if item['itemType'] == user.OBJECT_TYPE]
+        if users:
+            _lock_users(table, users, dry_run, counts)
+
+        for item in items:
+            counts['scanned'] += 1
+            expected = shard.shard(item['itemType'], item['id'])
+            if item.get('itemTypeShard') == expected:
+                continue
+
+            if dry_run:
+                counts['updated'] += 1
+                continue
+
+            try:
+                client.update_item(
+                    TableName=table.table_name,
+                    Key=codec.encode_key(item['hashKey'], item['rangeKey']),
+                    UpdateExpression='SET itemTypeShard = :s',
+                    ConditionExpression='id = :i',
+                    ExpressionAttributeValues=codec.encode_item({':s': expected, ':i': item['id']}),
+                )
+                counts['updated'] += 1
+            except ClientError as e:
+                if not errors.is_condition_failed(e):
+                    raise
+                counts['changed'] += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        conditions['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return counts
+
+@trace.traced('backfill.backfill')
+def backfill(table: any, workers: int = WORKERS, total_segments: int | None = None, page_size: int | None = None,
+             dry_run: bool = False, verbose: bool = False):
+    """Give every item in itemTypeIdIndex its itemTypeShard, and every user its
+    email lock, with a parallel segmented Scan.
+
+    Run it after deploying email locks or itemTypeShardIndex to a table that
+    already has items, or after changing DDB_ITEM_TYPE_SHARDS, and before
+    turning sharded reads on. `dry_run` only counts the items that would be
+    updated and the locks that would be written. Users whose email is held
+    by another user are counted as `duplicates` and left to be fixed by hand.
+    """
+    total_segments = total_segments or workers
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(backfill_segment, table, segment, total_segments, page_size, dry_run, verbose)
+            for segment in range(total_segments)
+        ]
+        results = [future.result() for future in futures]
+
+    report = {key: sum(result[key] for result in results) for key in COUNTS}
+    report.update({
+        'shards': shard.SHARDS,
+        'segments': total_segments,
+        'dryRun': dry_run,
+        'elapsed': round(time.monotonic() - started, 3),
+    })
+    return report
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Set itemTypeShard on every user and org item, and write missing email locks.")
+    parser.add_argument('--table', help="table name, defaults to $TABLE_NAME")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--segments', type=int, help="total scan segments, defaults to --workers")
+    parser.add_argument('--page-size', type=int)
+    parser.add_argument('--dry-run', action='store_true', help="count the items to update without writing")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = backfill(connection.table(args.table), args.workers, args.segments, args.page_size, args.dry_run, args.verbose)
+    print(json.dumps(report))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import random, time
+from concurrent.futures import ThreadPoolExecutor
+from . import codec, errors, trace
+from .connection import low_level_client
+from .projection import project
+
+# DynamoDB request limits
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+TRANSACT_SIZE = 100
+
+MAX_WORKERS = 8
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 2.0
+
+def chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def backoff(attempt: int):
+    # Full jitter: sleep a random time up to the capped exponential delay
+    time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+def item_key(item: dict):
+    return (item['hashKey'], item['rangeKey'])
+
+def _request_key(request: dict):
+    if 'PutRequest' in request:
+        return item_key(codec.decode_item(request['PutRequest']['Item']))
+
+    return item_key(codec.decode_item(request['DeleteRequest']['Key']))
+
+def _write_chunk(client: any, table_name: str, requests: list):
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            response = client.batch_write_item(RequestItems={table_name: requests})
+        except Exception as e:
+            return {_request_key(r): f"Error: {e}" for r in requests}
+
+        requests = response.get('UnprocessedItems', {}).get(table_name, [])
+        if not requests:
+            return {}
+
+        backoff(attempt)
+
+    return {_request_key(r): "Error: item was not processed" for r in requests}
+
+def _write(table: any, requests: list, max_workers: int):
+    failed = {}
+    if not requests:
+        return failed
+
+    client = low_level_client(table)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(_write_chunk, client, table.table_name, chunk)
+            for chunk in chunks(requests, BATCH_WRITE_SIZE)
+        ]
+        for future in futures:
+            failed.update(future.result())
+
+    return failed
+
+@trace.traced('batch.batch_write')
+def batch_write(table: any, items: list, max_workers: int = MAX_WORKERS, verbose: bool = False):
+    """Put items with BatchWriteItem in 25-item chunks written concurrently.
+
+    Unprocessed items are retried with jittered exponential backoff. Returns a
+    dict of {(hashKey, rangeKey): error} for the items that could not be written.
+    """
+    failed = _write(table, [{'PutRequest': {'Item': codec.encode_item(item)}} for item in items], max_workers)
+
+    return failed
+
+@trace.traced('batch.batch_delete')
+def batch_delete(table: any, keys: list, max_workers: int = MAX_WORKERS, verbose: bool = False):
+    """Delete keys with BatchWriteItem, like batch_write. Returns the failed keys."""
+    unique = list({item_key(key): key for key in keys}.values())
+    failed = _write(table, [{'DeleteRequest': {'Key': codec.encode_key(*item_key(key))}} for key in unique], max_workers)
+
+    return failed
+
+# cancellation reasons and errors a transaction is retried after
+RETRY_REASONS = ('ThrottlingError', 'TransactionConflict', 'ProvisionedThroughputExceeded')
+RETRY_ERRORS = ('ThrottlingException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException', 'InternalServerError')
+
+def _transact_chunk(client: any, groups: list):
+    pending = dict(enumerate(groups))
+    failed = {}
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            client.transact_write_items(TransactItems=[member for group in pending.values() for member in group])
+            return failed
+        except errors.ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code != 'TransactionCanceledException':
+                if code in RETRY_ERRORS:
+                    backoff(attempt)
+                    continue
+                return {**failed, **{i: (None, f"Error: {e}") for i in pending}}
+
+            # a failed condition only fails its own group; the others are retried
+            reasons = iter(e.response.get('CancellationReasons', []))
+            retry = False
+            for i, group in list(pending.items()):
+                codes = [next(reasons, {}).get('Code', 'None') for _ in group]
+                for member, reason in enumerate(codes):
+                    if reason == 'ConditionalCheckFailed':
+                        failed[i] = (member, "Error: the conditional request failed")
+                        del pending[i]
+                        break
+                    if reason != 'None':
+                        retry = True
+                        if reason not in RETRY_REASONS:
+                            failed[i] = (member, f"Error: {reason}")
+                            del pending[i]
+                            break
+
+            if not pending:
+                return failed
+            if retry:
+                backoff(attempt)
+
+    return {**failed, **{i: (None, "Error: item was not processed") for i in pending}}
+
+@trace.traced('batch.transact_groups')
+def transact_groups(table: any, groups: list, max_workers: int = MAX_WORKERS, verbose: bool = False):
+    """Write groups of TransactWriteItems members, each group all or nothing.
+
+    Groups are packed into transactions of up to 100 members written
+    concurrently. A group whose condition fails is dropped from its
+    transaction and the rest is written again; throttled and conflicting
+    transactions are retried with jittered exponential backoff. Returns a
+    dict of {group index: (failed member index or None, error)}.
+    """
+    client = low_level_client(table)
+    transactions, transaction = [], []
+    for i, group in enumerate(groups):
+        if transaction and sum(len(g) for _, g in transaction) + len(group) > TRANSACT_SIZE:
+            transactions.append(transaction)
+            transaction = []
+        transaction.append((i, group))
+    if transaction:
+        transactions.append(transaction)
+
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            (transaction, executor.submit(_transact_chunk, client, [group for _, group in transaction]))
+            for transaction in transactions
+        ]
+        for transaction, future in futures:
+            failed.update({transaction[j][0]: error for j, error in future.result().items()})
+
+    return failed
+
+def _get_chunk(client: any, table_name: str, keys: list, fields: list[str] | None = None, decode: callable = codec.decode_item):
+    request = project({'Keys': [codec.encode_item(key) for key in keys]}, fields)
+    items = []
+
+    for attempt in range(MAX_ATTEMPTS):
+        response = client.batch_get_item(RequestItems={table_name: request})
+        items.extend(decode(item) for item in response.get('Responses', {}).get(table_name, []))
+
+        request = response.get('UnprocessedKeys', {}).get(table_name)
+        if not request or not request.get('Keys'):
+            return items
+
+        backoff(attempt)
+
+    raise Exception(f"Error: {len(request['Keys'])} keys were not processed")
+
+@trace.traced('batch.batch_get')
+def batch_get(table: any, keys: list, max_workers: int = MAX_WORKERS, verbose: bool = False, fields: list[str] | None = None, decode: callable = codec.decode_item):
+    """Get items with BatchGetItem in 100-key chunks fetched concurrently.
+
+    Duplicate keys are fetched once and UnprocessedKeys are retried with
+    jittered exponential backoff. Returns the found items in no particular
+    order; missing keys are simply absent.
+    """
+    unique = list({item_key(key): key for key in keys}.values())
+    if not unique:
+        return []
+
+    client = low_level_client(table)
+    items = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(_get_chunk, client, table.table_name, chunk, fields, decode)
+            for chunk in chunks(unique, BATCH_GET_SIZE)
+        ]
+        for future in futures:
+            items.extend(future.result())
+
+    return items
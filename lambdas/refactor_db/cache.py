@@ -0,0 +1,88 @@
+import os, time
+from collections import OrderedDict
+from threading import Lock
+
+# Sizing for the per-container read-through caches. USER_CACHE_SIZE=0
+# turns caching off.
+MAX_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+TTL = float(os.environ.get('USER_CACHE_TTL', 10))
+
+class TTLCache:
+    """A bounded LRU cache whose entries also expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int = MAX_SIZE, ttl: float = TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: any):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: any, value: any):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key: any):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {
+            'size': len(self._items),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+# full user items by (orgId, userId)
+users = TTLCache()
+# (orgId, userId) by email
+emails = TTLCache()
+
+def get_user(orgId: str, userId: str):
+    user = users.get((orgId, userId))
+    return dict(user) if user is not None else None
+
+def get_user_by_email(email: str):
+    key = emails.get(email)
+    return get_user(*key) if key is not None else None
+
+def set_user(user: dict):
+    users.set((user['orgId'], user['userId']), dict(user))
+    emails.set(user['email'], (user['orgId'], user['userId']))
+
+def invalidate_user(orgId: str, userId: str, email: str | None = None):
+    users.delete((orgId, userId))
+    if email is not None:
+        emails.delete(email)
+
+def stats():
+    return {
+        'users': users.stats(),
+        'emails': emails.stats(),
+    }
@@ -0,0 +1,140 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import cache, codec, errors, trace
+from .batch import batch_delete, chunks, MAX_WORKERS
+from .connection import low_level_client
+from .paginate import query_pages
+from .projection import project
+
+DELETE = 'delete'
+RESTORE = 'restore'
+DESTROY = 'destroy'
+
+PAGE_SIZE = 500
+TASK_SIZE = 25
+# Keep at most this many errors in the summary
+MAX_ERRORS = 20
+# same as user.EMAIL_LOCK_PREFIX, which cannot be imported here without a cycle
+EMAIL_LOCK_PREFIX = 'EMAIL#'
+
+def _collection_conditions(orgId: str):
+    # every item in the org's collection; DynamoDB does not allow a filter on
+    # rangeKey, so the org item itself is skipped by cascade
+    return project({
+        'KeyConditionExpression': 'hashKey = :h',
+        'ExpressionAttributeValues': {
+            ':h': orgId,
+        },
+    }, ['hashKey', 'rangeKey', 'userId', 'email'])
+
+def _update_items(table: any, items: list, operation: str, deletedAt: int):
+    client = low_level_client(table)
+    processed = skipped = 0
+    failed = []
+    for item in items:
+        if operation == DELETE:
+            # items deleted on their own earlier keep their own deletedAt
+            kwargs = {
+                'UpdateExpression': "SET deletedAt = :d",
+                'ConditionExpression': "attribute_exists(rangeKey) AND attribute_not_exists(deletedAt)",
+            }
+        else:
+            # only restore the items this org's delete cascaded to
+            kwargs = {
+                'UpdateExpression': "REMOVE deletedAt",
+                'ConditionExpression': "deletedAt = :d",
+            }
+
+        try:
+            client.update_item(
+                TableName=table.table_name,
+                Key=codec.encode_key(item['hashKey'], item['rangeKey']),
+                ExpressionAttributeValues={":d": codec.encode_value(deletedAt)},
+                **kwargs,
+            )
+            processed += 1
+        except errors.ClientError as e:
+            if errors.is_condition_failed(e):
+                skipped += 1
+            else:
+                failed.append({'rangeKey': item['rangeKey'], 'error': f"Error: {e}"})
+
+    return processed, skipped, failed
+
+def _destroy_items(table: any, items: list, max_workers: int):
+    keys = [{'hashKey': item['hashKey'], 'rangeKey': item['rangeKey']} for item in items]
+    locks = [
+        {'hashKey': f"{EMAIL_LOCK_PREFIX}{item['email']}", 'rangeKey': f"{EMAIL_LOCK_PREFIX}{item['email']}"}
+        for item in items if 'email' in item
+    ]
+    failed = batch_delete(table, keys + locks, max_workers)
+    processed = sum(1 for key in keys if (key['hashKey'], key['rangeKey']) not in failed)
+    return processed, 0, [{'rangeKey': key[1], 'error': error} for key, error in failed.items()]
+
+@trace.traced('cascade.cascade')
+def cascade(table: any, orgId: str, operation: str, deletedAt: int | None = None, cursor: str | None = None,
+            deadline: float | None = None, max_workers: int = MAX_WORKERS, page_size: int | None = None, verbose: bool = False):
+    """Apply `operation` to every item in an org's item collection.
+
+    Pages of the collection are read one after another and each page is
+    handed to a pool of workers. The returned summary includes a `cursor`
+    checkpoint after the last completed page. When `deadline` (epoch seconds)
+    is reached before the collection is exhausted, or a page has failed
+    items, `complete` is False and calling again with that cursor resumes
+    the job, retrying the failed page.
+    """
+    if operation not in (DELETE, RESTORE, DESTROY):
+        raise Exception(f"Error: unknown cascade operation: {operation}")
+
+    started = time.monotonic()
+    summary = {
+        'orgId': orgId,
+        'operation': operation,
+        'processed': 0,
+        'skipped': 0,
+        'failed': 0,
+        'errors': [],
+        'cursor': cursor,
+        'complete': False,
+    }
+
+    def record(result):
+        processed, skipped, failed = result
+        summary['processed'] += processed
+        summary['skipped'] += skipped
+        summary['failed'] += len(failed)
+        summary['errors'].extend(failed[:MAX_ERRORS - len(summary['errors'])])
+
+    pages = query_pages(table, _collection_conditions(orgId), page_size or PAGE_SIZE, cursor)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for items, next_cursor in pages:
+            failed = summary['failed']
+            items = [item for item in items if item['rangeKey'] != orgId]
+            for item in items:
+                if 'userId' in item:
+                    cache.invalidate_user(orgId, item['userId'], item.get('email'))
+
+            if operation == DESTROY:
+                if items:
+                    record(_destroy_items(table, items, max_workers))
+            else:
+                futures = [
+                    executor.submit(_update_items, table, task, operation, deletedAt)
+                    for task in chunks(items, TASK_SIZE)
+                ]
+                for future in futures:
+                    record(future.result())
+
+            # the checkpoint only moves past pages that are fully processed
+            if summary['failed'] > failed:
+                break
+
+            summary['cursor'] = next_cursor
+            if next_cursor is None:
+                summary['complete'] = True
+            elif deadline is not None and time.time() >= deadline:
+                break
+
+    summary['elapsed'] = round(time.monotonic() - started, 3)
+
+    return summary
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+# Encode/decode DynamoDB's AttributeValue wire format directly, skipping the
+# resource layer's TypeSerializer/TypeDeserializer. Numbers decode to native
+# ints (our timestamps) and only fall back to Decimal when they have a
+# fractional part or exponent.
+
+def decode_number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return Decimal(value)
+
+def decode_value(value: dict):
+    (kind, data), = value.items()
+    if kind == 'S':
+        return data
+    if kind == 'N':
+        return decode_number(data)
+    if kind == 'BOOL':
+        return data
+    if kind == 'NULL':
+        return None
+    if kind == 'M':
+        return {k: decode_value(v) for k, v in data.items()}
+    if kind == 'L':
+        return [decode_value(v) for v in data]
+    if kind == 'SS':
+        return set(data)
+    if kind == 'NS':
+        return {decode_number(v) for v in data}
+    if kind == 'B':
+        return bytes(data)
+    if kind == 'BS':
+        return {bytes(v) for v in data}
+
+    raise Exception(f"Error: unknown attribute type: {kind}")
+
+def decode_item(item: dict):
+    # Strings are by far the most common attribute, so they skip the dispatch
+    return {
+        k: v['S'] if 'S' in v else decode_value(v)
+        for k, v in item.items()
+    }
+
+def encode_value(value: any):
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        return {'N': repr(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': encode_item(value)}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(v) for v in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, (set, frozenset)) and value:
+        sample = next(iter(value))
+        if isinstance(sample, str):
+            return {'SS': list(value)}
+        if isinstance(sample, (bytes, bytearray)):
+            return {'BS': [bytes(v) for v in value]}
+        return {'NS': [str(v) for v in value]}
+
+    raise Exception(f"Error: cannot encode value of type {type(value).__name__}")
+
+def encode_item(item: dict):
+    return {k: encode_value(v) for k, v in item.items()}
+
+def encode_key(hashKey: str, rangeKey: str):
+    return {'hashKey': {'S': hashKey}, 'rangeKey': {'S': rangeKey}}
+
+def normalize(item: dict):
+    """Replace the resource layer's integral Decimals with ints, in place."""
+    for k, v in item.items():
+        if isinstance(v, Decimal) and v == v.to_integral_value():
+            item[k] = int(v)
+
+    return item
+
+class Record:
+    __slots__ = ()
+
+    @classmethod
+    def from_wire(cls, item: dict):
+        record = cls.__new__(cls)
+        for field in cls.__slots__:
+            value = item.get(field)
+            setattr(record, field, None if value is None else decode_value(value))
+
+        return record
+
+    def to_dict(self):
+        return {
+            field: getattr(self, field)
+            for field in self.__slots__
+            if getattr(self, field) is not None
+        }
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+class UserRecord(Record):
+    __slots__ = ('orgId', 'userId', 'email', 'username', 'createdAt', 'updatedAt', 'deletedAt')
+
+class OrgRecord(Record):
+    __slots__ = ('orgId', 'orgName', 'createdAt', 'updatedAt', 'deletedAt')
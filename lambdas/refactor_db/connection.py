@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics, trace
+
+# boto3 and botocore take most of a cold start's import time, so they are
+# only imported when the first client is created.
+
+# Connection settings, tunable per deployment through the environment
+MAX_POOL_CONNECTIONS = int(os.environ.get('DDB_MAX_POOL_CONNECTIONS', 50))
+CONNECT_TIMEOUT = float(os.environ.get('DDB_CONNECT_TIMEOUT', 1))
+READ_TIMEOUT = float(os.environ.get('DDB_READ_TIMEOUT', 3))
+MAX_ATTEMPTS = int(os.environ.get('DDB_MAX_ATTEMPTS', 5))
+TCP_KEEPALIVE = os.environ.get('DDB_TCP_KEEPALIVE', 'true').lower() == 'true'
+
+# Created on first use and kept for the life of the container, so warm
+# invocations reuse the session, credentials and pooled connections.
+_config = None
+_resource = None
+_tables = {}
+_low_level_clients = {}
+
+def config():
+    global _config
+    if _config is None:
+        from botocore.config import Config
+        _config = Config(
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+            tcp_keepalive=TCP_KEEPALIVE,
+            retries={
+                'mode': 'adaptive',
+                'max_attempts': MAX_ATTEMPTS,
+            },
+        )
+
+    return _config
+
+def instrument(client: any):
+    # metrics first: trace's hook reads the capacity metrics' hook records
+    trace.instrument(metrics.instrument(client))
+    return client
+
+def resource():
+    global _resource
+    if _resource is None:
+        import boto3
+        _resource = boto3.resource('dynamodb', region_name=os.environ.get("AWS_REGION"), config=config())
+        instrument(_resource.meta.client)
+
+    return _resource
+
+def client():
+    return resource().meta.client
+
+def low_level_client(table: any = None):
+    """A DynamoDB client that speaks the raw AttributeValue wire format.
+
+    The resource's own client serializes and deserializes Python types on
+    every call, so `refactor_db.codec` needs a plain client alongside it,
+    pointed at the same region and endpoint as `table`.
+    """
+    if table is not None and hasattr(table, 'low_level_client'):
+        return table.low_level_client
+
+    meta = (table.meta.client if table is not None else client()).meta
+    key = (meta.region_name, meta.endpoint_url)
+    if key not in _low_level_clients:
+        import boto3
+        _low_level_clients[key] = instrument(
+            boto3.client('dynamodb', region_name=meta.region_name, endpoint_url=meta.endpoint_url, config=config())
+        )
+
+    return _low_level_clients[key]
+
+def table(name: str | None = None):
+    name = name or os.environ["TABLE_NAME"]
+    if name not in _tables:
+        _tables[name] = resource().Table(name)
+
+    return _tables[name]
+
+def register(table: any):
+    """Make `table()` return `table` for its name, e.g. a memory.MemoryTable in tests."""
+    _tables[table.table_name] = table
+    if hasattr(table, 'low_level_client'):
+        instrument(table.low_level_client)
+    return table
+
+def reset():
+    global _resource
+    _resource = None
+    _tables.clear()
+    _low_level_clients.clear()
+
+@trace.traced('connection.warmup')
+def warmup(table: any, connections: int = 1, verbose: bool = False):
+    # A GetItem on a key that never exists is the cheapest call that still
+    # resolves credentials and completes a TLS handshake. Running several at
+    # once opens that many pooled connections.
+    # Reads go through the low-level client, so it is warmed as well.
+    wire = low_level_client(table)
+    def ping(_):
+        table.get_item(Key={'hashKey': 'WARMUP', 'rangeKey': 'WARMUP'})
+        wire.get_item(TableName=table.table_name, Key={'hashKey': {'S': 'WARMUP'}, 'rangeKey': {'S': 'WARMUP'}})
+
+    connections = max(1, min(connections, MAX_POOL_CONNECTIONS))
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(ping, range(connections)))
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": f"Error: {e}"}
+
+    return {"warm": True, "connections": connections}
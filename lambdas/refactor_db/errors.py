@@ -0,0 +1,41 @@
+ALREADY_EXISTS = 'ALREADY_EXISTS'
+NOT_FOUND = 'NOT_FOUND'
+CONFLICT = 'CONFLICT'
+
+def __getattr__(name: str):
+    # `errors.ClientError` imports botocore.exceptions on first use. An
+    # `except errors.ClientError` clause only looks it up once an exception
+    # reaches it, so a cold start that never fails does not import botocore.
+    if name == 'ClientError':
+        from botocore.exceptions import ClientError
+        return ClientError
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _code(e: Exception):
+    # any ClientError has a response; no other exception needs botocore loaded
+    response = getattr(e, 'response', None)
+    if not isinstance(response, dict) or not isinstance(e, __getattr__('ClientError')):
+        return None
+
+    return response.get('Error', {}).get('Code')
+
+def error(code: str, message: str):
+    return {"error": f"Error: {message}", "code": code}
+
+def already_exists(name: str, value: str):
+    return error(ALREADY_EXISTS, f"{name} already exists: {value}")
+
+def not_found(name: str, value: str):
+    return error(NOT_FOUND, f"{name} does not exist: {value}")
+
+def is_condition_failed(e: Exception):
+    return _code(e) == 'ConditionalCheckFailedException'
+
+def cancelled_by(e: Exception, index: int, code: str = 'ConditionalCheckFailed'):
+    """True when item `index` of a cancelled transaction failed with `code`."""
+    if _code(e) != 'TransactionCanceledException':
+        return False
+
+    reasons = e.response.get('CancellationReasons', [])
+    return len(reasons) > index and reasons[index].get('Code') == code
@@ -0,0 +1,167 @@
+import argparse, base64, gzip, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from . import codec, connection, trace
+from .connection import low_level_client
+from .paginate import encode_cursor, decode_cursor
+from .projection import project
+
+WORKERS = 8
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def segment_paths(out_dir: str, segment: int):
+    name = os.path.join(out_dir, f"segment-{segment:04d}")
+    return f"{name}.ndjson.gz", f"{name}.checkpoint.json"
+
+def _read_checkpoint(path: str):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_checkpoint(path: str, checkpoint: dict):
+    # write then rename, so a crash never leaves a half written checkpoint
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{path}.tmp", path)
+
+def _scan_conditions(itemTypes: list | None = None, fields: list | None = None):
+    conditions = {}
+    if itemTypes:
+        conditions['FilterExpression'] = ' OR '.join(f"itemType = :t{i}" for i in range(len(itemTypes)))
+        conditions['ExpressionAttributeValues'] = {f":t{i}": t for i, t in enumerate(itemTypes)}
+
+    return project(conditions, fields)
+
+@trace.traced('exporter.export_segment')
+def export_segment(table: any, out_dir: str, segment: int, total_segments: int, itemTypes: list | None = None,
+                   fields: list | None = None, page_size: int | None = None, verbose: bool = False):
+    """Scan one segment of the table into a gzipped NDJSON file.
+
+    Every page is appended as its own gzip member and then checkpointed with
+    the file size and the scan's last evaluated key. Running the segment
+    again truncates the file to the checkpointed size and resumes the scan
+    from the checkpointed key, so no item is lost or written twice.
+    """
+    data_path, checkpoint_path = segment_paths(out_dir, segment)
+    checkpoint = _read_checkpoint(checkpoint_path) or {
+        'segment': segment,
+        'totalSegments': total_segments,
+        'items': 0,
+        'bytes': 0,
+        'cursor': None,
+        'complete': False,
+    }
+    if checkpoint['totalSegments'] != total_segments:
+        raise Exception(f"Error: checkpoint for segment {segment} was written with {checkpoint['totalSegments']} segments, not {total_segments}")
+    if checkpoint['complete']:
+        return checkpoint
+
+    conditions = dict(_scan_conditions(itemTypes, fields), TableName=table.table_name, Segment=segment, TotalSegments=total_segments)
+    if 'ExpressionAttributeValues' in conditions:
+        conditions['ExpressionAttributeValues'] = codec.encode_item(conditions['ExpressionAttributeValues'])
+    if page_size is not None:
+        conditions['Limit'] = page_size
+
+    client = low_level_client(table)
+    start_key = decode_cursor(checkpoint['cursor'])
+    with open(data_path, 'ab') as f:
+        f.truncate(checkpoint['bytes'])
+        f.seek(checkpoint['bytes'])
+        while True:
+            if start_key:
+                conditions['ExclusiveStartKey'] = codec.encode_item(start_key)
+
+            response = client.scan(**conditions)
+            items = response.get('Items', [])
+            if items:
+                lines = ''.join(json.dumps(codec.decode_item(item), default=_default, separators=(',', ':')) + '\n' for item in items)
+                f.write(gzip.compress(lines.encode()))
+                f.flush()
+
+            start_key = response.get('LastEvaluatedKey')
+            if start_key:
+                start_key = codec.decode_item(start_key)
+
+            checkpoint['items'] += len(items)
+            checkpoint['bytes'] = f.tell()
+            checkpoint['cursor'] = encode_cursor(start_key)
+            checkpoint['complete'] = not start_key
+            _write_checkpoint(checkpoint_path, checkpoint)
+
+            if not start_key:
+                break
+
+    return checkpoint
+
+@trace.traced('exporter.export_table')
+def export_table(table: any, out_dir: str, workers: int = WORKERS, total_segments: int | None = None,
+                 itemTypes: list | None = None, fields: list | None = None, page_size: int | None = None, verbose: bool = False):
+    """Export the table to `out_dir` with a parallel segmented Scan.
+
+    `total_segments` (defaulting to `workers`) segments are scanned by a pool
+    of `workers` threads, each into its own segment file. Pass `itemTypes` to
+    keep only those item types. Re-running with the same `out_dir` resumes
+    unfinished segments and skips completed ones.
+    """
+    total_segments = total_segments or workers
+    os.makedirs(out_dir, exist_ok=True)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(export_segment, table, out_dir, segment, total_segments, itemTypes, fields, page_size, verbose)
+            for segment in range(total_segments)
+        ]
+        checkpoints = [future.result() for future in futures]
+
+    elapsed = time.monotonic() - started
+    items = sum(checkpoint['items'] for checkpoint in checkpoints)
+    report = {
+        'segments': total_segments,
+        'items': items,
+        'files': [segment_paths(out_dir, segment)[0] for segment in range(total_segments)],
+        'elapsed': round(elapsed, 3),
+        'rate': round(items / elapsed, 1) if elapsed else 0.0,
+    }
+    return report
+
+def read_export(out_dir: str):
+    """Yield every item of an export, segment by segment."""
+    for name in sorted(os.listdir(out_dir)):
+        if name.endswith('.ndjson.gz'):
+            with gzip.open(os.path.join(out_dir, name), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Export the table to gzipped NDJSON files, one per scan segment.")
+    parser.add_argument('out_dir', help="directory for the segment and checkpoint files")
+    parser.add_argument('--table', help="table name, defaults to $TABLE_NAME")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--segments', type=int, help="total scan segments, defaults to --workers")
+    parser.add_argument('--item-type', action='append', dest='itemTypes', help="only export this itemType, may be repeated")
+    parser.add_argument('--fields', help="comma separated attributes to export")
+    parser.add_argument('--page-size', type=int)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = export_table(
+        connection.table(args.table), args.out_dir, args.workers, args.segments,
+        args.itemTypes, args.fields, args.page_size, args.verbose,
+    )
+    print(json.dumps(report))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
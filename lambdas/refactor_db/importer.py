@@ -0,0 +1,185 @@
+import argparse, csv, gzip, io, json, queue, sys, threading, time
+from . import connection, shard, trace, user
+from .id import generate_id, is_valid_id
+from .org import OBJECT_TYPE as ORG_OBJECT_TYPE
+
+CHUNK_SIZE = 250
+WORKERS = 4
+# BatchWriteItem requests each import worker keeps in flight
+WORKER_CONCURRENCY = 2
+REPORT_EVERY = 5.0
+
+_DONE = object()
+
+def _open(path: str):
+    if path == '-':
+        return sys.stdin
+
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+
+    return open(path, encoding='utf-8', newline='')
+
+def read_records(path: str, format: str | None = None):
+    """Stream (line, record) pairs from a JSONL or CSV file, one at a time."""
+    format = format or ('csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl')
+    with _open(path) as f:
+        if format == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+
+            try:
+                yield line, json.loads(text)
+            except ValueError as e:
+                yield line, {'error': f"Error: line is not valid JSON: {e}", 'text': text.rstrip('\n')}
+
+def prepare(record: dict, orgId: str | None = None):
+    """Return (user, error) for one input record."""
+    if 'error' in record:
+        return None, record['error']
+
+    item = {k: v for k, v in record.items() if v not in (None, '')}
+    if orgId and 'orgId' not in item:
+        item['orgId'] = orgId
+
+    if not is_valid_id(ORG_OBJECT_TYPE, item.get('orgId', '')):
+        return None, f"Error: orgId is not valid: {item.get('orgId')}"
+
+    if 'userId' not in item:
+        item['userId'] = generate_id(user.OBJECT_TYPE)
+    elif not is_valid_id(user.OBJECT_TYPE, item['userId']):
+        return None, f"Error: userId is not valid: {item['userId']}"
+
+    return item, None
+
+@trace.traced('importer.import_users')
+def import_users(table: any, path: str, format: str | None = None, orgId: str | None = None,
+                 rejects_path: str | None = None, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE,
+                 report_every: float | None = REPORT_EVERY, verbose: bool = False):
+    """Stream users from a JSONL/CSV file into the table.
+
+    The reader validates records and fills bounded queues of chunks, which
+    `workers` threads write with `user.batch_add`. Every record with the same
+    email goes to the same writer, whose chunks are written one after the
+    other, so a repeated email is rejected instead of creating two users.
+    Memory stays constant whatever the file size. Rejected records go to
+    `rejects_path` as JSONL with their line number and error. Returns a
+    throughput report.
+    """
+    started = time.monotonic()
+    report = {'read': 0, 'imported': 0, 'rejected': 0}
+    lock = threading.Lock()
+    workers = max(1, workers)
+    queues = [queue.Queue(maxsize=2) for _ in range(workers)]
+    rejects = queue.Queue(maxsize=chunk_size * workers * 2)
+
+    def progress():
+        elapsed = time.monotonic() - started
+        return {
+            **report,
+            'elapsed': round(elapsed, 3),
+            'rate': round(report['imported'] / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def write(chunks: queue.Queue):
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+
+            lines = [line for line, _ in chunk]
+            items = [item for _, item in chunk]
+            try:
+                results = user.batch_add(table, items, max_workers=WORKER_CONCURRENCY)
+            except Exception as e:
+                results = [{'error': f"Error: {e}"}] * len(items)
+
+            imported = 0
+            for line, item, result in zip(lines, items, results):
+                if 'error' in result:
+                    rejects.put({'line': line, 'record': item, 'error': result['error']})
+                else:
+                    imported += 1
+
+            with lock:
+                report['imported'] += imported
+
+    def reject():
+        out = open(rejects_path, 'w', encoding='utf-8') if rejects_path else None
+        try:
+            while True:
+                entry = rejects.get()
+                if entry is _DONE:
+                    return
+
+                with lock:
+                    report['rejected'] += 1
+                if out:
+                    out.write(json.dumps(entry, default=str) + '\n')
+        finally:
+            if out:
+                out.close()
+
+    writers = [threading.Thread(target=write, args=(chunks,), daemon=True) for chunks in queues]
+    rejecter = threading.Thread(target=reject, daemon=True)
+    for thread in [*writers, rejecter]:
+        thread.start()
+
+    last_report = time.monotonic()
+    pending = [[] for _ in queues]
+    for line, record in read_records(path, format):
+        report['read'] += 1
+        item, error = prepare(record, orgId)
+        if error:
+            rejects.put({'line': line, 'record': record, 'error': error})
+        else:
+            worker = shard.bucket(str(item.get('email', '')), workers)
+            pending[worker].append((line, item))
+            if len(pending[worker]) >= chunk_size:
+                queues[worker].put(pending[worker])
+                pending[worker] = []
+
+        if report_every and time.monotonic() - last_report >= report_every:
+            print(json.dumps(progress()), file=sys.stderr)
+            last_report = time.monotonic()
+
+    for chunks, chunk in zip(queues, pending):
+        if chunk:
+            chunks.put(chunk)
+        chunks.put(_DONE)
+    for thread in writers:
+        thread.join()
+
+    rejects.put(_DONE)
+    rejecter.join()
+
+    return progress()
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Bulk import users from a JSONL or CSV file.")
+    parser.add_argument('path', help="file to import, .jsonl or .csv (optionally .gz), or - for stdin")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="input format, guessed from the file name by default")
+    parser.add_argument('--table', help="table name, defaults to $TABLE_NAME")
+    parser.add_argument('--org-id', help="orgId for records that do not have one")
+    parser.add_argument('--rejects', help="write rejected records to this JSONL file")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--report-every', type=float, default=REPORT_EVERY, help="seconds between progress reports")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = import_users(
+        connection.table(args.table), args.path, args.format, args.org_id, args.rejects,
+        args.workers, args.chunk_size, args.report_every, args.verbose,
+    )
+    print(json.dumps(report))
+    return 0 if report['rejected'] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1178 @@
+import bisect, functools, math, random, re, threading, time, zlib
+from collections import Counter
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from . import codec
+
+# An in-process stand-in for the DynamoDB table, for tests and benchmarks
+# that should not need the network. MemoryTable answers the resource calls
+# refactor_db makes (get/put/update/delete_item, query, scan and
+# meta.client.transact_write_items), and its `low_level_client` answers the
+# wire-format calls (the same plus batch_get_item and batch_write_item).
+# Expressions are parsed and evaluated like DynamoDB does for everything
+# this repo uses: comparisons, AND/OR/NOT, BETWEEN, IN, attribute_exists,
+# attribute_not_exists, begins_with, contains, SET (with if_not_exists and
+# +/-), REMOVE, ADD and DELETE. Nested document paths are not supported.
+
+TABLE_NAME = 'REFACTOR_TABLE'
+KEY = ('hashKey', 'rangeKey')
+INDEXES = {
+    'itemTypeIdIndex': ('itemType', 'id'),
+    'itemTypeShardIndex': ('itemTypeShard', 'id'),
+}
+
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+TRANSACT_SIZE = 100
+# a Query or Scan stops reading once a page has read this many bytes
+MAX_PAGE_SIZE = 1024 * 1024
+
+def _error(code: str, message: str, operation: str, **response):
+    return ClientError({
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': 400},
+        **response,
+    }, operation)
+
+def _validation(message: str, operation: str):
+    return _error('ValidationException', message, operation)
+
+###############################################################################
+# Attribute values
+
+def _norm(value: dict):
+    """A hashable, comparable form of an AttributeValue."""
+    (kind, data), = value.items()
+    if kind == 'N':
+        return ('N', Decimal(data))
+    if kind in ('SS', 'BS'):
+        return (kind, frozenset(bytes(v) if kind == 'BS' else v for v in data))
+    if kind == 'NS':
+        return (kind, frozenset(Decimal(v) for v in data))
+    if kind == 'M':
+        return (kind, tuple(sorted((k, _norm(v)) for k, v in data.items())))
+    if kind == 'L':
+        return (kind, tuple(_norm(v) for v in data))
+    if kind == 'B':
+        return (kind, bytes(data))
+
+    return (kind, data)
+
+def _value_size(value: dict):
+    (kind, data), = value.items()
+    if kind == 'S':
+        return len(data.encode())
+    if kind == 'N':
+        return len(data.lstrip('-').replace('.', '').lstrip('0')) // 2 + 1
+    if kind == 'B':
+        return len(data)
+    if kind in ('BOOL', 'NULL'):
+        return 1
+    if kind in ('SS', 'BS'):
+        return sum(len(v.encode() if kind == 'SS' else v) for v in data)
+    if kind == 'NS':
+        return sum(_value_size({'N': v}) for v in data)
+    if kind == 'M':
+        return 3 + sum(len(k.encode()) + _value_size(v) + 1 for k, v in data.items())
+
+    return 3 + sum(_value_size(v) + 1 for v in data)
+
+def item_size(item: dict | None):
+    """The size DynamoDB bills for an item: attribute names plus values."""
+    if not item:
+        return 0
+    return sum(len(name.encode()) + _value_size(value) for name, value in item.items())
+
+def read_units(size: int, consistent: bool = False):
+    units = max(1, math.ceil(size / 4096))
+    return float(units) if consistent else units / 2
+
+def write_units(size: int):
+    return float(max(1, math.ceil(size / 1024)))
+
+def _sort_value(value: dict):
+    return _norm(value)[1]
+
+def _compare(op: str, left: dict | None, right: dict | None):
+    if left is None or right is None:
+        # like DynamoDB, a missing attribute is only ever "not equal"
+        return op == '<>'
+
+    left, right = _norm(left), _norm(right)
+    if op == '=':
+        return left == right
+    if op == '<>':
+        return left != right
+    if left[0] != right[0] or left[0] not in ('S', 'N', 'B'):
+        return False
+    if op == '<':
+        return left[1] < right[1]
+    if op == '<=':
+        return left[1] <= right[1]
+    if op == '>':
+        return left[1] > right[1]
+
+    return left[1] >= right[1]
+
+def _from_wire(value: dict):
+    """Decode like the resource layer: numbers become Decimal."""
+    (kind, data), = value.items()
+    if kind == 'N':
+        return Decimal(data)
+    if kind == 'NS':
+        return {Decimal(v) for v in data}
+    if kind == 'M':
+        return {k: _from_wire(v) for k, v in data.items()}
+    if kind == 'L':
+        return [_from_wire(v) for v in data]
+
+    return codec.decode_value(value)
+
+def _item_from_wire(item: dict | None):
+    return None if item is None else {k: _from_wire(v) for k, v in item.items()}
+
+###############################################################################
+# Expressions
+
+_TOKENS = re.compile(r"\s*(?:(<>|<=|>=|=|<|>|\(|\)|,|\+|-|\[|\]|\.)|(#[A-Za-z0-9_]+)|(:[A-Za-z0-9_]+)|([A-Za-z_][A-Za-z0-9_]*))")
+_FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'begins_with', 'contains', 'size', 'attribute_type', 'if_not_exists', 'list_append'}
+
+def _paths(node: any):
+    """The attribute names a parsed expression reads."""
+    if isinstance(node, tuple) and node and node[0] == 'path':
+        yield node[1]
+    elif isinstance(node, (tuple, list)):
+        for child in node:
+            yield from _paths(child)
+
+class _Parser:
+    def __init__(self, expression: str, names: dict, values: dict, used: set, operation: str):
+        self.operation = operation
+        self.names = names
+        self.values = values
+        self.used = used
+        self.tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = _TOKENS.match(expression, position)
+            if not match or match.end() == position:
+                raise _validation(f"Invalid expression: syntax error near: {expression[position:]!r}", operation)
+
+            symbol, name, value, word = match.groups()
+            if symbol:
+                self.tokens.append(('symbol', symbol))
+            elif name:
+                self.tokens.append(('name', name))
+            elif value:
+                self.tokens.append(('value', value))
+            else:
+                self.tokens.append(('word', word))
+            position = match.end()
+        self.position = 0
+
+    def error(self, message: str):
+        return _validation(f"Invalid expression: {message}", self.operation)
+
+    def peek(self, offset: int = 0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise self.error("unexpected end of expression")
+        self.position += 1
+        return token
+
+    def keyword(self, word: str):
+        kind, text = self.peek()
+        if kind == 'word' and text.upper() == word:
+            self.position += 1
+            return True
+        return False
+
+    def symbol(self, symbol: str):
+        if self.peek() == ('symbol', symbol):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, symbol: str):
+        if not self.symbol(symbol):
+            raise self.error(f"expected {symbol!r}")
+
+    def done(self):
+        if self.peek()[0] is not None:
+            raise self.error(f"unexpected token {self.peek()[1]!r}")
+
+    def path(self):
+        kind, text = self.next()
+        if kind == 'name':
+            if text not in self.names:
+                raise _validation(f"An expression attribute name used in the document path is not defined; attribute name: {text}", self.operation)
+            self.used.add(text)
+            name = self.names[text]
+        elif kind == 'word':
+            name = text
+        else:
+            raise self.error(f"expected an attribute name, found {text!r}")
+
+        if self.peek() in (('symbol', '.'), ('symbol', '[')):
+            raise self.error("nested document paths are not supported by MemoryTable")
+        return ('path', name)
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.position += 1
+            if text not in self.values:
+                raise _validation(f"An expression attribute value used in expression is not defined; attribute value: {text}", self.operation)
+            self.used.add(text)
+            return ('value', self.values[text])
+        if kind == 'word' and text.lower() in _FUNCTIONS and self.peek(1) == ('symbol', '('):
+            return self.function()
+
+        return self.path()
+
+    def arguments(self):
+        self.expect('(')
+        arguments = [self.operand()]
+        while self.symbol(','):
+            arguments.append(self.operand())
+        self.expect(')')
+        return arguments
+
+    def function(self):
+        name = self.next()[1].lower()
+        return ('fn', name, self.arguments())
+
+    # conditions
+
+    def condition(self):
+        node = self.conjunction()
+        while self.keyword('OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.keyword('AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.keyword('NOT'):
+            return ('not', self.negation())
+        return self.primary()
+
+    def primary(self):
+        if self.symbol('('):
+            node = self.condition()
+            self.expect(')')
+            return node
+
+        left = self.operand()
+        if left[0] == 'fn' and left[1] in ('attribute_exists', 'attribute_not_exists', 'begins_with', 'contains', 'attribute_type'):
+            return left
+
+        kind, text = self.peek()
+        if kind == 'symbol' and text in ('=', '<>', '<', '<=', '>', '>='):
+            self.position += 1
+            return ('cmp', text, left, self.operand())
+        if self.keyword('BETWEEN'):
+            low = self.operand()
+            if not self.keyword('AND'):
+                raise self.error("expected AND in BETWEEN")
+            return ('between', left, low, self.operand())
+        if self.keyword('IN'):
+            return ('in', left, self.arguments())
+
+        raise self.error(f"expected a comparison, found {text!r}")
+
+    # updates
+
+    def update(self):
+        actions = []
+        while self.peek()[0] is not None:
+            kind, text = self.next()
+            clause = text.upper() if kind == 'word' else None
+            if clause not in ('SET', 'REMOVE', 'ADD', 'DELETE'):
+                raise self.error(f"expected SET, REMOVE, ADD or DELETE, found {text!r}")
+
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append(('SET', path[1], self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path[1], None))
+                else:
+                    actions.append((clause, path[1], self.operand()))
+
+                if not self.symbol(','):
+                    break
+
+        if not actions:
+            raise self.error("the update expression is empty")
+        return actions
+
+    def set_value(self):
+        node = self.operand()
+        kind, text = self.peek()
+        if kind == 'symbol' and text in ('+', '-'):
+            self.position += 1
+            return ('arith', text, node, self.operand())
+        return node
+
+def _evaluate(node: tuple, item: dict):
+    """Evaluate an operand to an AttributeValue (or None) or a condition to a bool."""
+    kind = node[0]
+    if kind == 'path':
+        return item.get(node[1])
+    if kind == 'value':
+        return node[1]
+    if kind == 'and':
+        return _evaluate(node[1], item) and _evaluate(node[2], item)
+    if kind == 'or':
+        return _evaluate(node[1], item) or _evaluate(node[2], item)
+    if kind == 'not':
+        return not _evaluate(node[1], item)
+    if kind == 'cmp':
+        return _compare(node[1], _evaluate(node[2], item), _evaluate(node[3], item))
+    if kind == 'between':
+        value = _evaluate(node[1], item)
+        return _compare('>=', value, _evaluate(node[2], item)) and _compare('<=', value, _evaluate(node[3], item))
+    if kind == 'in':
+        value = _evaluate(node[1], item)
+        return any(_compare('=', value, _evaluate(option, item)) for option in node[2])
+    if kind == 'arith':
+        left, right = _evaluate(node[2], item), _evaluate(node[3], item)
+        if left is None or right is None or 'N' not in left or 'N' not in right:
+            raise ValueError("An operand in the update expression has an incorrect data type")
+        result = Decimal(left['N']) + Decimal(right['N']) if node[1] == '+' else Decimal(left['N']) - Decimal(right['N'])
+        return {'N': str(result)}
+
+    name, arguments = node[1], node[2]
+    if name == 'attribute_exists':
+        return arguments[0][1] in item
+    if name == 'attribute_not_exists':
+        return arguments[0][1] not in item
+    if name == 'attribute_type':
+        value = _evaluate(arguments[0], item)
+        return value is not None and next(iter(value)) == _evaluate(arguments[1], item).get('S')
+    if name == 'begins_with':
+        value, prefix = _evaluate(arguments[0], item), _evaluate(arguments[1], item)
+        if value is None or prefix is None:
+            return False
+        if 'S' in value and 'S' in prefix:
+            return value['S'].startswith(prefix['S'])
+        if 'B' in value and 'B' in prefix:
+            return bytes(value['B']).startswith(bytes(prefix['B']))
+        return False
+    if name == 'contains':
+        value, operand = _evaluate(arguments[0], item), _evaluate(arguments[1], item)
+        if value is None or operand is None:
+            return False
+        if 'S' in value and 'S' in operand:
+            return operand['S'] in value['S']
+        if any(kind in value for kind in ('SS', 'NS', 'BS')):
+            return _norm(operand)[1] in _norm(value)[1]
+        if 'L' in value:
+            return _norm(operand) in _norm(value)[1]
+        return False
+    if name == 'size':
+        value = _evaluate(arguments[0], item)
+        if value is None:
+            return None
+        (value_kind, data), = value.items()
+        return {'N': str(len(data.encode() if value_kind == 'S' else data))}
+    if name == 'if_not_exists':
+        value = _evaluate(arguments[0], item)
+        return value if value is not None else _evaluate(arguments[1], item)
+    if name == 'list_append':
+        first, second = _evaluate(arguments[0], item), _evaluate(arguments[1], item)
+        return {'L': [*first['L'], *second['L']]}
+
+    raise ValueError(f"unknown function {name}")
+
+###############################################################################
+# Client
+
+class _Events:
+    """The part of botocore's event emitter that hooks on a client use.
+
+    Handlers registered for `before-call.dynamodb` get every
+    `before-call.dynamodb.<Operation>` event, as with botocore.
+    """
+
+    def __init__(self):
+        self._handlers = []
+
+    def register(self, event_name: str, handler: callable, unique_id: str | None = None):
+        if unique_id is not None and any(existing == unique_id for _, _, existing in self._handlers):
+            return
+        self._handlers.append((event_name, handler, unique_id))
+
+    def emit(self, event_name: str, **kwargs):
+        return [
+            (handler, handler(event_name=event_name, **kwargs))
+            for name, handler, _ in self._handlers
+            if event_name == name or event_name.startswith(name + '.')
+        ]
+
+class _Model:
+    def __init__(self, name: str):
+        self.name = name
+
+class _ClientMeta:
+    def __init__(self):
+        self.events = _Events()
+
+def _operation(name: str):
+    """Emit botocore's provide-client-params, before-call and after-call
+    events around a MemoryClient call, so client hooks see it."""
+    model = _Model(name)
+
+    def decorate(method):
+        @functools.wraps(method)
+        def call(self, **params):
+            events = self.meta.events
+            if not events._handlers:
+                return method(self, **params)
+
+            context = {}
+            events.emit(f'provide-client-params.dynamodb.{name}', params=params, model=model, context=context)
+            events.emit(f'before-call.dynamodb.{name}', params=params, model=model, context=context)
+            try:
+                parsed = method(self, **params)
+            except ClientError as e:
+                events.emit(f'after-call.dynamodb.{name}', http_response=None, parsed=e.response, model=model, context=context)
+                raise
+            events.emit(f'after-call.dynamodb.{name}', http_response=None, parsed=parsed, model=model, context=context)
+            return parsed
+
+        return call
+
+    return decorate
+
+class MemoryClient:
+    """A DynamoDB client for one in-memory table, speaking the wire format.
+
+    `latency` (plus up to `jitter`) seconds are slept on every call, outside
+    the table lock, so concurrent callers overlap like they would against
+    the real service. `throttle_rate` is the chance that a call is
+    throttled: single item calls raise ProvisionedThroughputExceededException,
+    batch calls return that share of their requests as unprocessed, and
+    transactions are cancelled with ThrottlingError. Hooks registered on
+    `meta.events` see each call like they would on a botocore client.
+    """
+
+    def __init__(self, table_name: str = TABLE_NAME, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 indexes: dict | None = None, seed: int | None = None):
+        self.table_name = table_name
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.indexes = dict(INDEXES if indexes is None else indexes)
+        self.meta = _ClientMeta()
+        self.calls = Counter()
+        # read and write capacity units consumed, as DynamoDB would bill them
+        self.capacity = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        # hashKey -> rangeKey -> item
+        self._partitions = {}
+        # index -> partition value -> sort value -> {(hashKey, rangeKey)}
+        self._index_data = {name: {} for name in self.indexes}
+        # (index or None, partition value) -> (positions, keys), sorted;
+        # dropped whenever a key joins or leaves that partition
+        self._sorted = {}
+
+    # plumbing
+
+    def _table(self, TableName: str | None, operation: str):
+        if TableName != self.table_name:
+            raise _error('ResourceNotFoundException', f"Requested resource not found: Table: {TableName} not found", operation)
+
+    def _call(self, operation: str, TableName: str | None = None):
+        self.calls[operation] += 1
+        if TableName is not None:
+            self._table(TableName, operation)
+
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _throttled(self):
+        return self.throttle_rate > 0 and self._random.random() < self.throttle_rate
+
+    def _throttle(self, operation: str):
+        if self._throttled():
+            raise _error('ProvisionedThroughputExceededException', "The level of configured provisioned throughput for the table was exceeded.", operation)
+
+    def _key(self, key: dict, operation: str):
+        if set(key) != set(KEY) or any('S' not in key[name] or not key[name]['S'] for name in KEY):
+            raise _validation("The provided key element does not match the schema", operation)
+        return key[KEY[0]]['S'], key[KEY[1]]['S']
+
+    def _get(self, key: tuple):
+        return self._partitions.get(key[0], {}).get(key[1])
+
+    def _index_entry(self, name: str, item: dict):
+        partition, sort = self.indexes[name]
+        if partition not in item or sort not in item:
+            return None
+        return _sort_value(item[partition]), _sort_value(item[sort])
+
+    def _store(self, key: tuple, item: dict | None):
+        old = self._get(key)
+        if (old is None) != (item is None):
+            self._sorted.pop((None, key[0]), None)
+        for name in self.indexes:
+            before = self._index_entry(name, old) if old is not None else None
+            after = self._index_entry(name, item) if item is not None else None
+            if before != after:
+                for entry in (before, after):
+                    if entry:
+                        self._sorted.pop((name, entry[0]), None)
+            if old is not None:
+                entry = before
+                if entry:
+                    sorts = self._index_data[name][entry[0]]
+                    sorts[entry[1]].discard(key)
+                    if not sorts[entry[1]]:
+                        del sorts[entry[1]]
+                    if not sorts:
+                        del self._index_data[name][entry[0]]
+            if item is not None:
+                entry = after
+                if entry:
+                    self._index_data[name].setdefault(entry[0], {}).setdefault(entry[1], set()).add(key)
+
+        if item is None:
+            partition = self._partitions.get(key[0])
+            if partition is not None:
+                partition.pop(key[1], None)
+                if not partition:
+                    del self._partitions[key[0]]
+        else:
+            self._partitions.setdefault(key[0], {})[key[1]] = item
+
+    def _parser(self, expression: str, kwargs: dict, used: set, operation: str):
+        return _Parser(expression, kwargs.get('ExpressionAttributeNames') or {}, kwargs.get('ExpressionAttributeValues') or {}, used, operation)
+
+    def _check_unused(self, kwargs: dict, used: set, operation: str):
+        unused_names = set(kwargs.get('ExpressionAttributeNames') or {}) - used
+        if unused_names:
+            raise _validation(f"Value provided in ExpressionAttributeNames unused in expressions: keys: {{{', '.join(sorted(unused_names))}}}", operation)
+        unused_values = set(kwargs.get('ExpressionAttributeValues') or {}) - used
+        if unused_values:
+            raise _validation(f"Value provided in ExpressionAttributeValues unused in expressions: keys: {{{', '.join(sorted(unused_values))}}}", operation)
+
+    def _condition(self, kwargs: dict, used: set, operation: str):
+        if 'ConditionExpression' not in kwargs:
+            return None
+        parser = self._parser(kwargs['ConditionExpression'], kwargs, used, operation)
+        node = parser.condition()
+        parser.done()
+        return node
+
+    def _projection(self, kwargs: dict, used: set, operation: str):
+        if 'ProjectionExpression' not in kwargs:
+            return None
+        parser = self._parser(kwargs['ProjectionExpression'], kwargs, used, operation)
+        fields = [parser.path()[1]]
+        while parser.symbol(','):
+            fields.append(parser.path()[1])
+        parser.done()
+        return fields
+
+    def _project(self, item: dict, fields: list | None):
+        if fields is None:
+            return dict(item)
+        return {field: item[field] for field in fields if field in item}
+
+    def _index_writes(self, old: dict | None, new: dict | None):
+        # every index the item is in, or leaves, is written too
+        units = 0.0
+        for name in self.indexes:
+            before = self._index_entry(name, old) if old else None
+            after = self._index_entry(name, new) if new else None
+            if before is None and after is None:
+                continue
+            units += write_units(max(item_size(old), item_size(new)))
+            if before is not None and after is not None and before != after:
+                units += write_units(item_size(old))
+        return units
+
+    def _consumed(self, kwargs: dict, response: dict, read: float = 0.0, write: float = 0.0, many: bool = False):
+        self.capacity['read'] += read
+        self.capacity['write'] += write
+        if kwargs.get('ReturnConsumedCapacity', 'NONE') != 'NONE':
+            consumed = {
+                'TableName': self.table_name,
+                'CapacityUnits': read + write,
+                'ReadCapacityUnits': read,
+                'WriteCapacityUnits': write,
+            }
+            # batch and transaction calls report a list, one entry per table
+            response['ConsumedCapacity'] = [consumed] if many else consumed
+        return response
+
+    def _write_units(self, old: dict | None, new: dict | None):
+        return write_units(max(item_size(old), item_size(new))) + self._index_writes(old, new)
+
+    def _returned(self, item: dict | None, response: dict):
+        if item:
+            response['Attributes'] = dict(item)
+        return response
+
+    def _validate_item(self, item: dict, operation: str):
+        key = self._key({name: item.get(name, {}) for name in KEY}, operation)
+        for name, (partition, sort) in self.indexes.items():
+            for attribute in (partition, sort):
+                if attribute in item and ('S' not in item[attribute] or not item[attribute]['S']):
+                    raise _validation(f"One or more parameter values were invalid: Type mismatch for Index Key {attribute}", operation)
+        return key
+
+    def _apply_update(self, item: dict, actions: list, key: tuple, operation: str):
+        new = dict(item)
+        updated = []
+        for action, name, operand in actions:
+            if name in KEY:
+                raise _validation(f"One or more parameter values were invalid: Cannot update attribute {name}. This attribute is part of the key", operation)
+            updated.append(name)
+            try:
+                if action == 'SET':
+                    new[name] = _evaluate(operand, item)
+                    if new[name] is None:
+                        raise ValueError("The provided expression refers to an attribute that does not exist in the item")
+                elif action == 'REMOVE':
+                    new.pop(name, None)
+                elif action == 'ADD':
+                    value = _evaluate(operand, item)
+                    if 'N' in value:
+                        current = Decimal(new[name]['N']) if name in new else Decimal(0)
+                        new[name] = {'N': str(current + Decimal(value['N']))}
+                    else:
+                        (kind, data), = value.items()
+                        new[name] = {kind: list(dict.fromkeys([*new.get(name, {}).get(kind, []), *data]))}
+                else:
+                    value = _evaluate(operand, item)
+                    (kind, data), = value.items()
+                    remaining = [v for v in new.get(name, {}).get(kind, []) if v not in data]
+                    if remaining:
+                        new[name] = {kind: remaining}
+                    else:
+                        new.pop(name, None)
+            except (ValueError, KeyError, TypeError) as e:
+                raise _validation(f"Invalid UpdateExpression: {e}", operation)
+
+        new[KEY[0]], new[KEY[1]] = {'S': key[0]}, {'S': key[1]}
+        self._validate_item(new, operation)
+        return new, updated
+
+    # single item operations
+
+    @_operation('GetItem')
+    def get_item(self, TableName: str, Key: dict, **kwargs):
+        self._call('GetItem', TableName)
+        self._throttle('GetItem')
+        used = set()
+        fields = self._projection(kwargs, used, 'GetItem')
+        self._check_unused(kwargs, used, 'GetItem')
+        key = self._key(Key, 'GetItem')
+        with self._lock:
+            item = self._get(key)
+            response = {'Item': self._project(item, fields)} if item is not None else {}
+            return self._consumed(kwargs, response, read=read_units(item_size(item), kwargs.get('ConsistentRead', False)))
+
+    @_operation('PutItem')
+    def put_item(self, TableName: str, Item: dict, ReturnValues: str = 'NONE', **kwargs):
+        self._call('PutItem', TableName)
+        self._throttle('PutItem')
+        used = set()
+        condition = self._condition(kwargs, used, 'PutItem')
+        self._check_unused(kwargs, used, 'PutItem')
+        key = self._validate_item(Item, 'PutItem')
+        with self._lock:
+            old = self._get(key)
+            if condition is not None and not _evaluate(condition, old or {}):
+                self._consumed(kwargs, {}, write=write_units(item_size(Item)))
+                raise _error('ConditionalCheckFailedException', "The conditional request failed", 'PutItem')
+            self._store(key, dict(Item))
+            response = self._returned(old if ReturnValues == 'ALL_OLD' else None, {})
+            return self._consumed(kwargs, response, write=self._write_units(old, Item))
+
+    @_operation('UpdateItem')
+    def update_item(self, TableName: str, Key: dict, ReturnValues: str = 'NONE', **kwargs):
+        self._call('UpdateItem', TableName)
+        self._throttle('UpdateItem')
+        used = set()
+        actions = []
+        if 'UpdateExpression' in kwargs:
+            parser = self._parser(kwargs['UpdateExpression'], kwargs, used, 'UpdateItem')
+            actions = parser.update()
+            parser.done()
+        condition = self._condition(kwargs, used, 'UpdateItem')
+        self._check_unused(kwargs, used, 'UpdateItem')
+        key = self._key(Key, 'UpdateItem')
+        with self._lock:
+            old = self._get(key)
+            if condition is not None and not _evaluate(condition, old or {}):
+                self._consumed(kwargs, {}, write=write_units(item_size(old)))
+                raise _error('ConditionalCheckFailedException', "The conditional request failed", 'UpdateItem')
+            new, updated = self._apply_update(old or {}, actions, key, 'UpdateItem')
+            self._store(key, new)
+
+        returned = None
+        if ReturnValues == 'ALL_NEW':
+            returned = new
+        elif ReturnValues == 'ALL_OLD':
+            returned = old
+        elif ReturnValues == 'UPDATED_NEW':
+            returned = {name: new[name] for name in updated if name in new}
+        elif ReturnValues == 'UPDATED_OLD':
+            returned = {name: old[name] for name in updated if old and name in old}
+        return self._consumed(kwargs, self._returned(returned, {}), write=self._write_units(old, new))
+
+    @_operation('DeleteItem')
+    def delete_item(self, TableName: str, Key: dict, ReturnValues: str = 'NONE', **kwargs):
+        self._call('DeleteItem', TableName)
+        self._throttle('DeleteItem')
+        used = set()
+        condition = self._condition(kwargs, used, 'DeleteItem')
+        self._check_unused(kwargs, used, 'DeleteItem')
+        key = self._key(Key, 'DeleteItem')
+        with self._lock:
+            old = self._get(key)
+            if condition is not None and not _evaluate(condition, old or {}):
+                self._consumed(kwargs, {}, write=write_units(item_size(old)))
+                raise _error('ConditionalCheckFailedException', "The conditional request failed", 'DeleteItem')
+            if old is not None:
+                self._store(key, None)
+            response = self._returned(old if ReturnValues == 'ALL_OLD' else None, {})
+            return self._consumed(kwargs, response, write=self._write_units(old, None))
+
+    # reads of many items
+
+    def _key_condition(self, kwargs: dict, used: set, schema: tuple):
+        parser = self._parser(kwargs['KeyConditionExpression'], kwargs, used, 'Query')
+        node = parser.condition()
+        parser.done()
+
+        conditions = []
+        def flatten(node):
+            if node[0] == 'and':
+                flatten(node[1])
+                flatten(node[2])
+            else:
+                conditions.append(node)
+        flatten(node)
+
+        partition = sort = None
+        for condition in conditions:
+            attribute = None
+            if condition[0] == 'cmp' and condition[2][0] == 'path':
+                attribute = condition[2][1]
+            elif condition[0] in ('between',) or (condition[0] == 'fn' and condition[1] == 'begins_with'):
+                target = condition[1] if condition[0] == 'between' else condition[2][0]
+                attribute = target[1] if target[0] == 'path' else None
+
+            if attribute == schema[0] and condition[0] == 'cmp' and condition[1] == '=' and partition is None:
+                partition = condition[3]
+            elif attribute == schema[1] and sort is None:
+                sort = condition
+            else:
+                raise _validation("Query key condition not supported", 'Query')
+
+        if partition is None or partition[0] != 'value':
+            raise _validation("Query condition missed key schema element: " + schema[0], 'Query')
+        return _sort_value(partition[1]), sort
+
+    def _sorted_keys(self, index: str | None, partition: any):
+        """Positions and keys of a partition in sort order, cached between calls."""
+        cached = self._sorted.get((index, partition))
+        if cached is None:
+            if index is None:
+                keys = [((rangeKey,), (partition, rangeKey)) for rangeKey in sorted(self._partitions.get(partition, {}))]
+            else:
+                sorts = self._index_data[index].get(partition, {})
+                keys = [((value, *key), key) for value in sorted(sorts) for key in sorted(sorts[value])]
+            cached = self._sorted[(index, partition)] = ([position for position, _ in keys], [key for _, key in keys])
+        return cached
+
+    def _candidates(self, index: str | None, partition: any, sort: tuple | None, forward: bool, start: tuple | None):
+        """Yield keys in the partition that may match `sort`, in query order, after `start`."""
+        value = None
+        if sort is not None and sort[0] == 'cmp' and sort[3][0] == 'value':
+            value = _sort_value(sort[3][1])
+            if sort[1] == '=' and index is None:
+                # a single item, no need to sort the partition
+                if value in self._partitions.get(partition, {}) and (start is None or (start < (value,) if forward else start > (value,))):
+                    yield (partition, value)
+                return
+
+        positions, keys = self._sorted_keys(index, partition)
+        low, high = 0, len(keys)
+        if sort is not None and sort[0] == 'fn' and sort[1] == 'begins_with' and sort[2][1][0] == 'value':
+            prefix = _sort_value(sort[2][1][1])
+            low = bisect.bisect_left(positions, (prefix,))
+        elif sort is not None and sort[0] == 'between':
+            low = bisect.bisect_left(positions, (_sort_value(sort[2][1]),))
+        elif value is not None and sort[1] in ('=', '>', '>='):
+            low = bisect.bisect_left(positions, (value,))
+        if start is not None:
+            if forward:
+                low = max(low, bisect.bisect_right(positions, start))
+            else:
+                high = min(high, bisect.bisect_left(positions, start))
+
+        # the caller stops at the first key past the sort condition's range
+        for i in (range(low, high) if forward else range(high - 1, low - 1, -1)):
+            yield keys[i]
+
+    def _position(self, index: str | None, start: dict, partition: any):
+        schema = KEY if index is None else self.indexes[index]
+        if any(name not in start for name in {*KEY, *schema}):
+            raise _validation("The provided starting key is invalid", 'Query')
+        # like DynamoDB, a start key from another partition is rejected
+        # rather than read from
+        if _sort_value(start[schema[0]]) != partition:
+            raise _validation("The provided starting key is outside query boundaries based on provided conditions", 'Query')
+
+        key = self._key({name: start[name] for name in KEY}, 'Query')
+        if index is None:
+            return (key[1],)
+        return (_sort_value(start[schema[1]]), *key)
+
+    def _last_key(self, index: str | None, item: dict):
+        key = {name: item[name] for name in KEY}
+        if index is not None:
+            key.update({name: item[name] for name in self.indexes[index]})
+        return key
+
+    def _filter(self, kwargs: dict, used: set, operation: str, keys: set):
+        if 'FilterExpression' not in kwargs:
+            return None
+
+        parser = self._parser(kwargs['FilterExpression'], kwargs, used, operation)
+        filter = parser.condition()
+        parser.done()
+        # a Query cannot filter on the key of the table or index it reads
+        for name in _paths(filter):
+            if name in keys:
+                raise _validation(f"Filter Expression can only contain non-primary key attributes: Primary key attribute: {name}", operation)
+        return filter
+
+    @_operation('Query')
+    def query(self, TableName: str, KeyConditionExpression: str, IndexName: str | None = None, Limit: int | None = None,
+              ExclusiveStartKey: dict | None = None, ScanIndexForward: bool = True, ConsistentRead: bool = False,
+              Select: str | None = None, **kwargs):
+        self._call('Query', TableName)
+        self._throttle('Query')
+        if IndexName is not None and IndexName not in self.indexes:
+            raise _validation(f"The table does not have the specified index: {IndexName}", 'Query')
+        if IndexName is not None and ConsistentRead:
+            raise _validation("Consistent reads are not supported on global secondary indexes", 'Query')
+
+        kwargs['KeyConditionExpression'] = KeyConditionExpression
+        schema = KEY if IndexName is None else self.indexes[IndexName]
+        used = set()
+        partition, sort = self._key_condition(kwargs, used, schema)
+        filter = self._filter(kwargs, used, 'Query', set(schema))
+        fields = self._projection(kwargs, used, 'Query')
+        self._check_unused(kwargs, used, 'Query')
+
+        with self._lock:
+            start = self._position(IndexName, ExclusiveStartKey, partition) if ExclusiveStartKey else None
+            items, evaluated, size, last = [], 0, 0, None
+            for key in self._candidates(IndexName, partition, sort, ScanIndexForward, start):
+                item = self._get(key)
+                if sort is not None and not _evaluate(sort, item):
+                    # keys are in order, so once past the range nothing else matches
+                    if ScanIndexForward and (sort[0] != 'cmp' or sort[1] in ('=', '<', '<=')):
+                        break
+                    continue
+                evaluated += 1
+                size += item_size(item)
+                if filter is None or _evaluate(filter, item):
+                    items.append(self._project(item, fields))
+                if (Limit is not None and evaluated >= Limit) or size >= MAX_PAGE_SIZE:
+                    last = self._last_key(IndexName, item)
+                    break
+
+        response = {'Count': len(items), 'ScannedCount': evaluated}
+        if Select != 'COUNT':
+            response['Items'] = items
+        if last is not None:
+            response['LastEvaluatedKey'] = last
+        # a query or scan is billed for everything it read, not what it returned
+        return self._consumed(kwargs, response, read=read_units(size, ConsistentRead))
+
+    @_operation('Scan')
+    def scan(self, TableName: str, Limit: int | None = None, ExclusiveStartKey: dict | None = None,
+             Segment: int | None = None, TotalSegments: int | None = None, Select: str | None = None, ConsistentRead: bool = False, **kwargs):
+        self._call('Scan', TableName)
+        self._throttle('Scan')
+        if (Segment is None) != (TotalSegments is None) or (TotalSegments is not None and not 0 <= Segment < TotalSegments):
+            raise _validation("Segment and TotalSegments must be given together, with 0 <= Segment < TotalSegments", 'Scan')
+
+        used = set()
+        # unlike a Query, a Scan may filter on key attributes
+        filter = self._filter(kwargs, used, 'Scan', set())
+        fields = self._projection(kwargs, used, 'Scan')
+        self._check_unused(kwargs, used, 'Scan')
+
+        with self._lock:
+            partitions = sorted(
+                partition for partition in self._partitions
+                if TotalSegments is None or zlib.crc32(partition.encode()) % TotalSegments == Segment
+            )
+            start = self._key(ExclusiveStartKey, 'Scan') if ExclusiveStartKey else None
+
+            items, evaluated, size, last = [], 0, 0, None
+            for partition in partitions:
+                if start is not None and partition < start[0]:
+                    continue
+                for rangeKey in sorted(self._partitions[partition]):
+                    if start is not None and (partition, rangeKey) <= start:
+                        continue
+                    item = self._partitions[partition][rangeKey]
+                    evaluated += 1
+                    size += item_size(item)
+                    if filter is None or _evaluate(filter, item):
+                        items.append(self._project(item, fields))
+                    if (Limit is not None and evaluated >= Limit) or size >= MAX_PAGE_SIZE:
+                        last = self._last_key(None, item)
+                        break
+                if last is not None:
+                    break
+
+        response = {'Count': len(items), 'ScannedCount': evaluated}
+        if Select != 'COUNT':
+            response['Items'] = items
+        if last is not None:
+            response['LastEvaluatedKey'] = last
+        # a query or scan is billed for everything it read, not what it returned
+        return self._consumed(kwargs, response, read=read_units(size, ConsistentRead))
+
+    # batches and transactions
+
+    @_operation('BatchGetItem')
+    def batch_get_item(self, RequestItems: dict, **kwargs):
+        self._call('BatchGetItem')
+        if sum(len(request['Keys']) for request in RequestItems.values()) > BATCH_GET_SIZE:
+            raise _validation(f"Too many items requested for the BatchGetItem call", 'BatchGetItem')
+
+        responses, unprocessed, read = {}, {}, 0.0
+        for table_name, request in RequestItems.items():
+            self._table(table_name, 'BatchGetItem')
+            used = set()
+            fields = self._projection(request, used, 'BatchGetItem')
+            self._check_unused(request, used, 'BatchGetItem')
+            keys = [self._key(key, 'BatchGetItem') for key in request['Keys']]
+            if len(set(keys)) != len(keys):
+                raise _validation("Provided list of item keys contains duplicates", 'BatchGetItem')
+
+            found, skipped = [], []
+            with self._lock:
+                for key, wire_key in zip(keys, request['Keys']):
+                    if self._throttled():
+                        skipped.append(wire_key)
+                        continue
+                    item = self._get(key)
+                    read += read_units(item_size(item), request.get('ConsistentRead', False))
+                    if item is not None:
+                        found.append(self._project(item, fields))
+
+            responses[table_name] = found
+            if skipped:
+                unprocessed[table_name] = {**request, 'Keys': skipped}
+
+        return self._consumed(kwargs, {'Responses': responses, 'UnprocessedKeys': unprocessed}, read=read, many=True)
+
+    @_operation('BatchWriteItem')
+    def batch_write_item(self, RequestItems: dict, **kwargs):
+        self._call('BatchWriteItem')
+        if sum(len(requests) for requests in RequestItems.values()) > BATCH_WRITE_SIZE:
+            raise _validation("Too many items requested for the BatchWriteItem call", 'BatchWriteItem')
+
+        unprocessed, write = {}, 0.0
+        for table_name, requests in RequestItems.items():
+            self._table(table_name, 'BatchWriteItem')
+            writes = []
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = request['PutRequest']['Item']
+                    writes.append((self._validate_item(item, 'BatchWriteItem'), dict(item), request))
+                else:
+                    writes.append((self._key(request['DeleteRequest']['Key'], 'BatchWriteItem'), None, request))
+            if len({key for key, _, _ in writes}) != len(writes):
+                raise _validation("Provided list of item keys contains duplicates", 'BatchWriteItem')
+
+            skipped = []
+            with self._lock:
+                for key, item, request in writes:
+                    if self._throttled():
+                        skipped.append(request)
+                    else:
+                        write += self._write_units(self._get(key), item)
+                        self._store(key, item)
+
+            if skipped:
+                unprocessed[table_name] = skipped
+
+        return self._consumed(kwargs, {'UnprocessedItems': unprocessed}, write=write, many=True)
+
+    @_operation('TransactWriteItems')
+    def transact_write_items(self, TransactItems: list, **kwargs):
+        self._call('TransactWriteItems')
+        if len(TransactItems) > TRANSACT_SIZE:
+            raise _validation(f"Member must have length less than or equal to {TRANSACT_SIZE}", 'TransactWriteItems')
+
+        # parse and validate everything before touching the table
+        plan = []
+        for transact in TransactItems:
+            (action, request), = transact.items()
+            self._table(request.get('TableName'), 'TransactWriteItems')
+            used = set()
+            actions = []
+            if action == 'Update':
+                parser = self._parser(request['UpdateExpression'], request, used, 'TransactWriteItems')
+                actions = parser.update()
+                parser.done()
+            condition = self._condition(request, used, 'TransactWriteItems')
+            self._check_unused(request, used, 'TransactWriteItems')
+            if action == 'Put':
+                key = self._validate_item(request['Item'], 'TransactWriteItems')
+            else:
+                key = self._key(request['Key'], 'TransactWriteItems')
+            plan.append((action, key, condition, actions, request))
+
+        if len({key for _, key, _, _, _ in plan}) != len(plan):
+            raise _validation("Transaction request cannot include multiple operations on one item", 'TransactWriteItems')
+
+        if self._throttled():
+            raise _error('TransactionCanceledException', "Transaction cancelled, please refer cancellation reasons for specific reasons [ThrottlingError]", 'TransactWriteItems',
+                         CancellationReasons=[{'Code': 'ThrottlingError', 'Message': 'Throughput exceeds the current capacity for one or more global secondary indexes.'}] + [{'Code': 'None'}] * (len(plan) - 1))
+
+        with self._lock:
+            reasons = []
+            for action, key, condition, _, _ in plan:
+                if condition is not None and not _evaluate(condition, self._get(key) or {}):
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+                else:
+                    reasons.append({'Code': 'None'})
+
+            if any(reason['Code'] != 'None' for reason in reasons):
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise _error('TransactionCanceledException', f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]", 'TransactWriteItems', CancellationReasons=reasons)
+
+            writes = []
+            for action, key, _, actions, request in plan:
+                if action == 'Put':
+                    writes.append((key, dict(request['Item'])))
+                elif action == 'Update':
+                    writes.append((key, self._apply_update(self._get(key) or {}, actions, key, 'TransactWriteItems')[0]))
+                elif action == 'Delete':
+                    writes.append((key, None))
+            # transactional writes cost twice as much as plain ones
+            write = 0.0
+            for key, item in writes:
+                write += 2 * self._write_units(self._get(key), item)
+                self._store(key, item)
+            write += 2 * sum(write_units(item_size(self._get(key))) for action, key, *_ in plan if action == 'ConditionCheck')
+
+        return self._consumed(kwargs, {}, write=write, many=True)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._sorted.clear()
+            for data in self._index_data.values():
+                data.clear()
+            self.calls.clear()
+            self.capacity.clear()
+
+###############################################################################
+# Resource face
+
+def _encode(params: dict, *fields: str):
+    return {
+        k: codec.encode_item(v) if k in fields and v is not None else v
+        for k, v in params.items()
+    }
+
+class _ResourceClient:
+    """The subset of `table.meta.client` refactor_db uses, taking Python types."""
+
+    def __init__(self, client: MemoryClient):
+        self._client = client
+
+    def transact_write_items(self, TransactItems: list, **kwargs):
+        items = []
+        for transact in TransactItems:
+            (action, request), = transact.items()
+            items.append({action: _encode(request, 'Item', 'Key', 'ExpressionAttributeValues')})
+
+        return self._client.transact_write_items(TransactItems=items, **kwargs)
+
+class _Meta:
+    def __init__(self, client: MemoryClient):
+        self.client = _ResourceClient(client)
+
+class MemoryTable:
+    """An in-memory stand-in for a boto3 DynamoDB `Table`.
+
+    Pass it anywhere refactor_db takes a `table`. Reads that go through
+    `connection.low_level_client(table)` use its `low_level_client`. See
+    MemoryClient for the latency and throttling settings.
+    """
+
+    def __init__(self, table_name: str = TABLE_NAME, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 indexes: dict | None = None, seed: int | None = None):
+        self.table_name = table_name
+        self.low_level_client = MemoryClient(table_name, latency, jitter, throttle_rate, indexes, seed)
+        self.meta = _Meta(self.low_level_client)
+
+    @property
+    def calls(self):
+        return self.low_level_client.calls
+
+    @property
+    def capacity(self):
+        return self.low_level_client.capacity
+
+    def _decode(self, response: dict):
+        if 'Item' in response:
+            response['Item'] = _item_from_wire(response['Item'])
+        if 'Attributes' in response:
+            response['Attributes'] = _item_from_wire(response['Attributes'])
+        if 'Items' in response:
+            response['Items'] = [_item_from_wire(item) for item in response['Items']]
+        if 'LastEvaluatedKey' in response:
+            response['LastEvaluatedKey'] = _item_from_wire(response['LastEvaluatedKey'])
+        return response
+
+    def get_item(self, **kwargs):
+        return self._decode(self.low_level_client.get_item(TableName=self.table_name, **_encode(kwargs, 'Key', 'ExpressionAttributeValues')))
+
+    def put_item(self, **kwargs):
+        return self._decode(self.low_level_client.put_item(TableName=self.table_name, **_encode(kwargs, 'Item', 'ExpressionAttributeValues')))
+
+    def update_item(self, **kwargs):
+        return self._decode(self.low_level_client.update_item(TableName=self.table_name, **_encode(kwargs, 'Key', 'ExpressionAttributeValues')))
+
+    def delete_item(self, **kwargs):
+        return self._decode(self.low_level_client.delete_item(TableName=self.table_name, **_encode(kwargs, 'Key', 'ExpressionAttributeValues')))
+
+    def query(self, **kwargs):
+        return self._decode(self.low_level_client.query(TableName=self.table_name, **_encode(kwargs, 'ExclusiveStartKey', 'ExpressionAttributeValues')))
+
+    def scan(self, **kwargs):
+        return self._decode(self.low_level_client.scan(TableName=self.table_name, **_encode(kwargs, 'ExclusiveStartKey', 'ExpressionAttributeValues')))
+
+    def clear(self):
+        self.low_level_client.clear()
@@ -0,0 +1,154 @@
+import json, os, threading, time
+
+# DynamoDB cost and latency per handler invocation, emitted as one
+# CloudWatch Embedded Metric Format (EMF) log line. Calls are measured by
+# hooks on the botocore client (see `instrument`), so refactor_db's call
+# sites do not change. Set DDB_METRICS=0 to turn it off.
+ENABLED = os.environ.get('DDB_METRICS', '1').lower() not in ('0', 'false')
+NAMESPACE = os.environ.get('DDB_METRICS_NAMESPACE', 'Refactor')
+# EMF accepts at most 100 values for one metric in one record
+MAX_VALUES = 100
+
+# operations that accept ReturnConsumedCapacity
+READ_OPERATIONS = {'GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'}
+WRITE_OPERATIONS = {'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'}
+OPERATIONS = READ_OPERATIONS | WRITE_OPERATIONS
+
+class Invocation:
+    """The DynamoDB calls made while handling one event."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = 0
+        self.errors = 0
+        self.read = 0.0
+        self.write = 0.0
+        self.time = 0.0
+        self.operations = {}
+        # per call latency in ms, for percentiles; the first MAX_VALUES calls
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float, response: dict):
+        read, write = consumed(operation, response)
+        with self._lock:
+            self.calls += 1
+            self.errors += 1 if 'Error' in response else 0
+            self.read += read
+            self.write += write
+            self.time += seconds
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+            if len(self.latencies) < MAX_VALUES:
+                self.latencies.append(round(seconds * 1000, 3))
+
+        return read, write
+
+def _declarations(*names: tuple[str, str]):
+    return json.dumps([{
+        'Namespace': NAMESPACE,
+        'Dimensions': [['Action']],
+        'Metrics': [{'Name': name, 'Unit': unit} for name, unit in names],
+    }], separators=(',', ':'))
+
+METRICS = (
+    ('Duration', 'Milliseconds'),
+    ('Errors', 'Count'),
+    ('DynamoDBCalls', 'Count'),
+    ('DynamoDBErrors', 'Count'),
+    ('DynamoDBTime', 'Milliseconds'),
+    ('ReadCapacityUnits', 'Count'),
+    ('WriteCapacityUnits', 'Count'),
+)
+_DECLARATIONS = _declarations(*METRICS)
+_DECLARATIONS_WITH_LATENCY = _declarations(*METRICS, ('DynamoDBLatency', 'Milliseconds'))
+
+# A Lambda container handles one event at a time, so there is one current
+# invocation. It is shared with the threads a batch fans out to.
+_current = None
+
+def consumed(operation: str, response: dict):
+    """(read units, write units) from a response's ConsumedCapacity."""
+    capacity = response.get('ConsumedCapacity')
+    if not capacity:
+        return 0.0, 0.0
+
+    read = write = 0.0
+    # batch and transaction calls report a list, one entry per table
+    for entry in capacity if isinstance(capacity, list) else [capacity]:
+        if 'ReadCapacityUnits' in entry or 'WriteCapacityUnits' in entry:
+            read += entry.get('ReadCapacityUnits', 0.0)
+            write += entry.get('WriteCapacityUnits', 0.0)
+        elif operation in READ_OPERATIONS:
+            read += entry.get('CapacityUnits', 0.0)
+        else:
+            write += entry.get('CapacityUnits', 0.0)
+
+    return float(read), float(write)
+
+def _provide_params(params: dict, model: any, context: dict, **kwargs):
+    if _current is not None and model.name in OPERATIONS and 'ReturnConsumedCapacity' not in params:
+        params['ReturnConsumedCapacity'] = 'TOTAL'
+        context['metrics_capacity'] = True
+
+def _before_call(context: dict, **kwargs):
+    context['metrics_started'] = time.perf_counter()
+
+def _after_call(parsed: dict, model: any, context: dict, **kwargs):
+    invocation = _current
+    if invocation is None or 'metrics_started' not in context:
+        return
+
+    context['consumed'] = invocation.record(model.name, time.perf_counter() - context['metrics_started'], parsed)
+    # callers get the response they asked for
+    if context.get('metrics_capacity'):
+        parsed.pop('ConsumedCapacity', None)
+
+def instrument(client: any):
+    """Measure every call `client` makes while an invocation is running."""
+    if not ENABLED:
+        return client
+
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _provide_params, unique_id='refactor-metrics-params')
+    events.register('before-call.dynamodb', _before_call, unique_id='refactor-metrics-before')
+    events.register('after-call.dynamodb', _after_call, unique_id='refactor-metrics-after')
+    return client
+
+def begin():
+    """Start measuring a new invocation; calls before this are not counted."""
+    global _current
+    _current = Invocation() if ENABLED else None
+    return _current
+
+def end(action: str | None, status: int, context: any = None):
+    """Stop measuring and emit the invocation's EMF record."""
+    global _current
+    invocation, _current = _current, None
+    if invocation is None:
+        return None
+
+    record = {
+        'Action': action or 'unknown',
+        'Duration': round((time.perf_counter() - invocation.started) * 1000, 3),
+        'Errors': 0 if status < 400 else 1,
+        'DynamoDBCalls': invocation.calls,
+        'DynamoDBErrors': invocation.errors,
+        'DynamoDBTime': round(invocation.time * 1000, 3),
+        'ReadCapacityUnits': invocation.read,
+        'WriteCapacityUnits': invocation.write,
+        # not metrics, but searchable with CloudWatch Logs Insights
+        'StatusCode': status,
+        'Operations': invocation.operations,
+    }
+    # an invocation served from the cache has no call latencies to report
+    if invocation.latencies:
+        record['DynamoDBLatency'] = invocation.latencies
+
+    request_id = getattr(context, 'aws_request_id', None)
+    if request_id:
+        record['RequestId'] = request_id
+
+    # the metric declarations never change, so they are serialized once
+    declarations = _DECLARATIONS_WITH_LATENCY if invocation.latencies else _DECLARATIONS
+    print(f'{{"_aws":{{"Timestamp":{int(time.time() * 1000)},"CloudWatchMetrics":{declarations}}},{json.dumps(record, separators=(",", ":"))[1:]}')
+    return record
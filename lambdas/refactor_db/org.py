@@ -1,6 +1,11 @@
 from typing import TypedDict, NotRequired
 from datetime import datetime
+from . import errors
 from .id import generate_id, is_valid_id
+from . import cascade as cascades, codec, shard, trace
+from .connection import low_level_client
+from .paginate import query_pages, query_all, scatter_pages, scatter_all
+from .projection import project
 
 OBJECT_TYPE='ORG'
 
@@ -11,20 +16,10 @@ class Org(TypedDict):
     updatedAt: NotRequired[int]
     deletedAt: NotRequired[int]
 
+@trace.traced('org.add')
 def add(table: any, item: Org, verbose: bool = False):
-    if verbose:
-        print(f"function: org add()")
-        print(f"table name: {table.table_name}")
-        print(f"item: {item}")
-
-    # validate orgId format and if it already exists
-    if 'orgId' in item and is_valid_id(OBJECT_TYPE, item['orgId']):
-        org = find(table, item['orgId'], item['orgId'], verbose)
-        if 'orgId' in org:
-            print(f"Error: orgId already exists: {item['orgId']}")
-            # TODO: Return an error object instead
-            return {}
-    else:
+    # an existing orgId is rejected by the conditional put below
+    if 'orgId' not in item or not is_valid_id(OBJECT_TYPE, item['orgId']):
         item['orgId'] = generate_id(OBJECT_TYPE)
 
     now = int(datetime.now().timestamp())
@@ -37,91 +32,128 @@ def add(table: any, item: Org, verbose: bool = False):
                 'rangeKey': item["orgId"],
                 'itemType': OBJECT_TYPE,
                 'id': item["orgId"],
+                'itemTypeShard': shard.shard(OBJECT_TYPE, item["orgId"]),
                 'orgId': item["orgId"],
                 'orgName': item["name"],
                 'createdAt': item['createdAt'],
                 'updatedAt': item['updatedAt'],
-            }
+            },
+            ConditionExpression='attribute_not_exists(rangeKey)',
         )
-    except Exception as e:
+    except errors.ClientError as e:
+        if errors.is_condition_failed(e):
+            print(f"Error: orgId already exists: {item['orgId']}")
+            return errors.already_exists("orgId", item['orgId'])
+
         print(f"Error: {e}")
         response = e
         # TODO: return an error object instead
         item = {}
 
-    if verbose:
-        print(f"response: {response}")
-        print(f"org: {item}")
-
     return item
 
-def delete(table: any, item: Org, verbose: bool = False):
-    if verbose:
-        print(f"function: org delete()")
-        print(f"table name: {table.table_name}")
-        print(f"org: {item}")
-
+@trace.traced('org.delete')
+def delete(table: any, item: Org, verbose: bool = False, cascade: bool = True, cursor: str | None = None,
+           deadline: float | None = None, max_workers: int = cascades.MAX_WORKERS):
     now = int(datetime.now().timestamp())
-    update_expression = "SET deletedAt = :d"
+    # if_not_exists keeps the first deletedAt when a delete is repeated or
+    # resumed, since restore matches the org's users against it
+    update_expression = "SET deletedAt = if_not_exists(deletedAt, :d)"
     expression_values = {
         ":d": now,
     }
 
     try:
-        # TODO: delete all users in the org
         response = table.update_item(
             Key={
                 'hashKey': item["orgId"],
                 'rangeKey': item["orgId"],
             },
                 UpdateExpression=update_expression,
-                ExpressionAttributeValues=expression_values
+                ConditionExpression="attribute_exists(rangeKey)",
+                ExpressionAttributeValues=expression_values,
+                ReturnValues="ALL_NEW"
             )
-    except Exception as e:
+    except errors.ClientError as e:
         print(f"Error: {e}")
-        response = e
-        item = {}
+        if errors.is_condition_failed(e):
+            return errors.not_found("org", item["orgId"])
+
+        return {"error": f"Error: {e}"}
 
-    item['deletedAt'] = now
-    if verbose:
-        print(f"response: {response}")
-        print(f"org: {item}")
+    item['deletedAt'] = int(response['Attributes']['deletedAt'])
+
+    if cascade:
+        item['cascade'] = cascades.cascade(
+            table, item["orgId"], cascades.DELETE, item['deletedAt'], cursor, deadline, max_workers, verbose=verbose
+        )
 
     return item 
 
-def restore(table: any, orgId: str, verbose: bool = False):
-    if verbose:
-        print(f"function: org restore()")
-        print(f"table name: {table.table_name}")
-        print(f"orgId: {orgId}")
+@trace.traced('org.restore')
+def restore(table: any, orgId: str, verbose: bool = False, cascade: bool = True, cursor: str | None = None,
+            deadline: float | None = None, max_workers: int = cascades.MAX_WORKERS):
+    # users are restored first; the org keeps its deletedAt until they are
+    # all done so an interrupted restore can resume
+    summary = None
+    if cascade:
+        org = find(table, orgId, verbose, consistent=True)
+        if 'error' in org:
+            return org
+        if not org:
+            return errors.not_found("org", orgId)
+
+        if 'deletedAt' in org:
+            summary = cascades.cascade(
+                table, orgId, cascades.RESTORE, org['deletedAt'], cursor, deadline, max_workers, verbose=verbose
+            )
+            if not summary['complete']:
+                return {**org, 'cascade': summary}
 
     update_expression = "REMOVE deletedAt"
 
     try:
-        # TODO: restore all users in the org
         response = table.update_item(
             Key={
                 'hashKey': orgId,
                 'rangeKey': orgId,
             },
             UpdateExpression=update_expression,
+            ConditionExpression="attribute_exists(rangeKey)",
             ReturnValues="ALL_NEW"
         )
-    except Exception as e:
+    except errors.ClientError as e:
         print(f"Error: {e}")
-        response = e
-        item = {}
+        if errors.is_condition_failed(e):
+            return errors.not_found("org", orgId)
+
+        return {"error": f"Error: {e}"}
+
+    org = codec.normalize(response['Attributes'])
+    if summary is not None:
+        org['cascade'] = summary
 
-    if verbose:
-        print(f"response: {response}")
+    return org
 
-    return response['Attributes']
+@trace.traced('org.destroy')
+def destroy(table: any, orgId: str, verbose: bool = False, force: bool = False, cascade: bool = True, cursor: str | None = None,
+            deadline: float | None = None, max_workers: int = cascades.MAX_WORKERS):
+    # the org item goes last so an interrupted destroy can resume
+    summary = None
+    if cascade:
+        org = find(table, orgId, verbose, consistent=True)
+        if 'error' in org:
+            return org
+        # without force, only an org marked for deletion loses its collection
+        if not force and not org:
+            return errors.not_found("org", orgId)
+        if not force and 'deletedAt' not in org:
+            print(f"Error: org is not marked for deletion: {orgId}")
+            return {"error": f"Error: org is not marked for deletion: {orgId}"}
 
-def destroy(table: any, orgId: str, verbose: bool = False, force: bool = False):
-    if verbose:
-        print(f"function: org destroy()")
-        print(f"table name: {table.table_name}")
-        print(f"orgId: {orgId}")
+        summary = cascades.cascade(table, orgId, cascades.DESTROY, None, cursor, deadline, max_workers, verbose=verbose)
+        if not summary['complete']:
+            return {'cascade': summary}
 
     try:
         if force:
@@ -131,48 +163,54 @@ def destroy(table: any, orgId: str, verbose: bool = False, force: bool = False):
                     'rangeKey': orgId,
                 },
             )
-            return response
-
-        response = table.delete_item(
-            Key={
-                'hashKey': orgId,
-                'rangeKey': orgId,
-            },
-            ConditionExpression="attribute_exists(deletedAt)"
-        )
-        return response
-    except Exception as e:
-        if e['errorType'] == 'TypeError':
+        else:
+            response = table.delete_item(
+                Key={
+                    'hashKey': orgId,
+                    'rangeKey': orgId,
+                },
+                ConditionExpression="attribute_exists(deletedAt)"
+            )
+    except errors.ClientError as e:
+        if errors.is_condition_failed(e):
             print(f"Error: org is not marked for deletion: {orgId}")
+            return {"error": f"Error: org is not marked for deletion: {orgId}"}
 
-def update(table: any, item: Org, verbose: bool = False):
-    if verbose:
-        print(f"function: org update()")
-        print(f"table name: {table.table_name}")
-        print(f"org: {item}")
+        return {"error": f"Error: {e}"}
 
+    if summary is not None:
+        response['cascade'] = summary
+
+    return response
+
+@trace.traced('org.update')
+def update(table: any, item: Org, verbose: bool = False):
     update_expression = "SET orgName = :n, updatedAt = :u"
     expression_values = {
         ":n": item["orgName"],
         ":u": int(datetime.now().timestamp()),
     }
-    response = table.update_item(
-        Key={
-            'hashKey': item["orgId"],
-            'rangeKey': item["orgId"],
-        },
+    try:
+        response = table.update_item(
+            Key={
+                'hashKey': item["orgId"],
+                'rangeKey': item["orgId"],
+            },
             UpdateExpression=update_expression,
+            ConditionExpression="attribute_exists(rangeKey)",
             ExpressionAttributeValues=expression_values
         )
-    return item
+    except errors.ClientError as e:
+        print(f"Error: {e}")
+        if errors.is_condition_failed(e):
+            return errors.not_found("org", item["orgId"])
 
-def find_all(table: any, orgId: str, verbose: bool = False):
-    if verbose:
-        print(f"function: org find_all()")
-        print(f"table name: {table.table_name}")
-        print(f"org id: {orgId}")
+        return {"error": f"Error: {e}"}
 
-    query_conditions = {
+    return item
+
+def _find_all_conditions():
+    return {
         'KeyConditionExpression': 'itemType = :t and begins_with(id, :i)',
         'ExpressionAttributeValues': {
             ':t': OBJECT_TYPE,
@@ -181,44 +219,65 @@ def find_all(table: any, orgId: str, verbose: bool = False):
         'IndexName': 'itemTypeIdIndex',
     }
 
+def _find_all_shard_conditions(fields: list[str] | None = None):
+    return {
+        key: project({
+            'KeyConditionExpression': 'itemTypeShard = :t and begins_with(id, :i)',
+            'ExpressionAttributeValues': {
+                ':t': key,
+                ':i': f'{OBJECT_TYPE}-',
+            },
+            'IndexName': 'itemTypeShardIndex',
+        }, fields)
+        for key in shard.shards(OBJECT_TYPE)
+    }
+
+@trace.traced('org.find_pages')
+def find_pages(table: any, limit: int | None = None, cursor: str | None = None, verbose: bool = False, fields: list[str] | None = None, records: bool = False):
+    # records=True yields compact codec.OrgRecord objects instead of dicts
+    decode = codec.OrgRecord.from_wire if records else codec.decode_item
+    if shard.SHARDED_READS:
+        yield from scatter_pages(table, _find_all_shard_conditions(fields), limit, cursor, decode)
+    else:
+        yield from query_pages(table, project(_find_all_conditions(), fields), limit, cursor, decode)
+
+@trace.traced('org.find_page')
+def find_page(table: any, limit: int | None = None, cursor: str | None = None, verbose: bool = False, fields: list[str] | None = None, records: bool = False):
+    return next(find_pages(table, limit, cursor, verbose, fields, records))
+
+@trace.traced('org.find_all')
+def find_all(table: any, orgId: str, verbose: bool = False, limit: int | None = None, cursor: str | None = None, fields: list[str] | None = None):
     orgs = []
     try:
-        response = table.query(**query_conditions)
-        if 'Items' in response:
-            orgs = response['Items']
+        if shard.SHARDED_READS:
+            orgs = scatter_all(table, _find_all_shard_conditions(fields), limit, cursor)
+        else:
+            orgs = query_all(table, project(_find_all_conditions(), fields), limit, cursor)
     except Exception as e:
         print(f"Error: {e}")
-        response = e
         # TODO: return an error object instead
 
     return orgs
 
-def find(table: any, orgId: str, verbose: bool = False):
-    if verbose:
-        print(f"function: org find()")
-        print(f"table name: {table.table_name}")
-        print(f"org id: {orgId}")
-
+@trace.traced('org.find')
+def find(table: any, orgId: str, verbose: bool = False, fields: list[str] | None = None, consistent: bool = False):
     # TODO: Verify its a valid orgId
 
     org = {}
     try:
-        response = table.get_item(
-            Key={
-                'hashKey': orgId,
-                'rangeKey': orgId,
-            }
+        response = low_level_client(table).get_item(
+            TableName=table.table_name,
+            Key=codec.encode_key(orgId, orgId),
+            ConsistentRead=consistent,
+            **project({}, fields)
         )
         if 'Item' in response:
-            org = response['Item']
+            org = codec.decode_item(response['Item'])
 
     except Exception as e:
+        # a missing org is {}; anything else, e.g. throttling, is an error
+        # so destroy and restore do not take it for a missing org
         print(f"Error: {e}")
-        response = e
-        # TODO: return an error object instead
-
-    if verbose:
-        print(f"response: {response}")
-        print(f"org: {org}")
+        return {"error": f"Error: {e}"}
 
     return org
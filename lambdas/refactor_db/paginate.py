@@ -0,0 +1,140 @@
+import base64, heapq, json
+from concurrent.futures import ThreadPoolExecutor
+from . import codec
+from .batch import MAX_WORKERS
+from .connection import low_level_client
+
+# Hard cap on a single page so a caller cannot ask for an unbounded response
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(key: dict | None):
+    if not key:
+        return None
+
+    data = json.dumps(key, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+def decode_cursor(cursor: str | None):
+    if not cursor:
+        return None
+
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise Exception(f"Error: cursor is not valid: {cursor}")
+
+def _check_partition(query_conditions: dict, start_key: dict | None, cursor: str):
+    # A cursor only resumes the partition it was read from, e.g. one org's
+    # users; DynamoDB rejects a start key from another one. Key conditions
+    # here always start with `partition = :value`.
+    name, _, value = query_conditions['KeyConditionExpression'].split(None, 3)[:3]
+    if start_key is not None and (not isinstance(start_key, dict) or start_key.get(name) != query_conditions['ExpressionAttributeValues'][value]):
+        raise Exception(f"Error: cursor is not valid: {cursor}")
+
+def query_pages(table: any, query_conditions: dict, limit: int | None = None, cursor: str | None = None, decode: callable = codec.decode_item):
+    """Lazily yield (items, next_cursor) for every page of a query.
+
+    `limit` bounds the size of each page and `cursor` resumes from the
+    `nextCursor` of an earlier page. The final page has a next cursor of None.
+    Items are read with the low-level client and decoded by `decode`.
+    """
+    conditions = dict(query_conditions, TableName=table.table_name)
+    if 'ExpressionAttributeValues' in conditions:
+        conditions['ExpressionAttributeValues'] = codec.encode_item(conditions['ExpressionAttributeValues'])
+    if limit is not None:
+        conditions['Limit'] = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    client = low_level_client(table)
+    start_key = decode_cursor(cursor)
+    _check_partition(query_conditions, start_key, cursor)
+    while True:
+        if start_key:
+            conditions['ExclusiveStartKey'] = codec.encode_item(start_key)
+
+        response = client.query(**conditions)
+        start_key = response.get('LastEvaluatedKey')
+        if start_key:
+            start_key = codec.decode_item(start_key)
+
+        yield [decode(item) for item in response.get('Items', [])], encode_cursor(start_key)
+
+        if not start_key:
+            return
+
+def query_page(table: any, query_conditions: dict, limit: int | None = None, cursor: str | None = None, decode: callable = codec.decode_item):
+    return next(query_pages(table, query_conditions, limit, cursor, decode))
+
+def query_all(table: any, query_conditions: dict, limit: int | None = None, cursor: str | None = None, decode: callable = codec.decode_item):
+    """Collect up to `limit` items (all when None) across as many pages as needed."""
+    items = []
+    page_size = None if limit is None else min(int(limit), MAX_PAGE_SIZE)
+    for page, _ in query_pages(table, query_conditions, page_size, cursor, decode):
+        items.extend(page)
+        if limit is not None and len(items) >= limit:
+            return items[:limit]
+
+    return items
+
+# Scatter-gather over a sharded index (see shard.py). `shard_conditions` maps
+# each shard to the query conditions that read it, and a cursor holds the
+# start key of every shard that still has items.
+
+def _scatter_state(shard_conditions: dict, cursor: str | None):
+    if not cursor:
+        return dict.fromkeys(shard_conditions)
+
+    state = decode_cursor(cursor)
+    if not isinstance(state, dict) or not isinstance(state.get('shards'), dict) or not state['shards'].keys() <= shard_conditions.keys():
+        raise Exception(f"Error: cursor is not valid: {cursor}")
+
+    return state['shards']
+
+def _order(item: any):
+    # items keep the index's id order when it was read
+    return item.get('id', '') if isinstance(item, dict) else ''
+
+def scatter_pages(table: any, shard_conditions: dict, limit: int | None = None, cursor: str | None = None,
+                  decode: callable = codec.decode_item, max_workers: int = MAX_WORKERS):
+    """Like query_pages, but each page queries every shard with items left in parallel.
+
+    A page holds one page from each of those shards, so items are only in
+    id order within a shard; `limit` bounds the whole page.
+    """
+    state = _scatter_state(shard_conditions, cursor)
+
+    def read(shard, page_size):
+        return query_page(table, shard_conditions[shard], page_size, encode_cursor(state[shard]), decode)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shard_conditions)))) as executor:
+        while state:
+            shards = list(state)
+            page_size = None
+            if limit is not None:
+                limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+                # with fewer items than shards, the rest wait for later pages
+                shards = shards[:limit]
+                page_size = limit // len(shards)
+
+            items = []
+            for shard, (page, next_cursor) in zip(shards, executor.map(read, shards, [page_size] * len(shards))):
+                items.extend(page)
+                if next_cursor:
+                    state[shard] = decode_cursor(next_cursor)
+                else:
+                    del state[shard]
+
+            yield items, encode_cursor({'shards': state}) if state else None
+
+def scatter_all(table: any, shard_conditions: dict, limit: int | None = None, cursor: str | None = None,
+                decode: callable = codec.decode_item, max_workers: int = MAX_WORKERS):
+    """Like query_all, reading every shard in parallel and merging them in id order."""
+    state = _scatter_state(shard_conditions, cursor)
+
+    def read(shard):
+        return query_all(table, shard_conditions[shard], limit, encode_cursor(state[shard]), decode)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(state) or 1))) as executor:
+        results = list(executor.map(read, state))
+
+    items = list(heapq.merge(*results, key=_order))
+    return items if limit is None else items[:limit]
@@ -0,0 +1,101 @@
+import json, os, random, re, time
+
+# On-demand CPU profiling of handler invocations with cProfile. An event with
+# a `profile` key is profiled, as is a PROFILE_SAMPLE_RATE fraction of the
+# others. A profiled invocation logs one JSON summary line: where the time
+# went by area and the top functions by cumulative time. The full stats are
+# saved to PROFILE_DIR for `python -m pstats` or snakeviz. cProfile is only
+# imported by the first profiled invocation, so unprofiled ones pay one check.
+SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp')
+TOP = int(os.environ.get('PROFILE_TOP', 15))
+
+# (area, path fragments) checked in order; time in anything else is `other`
+AREAS = (
+    # request serialization, signing and HTTP; MemoryTable stands in for it in tests
+    ('boto3', ('/botocore/', '/boto3/', '/urllib3/', '/s3transfer/', '/refactor_db/memory.py')),
+    ('refactor_db', ('/refactor_db/',)),
+    ('response', ('/lambdas/response.py', '/json/', 'orjson')),
+    ('handler', ('/lambdas/user.py', '/lambdas/user_queue.py')),
+)
+
+def area(filename: str):
+    """The part of the stack a source file belongs to."""
+    filename = filename.replace(os.sep, '/')
+    for name, fragments in AREAS:
+        if any(fragment in filename for fragment in fragments):
+            return name
+
+    return 'other'
+
+def _label(function: tuple):
+    filename, line, name = function
+    if filename == '~':
+        # a builtin, e.g. <method 'sort' of 'list' objects>
+        return name
+    return f"{'/'.join(filename.replace(os.sep, '/').split('/')[-2:])}:{line}({name})"
+
+def begin(force: bool = False):
+    """Start profiling if forced or sampled; returns the profiler or None."""
+    if not force and not (SAMPLE_RATE and random.random() < SAMPLE_RATE):
+        return None
+
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already running, e.g. around a benchmark
+        return None
+
+    return profiler
+
+def end(profiler: any, action: str | None, status: int | None = None):
+    """Stop `profiler`, save its stats and log a summary, which is returned."""
+    if profiler is None:
+        return None
+
+    profiler.disable()
+    import pstats
+    stats = pstats.Stats(profiler)
+
+    areas = {}
+    for function, (_, _, tottime, _, callers) in stats.stats.items():
+        if function[0] == '~' and callers:
+            # builtins count towards the code that called them
+            for caller, (_, _, caller_tottime, _) in callers.items():
+                name = area(caller[0])
+                areas[name] = areas.get(name, 0.0) + caller_tottime
+        else:
+            name = area(function[0])
+            areas[name] = areas.get(name, 0.0) + tottime
+
+    top = sorted(stats.stats.items(), key=lambda entry: entry[1][3], reverse=True)[:TOP]
+    summary = {
+        'profile': action or 'unknown',
+        'status': status,
+        'total_ms': round(stats.total_tt * 1000, 3),
+        'calls': stats.total_calls,
+        'areas_ms': {name: round(seconds * 1000, 3) for name, seconds in sorted(areas.items(), key=lambda a: -a[1])},
+        'top': [
+            {
+                'function': _label(function),
+                'calls': calls,
+                'cumulative_ms': round(cumtime * 1000, 3),
+                'self_ms': round(tottime * 1000, 3),
+            }
+            for function, (_, calls, tottime, cumtime, _) in top
+        ],
+    }
+
+    # the action comes from the event, so it is not trusted as a file name
+    name = re.sub(r'[^A-Za-z0-9_-]', '_', str(action or 'unknown'))[:64]
+    path = os.path.join(PROFILE_DIR, f"profile-{name}-{int(time.time() * 1000)}-{os.getpid()}.pstats")
+    try:
+        stats.dump_stats(path)
+        summary['stats'] = path
+    except OSError as e:
+        summary['stats_error'] = str(e)
+
+    print(json.dumps(summary, separators=(',', ':')))
+    return summary
@@ -0,0 +1,32 @@
+def parse_fields(fields: str | list[str] | None):
+    if fields is None:
+        return None
+
+    if isinstance(fields, str):
+        fields = fields.split(',')
+
+    fields = [f.strip() for f in fields if f and f.strip()]
+    return fields or None
+
+def project(conditions: dict, fields: str | list[str] | None):
+    """Return a copy of request `conditions` that only reads `fields`.
+
+    Every field goes through ExpressionAttributeNames so reserved words
+    (e.g. `name`) and names like `id` are always safe to ask for.
+    """
+    fields = parse_fields(fields)
+    if not fields:
+        return conditions
+
+    names = dict(conditions.get('ExpressionAttributeNames', {}))
+    placeholders = []
+    for i, field in enumerate(dict.fromkeys(fields)):
+        placeholder = f'#p{i}'
+        names[placeholder] = field
+        placeholders.append(placeholder)
+
+    return {
+        **conditions,
+        'ProjectionExpression': ', '.join(placeholders),
+        'ExpressionAttributeNames': names,
+    }
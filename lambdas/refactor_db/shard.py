@@ -0,0 +1,29 @@
+import os, zlib
+
+# Write sharding for item type listings. itemTypeIdIndex keys every user on
+# `USER` and every org on `ORG`, so all email lookups and org listings read
+# the same two hot GSI partitions. Items also carry `itemTypeShard`, e.g.
+# `USER#7`, keying itemTypeShardIndex. The shard is a stable hash of the
+# item's `id` (the email for users, the orgId for orgs), so a lookup by id
+# reads one shard and a listing queries every shard in parallel.
+#
+# Changing DDB_ITEM_TYPE_SHARDS moves most items to another shard; run
+# `python -m lambdas.refactor_db.backfill` after changing it, or after
+# deploying the index to a table that already has items, before reads are
+# switched to it with DDB_SHARDED_READS=1. Until then reads stay on
+# itemTypeIdIndex, which is still written.
+SHARDS = int(os.environ.get('DDB_ITEM_TYPE_SHARDS', 16))
+SHARDED_READS = os.environ.get('DDB_SHARDED_READS', '0').lower() in ('1', 'true')
+
+def bucket(value: str, buckets: int):
+    """A stable bucket in range(buckets) for `value`."""
+    # crc32, unlike hash(), is the same in every process
+    return zlib.crc32(value.encode()) % buckets
+
+def shard(itemType: str, id: str):
+    """The itemTypeShard of the item with `itemType` and `id`."""
+    return f"{itemType}#{bucket(id, SHARDS)}"
+
+def shards(itemType: str):
+    """Every itemTypeShard of `itemType`, for listings."""
+    return [f"{itemType}#{n}" for n in range(SHARDS)]
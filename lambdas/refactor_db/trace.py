@@ -0,0 +1,294 @@
+import functools, inspect, itertools, json, os, random, reprlib, threading, time
+from collections import deque
+
+# Request tracing: nested timing spans for each action, refactor_db call and
+# DynamoDB call, kept in a ring buffer and logged as one JSON line when the
+# invocation ends. Span fields hold references and are only rendered, with
+# size limits, when a trace is flushed; untraced requests pay for one check
+# per call. A request is traced when its event has `verbose`, or at random
+# for TRACE_SAMPLE_RATE of requests.
+SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0))
+MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', 256))
+
+# how much of a field value a trace shows
+_repr = reprlib.Repr()
+_repr.maxlevel = 3
+_repr.maxdict = 10
+_repr.maxlist = 10
+_repr.maxstring = 120
+_repr.maxother = 120
+
+class Span:
+    __slots__ = ('id', 'parent', 'name', 'start', 'end', 'fields')
+
+    def __init__(self, id: int, parent: int | None, name: str, fields: dict):
+        self.id = id
+        self.parent = parent
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.fields = fields
+
+    def set(self, **fields):
+        """Add fields; values are kept as they are and rendered at flush."""
+        self.fields.update(fields)
+
+class _NoSpan:
+    """Stands in for a span when the request is not traced."""
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NO_SPAN = _NoSpan()
+
+class Trace:
+    def __init__(self, name: str, reason: str, fields: dict):
+        self.id = os.urandom(8).hex()
+        self.reason = reason
+        self.started = time.perf_counter()
+        # finished spans; the oldest are dropped once MAX_SPANS are kept
+        self.spans = deque(maxlen=MAX_SPANS)
+        self.finished = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.root = Span(0, None, name, fields)
+
+    def span(self, name: str, parent: Span, fields: dict):
+        return Span(next(self._ids), parent.id, name, fields)
+
+    def finish(self, span: Span):
+        span.end = time.perf_counter()
+        # worker threads finish spans too
+        with self._lock:
+            self.spans.append(span)
+            self.finished += 1
+
+    def record(self):
+        return {
+            'trace': self.id,
+            'name': self.root.name,
+            'reason': self.reason,
+            'duration_ms': _ms(self.root.end - self.root.start),
+            'dropped': self.finished - len(self.spans),
+            'spans': [
+                {
+                    'id': span.id,
+                    'parent': span.parent,
+                    'name': span.name,
+                    'start_ms': _ms(span.start - self.started),
+                    'duration_ms': _ms(span.end - span.start),
+                    **({'fields': {k: render(v) for k, v in span.fields.items()}} if span.fields else {}),
+                }
+                for span in sorted(self.spans, key=lambda span: span.start)
+            ],
+        }
+
+# A Lambda container handles one event at a time, so there is one current
+# trace; each thread keeps its own stack of open spans within it.
+_trace = None
+_local = threading.local()
+
+def _ms(seconds: float):
+    return round(seconds * 1000, 3)
+
+def render(value: any):
+    """A JSON-safe, size-limited form of a field value."""
+    if isinstance(value, _Lazy):
+        return value.render()
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= _repr.maxstring else value[:_repr.maxstring] + '...'
+    return _repr.repr(value)
+
+class _Lazy:
+    """A function's arguments, bound to its parameter names only at flush."""
+    __slots__ = ('signature', 'args', 'kwargs')
+
+    def __init__(self, signature: inspect.Signature, args: tuple, kwargs: dict):
+        self.signature = signature
+        self.args = args
+        self.kwargs = kwargs
+
+    def render(self):
+        bound = self.signature.bind_partial(*self.args, **self.kwargs).arguments
+        return {k: render(v) for k, v in bound.items() if k not in ('table', 'verbose')}
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def current():
+    """The innermost open span on this thread, or NO_SPAN when not tracing."""
+    if _trace is None:
+        return NO_SPAN
+    stack = _stack()
+    return stack[-1] if stack else _trace.root
+
+def begin(name: str, force: bool = False, **fields):
+    """Start tracing a request if it is forced or sampled; returns the trace or None."""
+    global _trace
+    reason = 'verbose' if force else 'sampled' if SAMPLE_RATE and random.random() < SAMPLE_RATE else None
+    if reason is None:
+        _trace = None
+        return None
+
+    _trace = Trace(name, reason, fields)
+    _local.stack = [_trace.root]
+    return _trace
+
+def end(**fields):
+    """Finish the current trace and log it as one JSON line."""
+    global _trace
+    trace, _trace = _trace, None
+    if trace is None:
+        return None
+
+    trace.root.set(**fields)
+    trace.finish(trace.root)
+    _local.stack = []
+    record = trace.record()
+    print(json.dumps(record, separators=(',', ':'), default=str))
+    return record
+
+class span:
+    """Time a block as a child of the current span: `with trace.span('name', key=value):`"""
+
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.trace = None
+        self.opened = None
+
+    def __enter__(self):
+        self.trace = _trace
+        if self.trace is None:
+            return NO_SPAN
+        stack = _stack()
+        self.opened = self.trace.span(self.name, stack[-1] if stack else self.trace.root, self.fields)
+        stack.append(self.opened)
+        return self.opened
+
+    def __exit__(self, kind, error, tb):
+        if self.opened is not None:
+            if error is not None:
+                self.opened.set(error=repr(error))
+            _stack().pop()
+            self.trace.finish(self.opened)
+        return False
+
+def traced(name: str):
+    """Trace calls to a refactor_db function, with its arguments and result.
+
+    Inside a traced request each call is a span. Outside one, calling with
+    verbose=True traces just that call and logs it when it returns.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+        index = list(signature.parameters).index('verbose')
+
+        def verbose(args, kwargs):
+            return kwargs['verbose'] if 'verbose' in kwargs else len(args) > index and args[index]
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                if _trace is None:
+                    if not verbose(args, kwargs):
+                        yield from func(*args, **kwargs)
+                        return
+                    begin(name, True)
+                    try:
+                        yield from _traced_generator(name, func, signature, args, kwargs)
+                    finally:
+                        end()
+                    return
+
+                yield from _traced_generator(name, func, signature, args, kwargs)
+        else:
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                if _trace is None:
+                    if not verbose(args, kwargs):
+                        return func(*args, **kwargs)
+                    begin(name, True)
+                    try:
+                        return _traced_call(name, func, signature, args, kwargs)
+                    finally:
+                        end()
+
+                return _traced_call(name, func, signature, args, kwargs)
+
+        return call
+
+    return decorate
+
+def _traced_call(name: str, func: callable, signature: inspect.Signature, args: tuple, kwargs: dict):
+    with span(name, args=_Lazy(signature, args, kwargs)) as current:
+        result = func(*args, **kwargs)
+        current.set(result=result)
+        return result
+
+def _traced_generator(name: str, func: callable, signature: inspect.Signature, args: tuple, kwargs: dict):
+    # the span is only on this thread's stack while the generator runs, so
+    # work the caller does between items is not nested under it
+    trace = _trace
+    generated = trace.span(name, current(), {'args': _Lazy(signature, args, kwargs)})
+    iterator = func(*args, **kwargs)
+    yielded = 0
+    try:
+        while True:
+            stack = _stack()
+            stack.append(generated)
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                stack.pop()
+            yielded += 1
+            yield value
+    finally:
+        generated.set(yielded=yielded)
+        trace.finish(generated)
+
+# DynamoDB calls, from hooks on the botocore clients
+
+def _before_call(context: dict, **kwargs):
+    if _trace is not None:
+        context['trace_started'] = time.perf_counter()
+        context['trace_parent'] = current()
+
+def _after_call(parsed: dict, model: any, context: dict, **kwargs):
+    trace = _trace
+    if trace is None or 'trace_started' not in context:
+        return
+
+    call = trace.span(f'dynamodb.{model.name}', context['trace_parent'], {})
+    call.start = context['trace_started']
+    if 'Error' in parsed:
+        call.fields['error'] = parsed['Error'].get('Code')
+    # metrics' hook, which runs first, leaves the capacity it took out of the response
+    if 'consumed' in context:
+        call.fields['rcu'], call.fields['wcu'] = context['consumed']
+    for field in ('Count', 'ScannedCount'):
+        if field in parsed:
+            call.fields[field.lower()] = parsed[field]
+    if parsed.get('UnprocessedItems') or parsed.get('UnprocessedKeys'):
+        call.fields['unprocessed'] = True
+    trace.finish(call)
+
+def instrument(client: any):
+    """Add a span for every call `client` makes in a traced request."""
+    events = client.meta.events
+    events.register('before-call.dynamodb', _before_call, unique_id='refactor-trace-before')
+    events.register('after-call.dynamodb', _after_call, unique_id='refactor-trace-after')
+    return client
@@ -1,9 +1,16 @@
 from typing import TypedDict, NotRequired, cast
 from datetime import datetime
+from . import errors
 from .id import generate_id, is_valid_id
+from . import cache, codec, shard, trace
+from .connection import low_level_client
+from .paginate import query_pages, query_page, query_all
+from .batch import batch_get, transact_groups, MAX_WORKERS
+from .projection import project, parse_fields
 from .org import OBJECT_TYPE as ORG_OBJECT_TYPE
 
 OBJECT_TYPE='USER'
+EMAIL_LOCK_PREFIX='EMAIL#'
 
 class User(TypedDict):
     orgId: str
@@ -14,71 +21,240 @@ class User(TypedDict):
     updatedAt: NotRequired[int]
     deletedAt: NotRequired[int]
 
-def add(table: any, item: User, verbose: bool = False):
-    if verbose:
-        print(f"function: user add()")
-        print(f"table name: {table.table_name}")
-        print(f"item: {item}")
+def _email_key(email: str):
+    # Emails are claimed by a lock item outside of any org so that a
+    # conditional put can enforce uniqueness across the whole table.
+    return {
+        'hashKey': f'{EMAIL_LOCK_PREFIX}{email}',
+        'rangeKey': f'{EMAIL_LOCK_PREFIX}{email}',
+    }
+
+def _email_lock(item: User):
+    return {
+        **_email_key(item['email']),
+        'orgId': item['orgId'],
+        'userId': item['userId'],
+        'email': item['email'],
+    }
+
+def _release_email(table: any, user: dict):
+    # only remove the lock if it still belongs to this user
+    try:
+        table.delete_item(
+            Key=_email_key(user['email']),
+            ConditionExpression="userId = :u",
+            ExpressionAttributeValues={":u": user['userId']},
+        )
+    except errors.ClientError as e:
+        if not errors.is_condition_failed(e):
+            raise
+
+@trace.traced('user.claim_email')
+def claim_email(table: any, item: User, verbose: bool = False):
+    """Write the missing email lock of an existing user.
+
+    For users written before email locks existed; see backfill. Returns {}
+    once the lock is written, an ALREADY_EXISTS error when another user holds
+    the email and a CONFLICT error when the user's email changed meanwhile.
+    """
+    try:
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    'ConditionCheck': {
+                        'TableName': table.table_name,
+                        'Key': {'hashKey': item['orgId'], 'rangeKey': item['userId']},
+                        'ConditionExpression': 'email = :e',
+                        'ExpressionAttributeValues': {':e': item['email']},
+                    },
+                },
+                {
+                    'Put': {
+                        'TableName': table.table_name,
+                        'Item': _email_lock(item),
+                        'ConditionExpression': 'attribute_not_exists(hashKey)',
+                    },
+                },
+            ]
+        )
+    except errors.ClientError as e:
+        if errors.cancelled_by(e, 0):
+            return errors.error(errors.CONFLICT, f"user was modified concurrently: {item['userId']}")
+
+        if errors.cancelled_by(e, 1):
+            return errors.already_exists("user email", item['email'])
+
+        return {"error": f"Error: {e}"}
 
+    return {}
+
+@trace.traced('user.add')
+def add(table: any, item: User, verbose: bool = False):
     # validate org id
     if not is_valid_id(ORG_OBJECT_TYPE, item['orgId']):
         raise Exception(f"Error: orgId is not valid: {item['orgId']}")
 
-    # validate email does not already exist
-    user = find_by_email(table, item['email'], verbose)
-    if 'userId' in user:
-        print(f"Error: user email already exists: {user['email']}")
-        # TODO: Return an error object instead
-        return {}
-
-    # validate userId format and if it already exists
-    if 'userId' in item and is_valid_id(OBJECT_TYPE, item['userId']):
-        user = find(table, item['orgId'], item['userId'], verbose)
-        if 'userId' in user:
-            print(f"Error: userId already exists: {item['userId']}")
-            # TODO: Return an error object instead
-            return {}
-    else:
+    # an existing userId is rejected by the conditional put below
+    if 'userId' not in item or not is_valid_id(OBJECT_TYPE, item['userId']):
         item["userId"] = generate_id(OBJECT_TYPE)
 
     now = int(datetime.now().timestamp())
     item["createdAt"] = item["updatedAt"] = now
 
+    new_item = {
+        "hashKey": item["orgId"],
+        "rangeKey": item["userId"],
+        "itemType": OBJECT_TYPE,
+        "id": item["email"],
+        "itemTypeShard": shard.shard(OBJECT_TYPE, item["email"]),
+        "orgId": item["orgId"],
+        "userId": item["userId"],
+        "email": item["email"],
+        "username": item["username"],
+        "createdAt": item["createdAt"],
+        "updatedAt": item["updatedAt"],
+    }
+
     user = {}
     try:
-        response = table.put_item(
-            Item={
-                "hashKey": item["orgId"],
-                "rangeKey": item["userId"],
-                "itemType": OBJECT_TYPE,
-                "id": item["email"],
-                "orgId": item["orgId"],
-                "userId": item["userId"],
-                "email": item["email"],
-                "username": item["username"],
-                "createdAt": item["createdAt"],
-                "updatedAt": item["updatedAt"],
-            }
+        # write the user and claim its email in a single transaction
+        response = table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    'Put': {
+                        'TableName': table.table_name,
+                        'Item': new_item,
+                        'ConditionExpression': 'attribute_not_exists(rangeKey)',
+                    },
+                },
+                {
+                    'Put': {
+                        'TableName': table.table_name,
+                        'Item': _email_lock(item),
+                        'ConditionExpression': 'attribute_not_exists(hashKey)',
+                    },
+                },
+            ]
         )
         user = cast(User,item)
-    except Exception as e:
+        cache.set_user(new_item)
+    except errors.ClientError as e:
+        if errors.cancelled_by(e, 0):
+            print(f"Error: userId already exists: {item['userId']}")
+            return errors.already_exists("userId", item['userId'])
+
+        if errors.cancelled_by(e, 1):
+            print(f"Error: user email already exists: {item['email']}")
+            return errors.already_exists("user email", item['email'])
+
         print(f"Error: {e}")
         response = e
         # TODO: return an error object instead
         item = {}
 
-    if verbose:
-        print(f"response: {response}")
-        print(f"user: {user}")
-
     return user
 
-def delete(table: any, item: User, verbose: bool = False):
-    if verbose:
-        print(f"function: user delete()")
-        print(f"table name: {table.table_name}")
-        print(f"user: {item}")
+def _validate_new_user(item: User):
+    if 'orgId' not in item or not is_valid_id(ORG_OBJECT_TYPE, item['orgId']):
+        return f"Error: orgId is not valid: {item.get('orgId')}"
+
+    if 'userId' in item and not is_valid_id(OBJECT_TYPE, item['userId']):
+        return f"Error: userId is not valid: {item['userId']}"
+
+    if not item.get('email'):
+        return "Error: email is required"
+
+    if not item.get('username'):
+        return "Error: username is required"
 
+    return None
+
+@trace.traced('user.batch_add')
+def batch_add(table: any, items: list[User], verbose: bool = False, max_workers: int = MAX_WORKERS):
+    """Add many users with TransactWriteItems, 50 users per transaction.
+
+    The whole batch is validated before anything is written and duplicate
+    emails or userIds within the batch are rejected. Each user is written
+    together with its email lock, conditionally, so existing userIds and
+    emails claimed by another user are rejected and a user is never saved
+    without its lock. Returns one result per input, in order: the created
+    user or {"error": ...}.
+    """
+    now = int(datetime.now().timestamp())
+    results = []
+    seen_emails = set()
+    seen_ids = set()
+    pending = []
+    for item in items:
+        error = _validate_new_user(item)
+        if error is None and item['email'] in seen_emails:
+            error = f"Error: user email is duplicated in batch: {item['email']}"
+        if error is None and item.get('userId') in seen_ids:
+            error = f"Error: userId is duplicated in batch: {item['userId']}"
+
+        if error:
+            results.append({"error": error})
+            continue
+
+        user = cast(User, {
+            "orgId": item["orgId"],
+            "userId": item.get("userId") or generate_id(OBJECT_TYPE),
+            "email": item["email"],
+            "username": item["username"],
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        seen_emails.add(user['email'])
+        seen_ids.add(user['userId'])
+        results.append(user)
+        pending.append(user)
+
+    # the same conditional pair add() writes, as one all or nothing group
+    groups = [
+        [
+            {
+                'Put': {
+                    'TableName': table.table_name,
+                    'Item': codec.encode_item({
+                        "hashKey": user["orgId"],
+                        "rangeKey": user["userId"],
+                        "itemType": OBJECT_TYPE,
+                        "id": user["email"],
+                        "itemTypeShard": shard.shard(OBJECT_TYPE, user["email"]),
+                        **user,
+                    }),
+                    'ConditionExpression': 'attribute_not_exists(rangeKey)',
+                },
+            },
+            {
+                'Put': {
+                    'TableName': table.table_name,
+                    'Item': codec.encode_item(_email_lock(user)),
+                    'ConditionExpression': 'attribute_not_exists(hashKey)',
+                },
+            },
+        ]
+        for user in pending
+    ]
+    failed = transact_groups(table, groups, max_workers, verbose)
+    if failed:
+        # userIds are unique within the batch
+        rejected = {}
+        for i, (member, error) in failed.items():
+            user = pending[i]
+            if member == 0:
+                rejected[user['userId']] = errors.already_exists("userId", user['userId'])
+            elif member == 1:
+                rejected[user['userId']] = errors.already_exists("user email", user['email'])
+            else:
+                rejected[user['userId']] = {"error": error, "userId": user["userId"], "email": user["email"]}
+
+        results = [r if 'error' in r else rejected.get(r['userId'], r) for r in results]
+
+    return results
+
+@trace.traced('user.delete')
+def delete(table: any, item: User, verbose: bool = False):
     now = int(datetime.now().timestamp())
     update_expression = "SET deletedAt = :d"
     expression_values = {
@@ -92,31 +268,24 @@ def delete(table: any, item: User, verbose: bool = False):
                 'rangeKey': item["userId"],
             },
             UpdateExpression=update_expression,
+            ConditionExpression="attribute_exists(rangeKey)",
             ExpressionAttributeValues=expression_values,
             ReturnValues="ALL_NEW",
         )
-    except Exception as e:
+    except errors.ClientError as e:
         print(f"Error: {e}")
-        response = e
-        item = {}
+        if errors.is_condition_failed(e):
+            cache.invalidate_user(item["orgId"], item["userId"])
+            return errors.not_found("user", item["userId"])
 
-    if verbose:
-        print(f"response: {response}")
-        print(f"user: {item}")
+        return {"error": f"Error: {e}"}
 
-    # HACK: get rid of Decimal type
-    response['Attributes']['createdAt'] = int(response['Attributes']['createdAt'])
-    response['Attributes']['updatedAt'] = int(response['Attributes']['updatedAt'])
-    response['Attributes']['deletedAt'] = int(response['Attributes']['deletedAt'])
-    return response['Attributes']
+    user = codec.normalize(response['Attributes'])
+    cache.set_user(user)
+    return user
 
+@trace.traced('user.restore')
 def restore(table: any, orgId: str, userId: str, verbose: bool = False):
-    if verbose:
-        print(f"function: user restore()")
-        print(f"table name: {table.table_name}")
-        print(f"orgId: {orgId}")
-        print(f"userId: {userId}")
-
     try:
         response = table.update_item(
             Key={
@@ -124,28 +293,24 @@ def restore(table: any, orgId: str, userId: str, verbose: bool = False):
                 'rangeKey': userId,
             },
             UpdateExpression="REMOVE deletedAt",
+            ConditionExpression="attribute_exists(rangeKey)",
             ReturnValues="ALL_NEW",
         )
-    except Exception as e:
+    except errors.ClientError as e:
         print(f"Error: {e}")
-        response = e
-        item = {}
+        if errors.is_condition_failed(e):
+            cache.invalidate_user(orgId, userId)
+            return errors.not_found("user", userId)
 
-    if verbose:
-        print(f"response: {response}")
+        return {"error": f"Error: {e}"}
 
-    # HACK: get rid of Decimal type
-    response['Attributes']['createdAt'] = int(response['Attributes']['createdAt'])
-    response['Attributes']['updatedAt'] = int(response['Attributes']['updatedAt'])
-    return response['Attributes']
+    user = codec.normalize(response['Attributes'])
+    cache.set_user(user)
+    return user
 
+@trace.traced('user.destroy')
 def destroy(table: any, orgId: str, userId: str, verbose: bool = False, force: bool = False):
-    if verbose:
-        print(f"function: user destroy()")
-        print(f"table name: {table.table_name}")
-        print(f"orgId: {orgId}")
-        print(f"userId: {userId}")
-
+    cache.invalidate_user(orgId, userId)
     try:
         if force:
             response = table.delete_item(
@@ -155,74 +320,120 @@ def destroy(table: any, orgId: str, userId: str, verbose: bool = False, force: b
                 },
                 ReturnValues="ALL_OLD",
             )
-            # HACK: get rid of Decimal type
-            response['Attributes']['createdAt'] = int(response['Attributes']['createdAt'])
-            response['Attributes']['updatedAt'] = int(response['Attributes']['updatedAt'])
-            response['Attributes']['deletedAt'] = int(response['Attributes']['deletedAt'])
-            return response['Attributes']
+        else:
+            response = table.delete_item(
+                Key={
+                    'hashKey': orgId,
+                    'rangeKey': userId,
+                },
+                ConditionExpression="attribute_exists(deletedAt)",
+                ReturnValues="ALL_OLD",
+            )
 
-        response = table.delete_item(
-            Key={
-                'hashKey': orgId,
-                'rangeKey': userId,
-            },
-            ConditionExpression="attribute_exists(deletedAt)",
-            ReturnValues="ALL_OLD",
-        )
+        if 'Attributes' not in response:
+            return errors.not_found("user", userId)
 
-        # HACK: get rid of Decimal type
-        response['Attributes']['createdAt'] = int(response['Attributes']['createdAt'])
-        response['Attributes']['updatedAt'] = int(response['Attributes']['updatedAt'])
-        response['Attributes']['deletedAt'] = int(response['Attributes']['deletedAt'])
-        return response['Attributes']
+        _release_email(table, response['Attributes'])
+        cache.emails.delete(response['Attributes']['email'])
+        return codec.normalize(response['Attributes'])
 
     except Exception as e:
         return {"error": f"Error: {e}"}
 
+@trace.traced('user.update')
 def update(table: any, item: User, verbose: bool = False):
-    if verbose:
-        print(f"function: user update()")
-        print(f"table name: {table.table_name}")
-        print(f"user: {item}")
-
-    # validate email does not already exist
-    user = find_by_email(table, item['email'], verbose)
-    if 'userId' in user and user['userId'] != item['userId']:
-        print(f"Error: user email already exists: {user['email']}")
-        # TODO: Return an error object instead
-        return {}
-
-
     now = int(datetime.now().timestamp())
-    update_expression = "SET id = :i, email = :e, username = :n, updatedAt = :u"
-    expression_values = {
-        ":i": item["email"],
-        ":e": item["email"],
-        ":n": item["username"],
-        ":u": int(now),
+    key = {
+        'hashKey': item["orgId"],
+        'rangeKey': item["userId"],
     }
-    response = table.update_item(
-        Key={
-            'hashKey': item["orgId"],
-            'rangeKey': item["userId"],
-        },
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values,
+
+    # Fast path: the email is unchanged, so its lock item stays as it is
+    try:
+        response = table.update_item(
+            Key=key,
+            UpdateExpression="SET username = :n, updatedAt = :u",
+            ConditionExpression="email = :e",
+            ExpressionAttributeValues={
+                ":e": item["email"],
+                ":n": item["username"],
+                ":u": now,
+            },
             ReturnValues="ALL_NEW"
         )
-    
-    # HACK: get rid of Decimal type
-    response['Attributes']['createdAt'] = int(response['Attributes']['createdAt'])
-    response['Attributes']['updatedAt'] = now
-    return response['Attributes']
-
-def find_all(table: any, orgId: str, verbose: bool = False):
-    if verbose:
-        print(f"function: user find_all()")
-        print(f"table name: {table.table_name}")
-        print(f"org id: {orgId}")
-
-    query_conditions = {
+        user = codec.normalize(response['Attributes'])
+        cache.set_user(user)
+        return user
+    except errors.ClientError as e:
+        if not errors.is_condition_failed(e):
+            cache.invalidate_user(item["orgId"], item["userId"])
+            return {"error": f"Error: {e}"}
+
+    # The email changed: swap the lock items and update the user atomically
+    cache.invalidate_user(item["orgId"], item["userId"])
+    current = _get(table, item["orgId"], item["userId"], ConsistentRead=True)
+    if not current:
+        return errors.not_found("user", item['userId'])
+
+    try:
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    'Update': {
+                        'TableName': table.table_name,
+                        'Key': key,
+                        # the shard follows the email
+                        'UpdateExpression': "SET id = :i, itemTypeShard = :s, email = :e, username = :n, updatedAt = :u",
+                        'ConditionExpression': "email = :o",
+                        'ExpressionAttributeValues': {
+                            ":i": item["email"],
+                            ":s": shard.shard(OBJECT_TYPE, item["email"]),
+                            ":e": item["email"],
+                            ":n": item["username"],
+                            ":u": now,
+                            ":o": current["email"],
+                        },
+                    },
+                },
+                {
+                    'Put': {
+                        'TableName': table.table_name,
+                        'Item': _email_lock(item),
+                        'ConditionExpression': 'attribute_not_exists(hashKey)',
+                    },
+                },
+                {
+                    'Delete': {
+                        'TableName': table.table_name,
+                        'Key': _email_key(current["email"]),
+                    },
+                },
+            ]
+        )
+    except errors.ClientError as e:
+        if errors.cancelled_by(e, 1):
+            print(f"Error: user email already exists: {item['email']}")
+            return errors.already_exists("user email", item['email'])
+
+        if errors.cancelled_by(e, 0):
+            return errors.error(errors.CONFLICT, f"user was modified concurrently: {item['userId']}")
+
+        return {"error": f"Error: {e}"}
+
+    cache.emails.delete(current["email"])
+    user = {
+        **current,
+        "id": item["email"],
+        "itemTypeShard": shard.shard(OBJECT_TYPE, item["email"]),
+        "email": item["email"],
+        "username": item["username"],
+        "updatedAt": now,
+    }
+    cache.set_user(user)
+    return user
+
+def _find_all_conditions(orgId: str):
+    return {
         'KeyConditionExpression': 'hashKey = :h and begins_with(rangeKey, :r)',
         'ExpressionAttributeValues': {
             ':h': orgId,
@@ -230,87 +441,149 @@ def find_all(table: any, orgId: str, verbose: bool = False):
         },
     }
 
+def _get(table: any, orgId: str, userId: str, **kwargs):
+    response = low_level_client(table).get_item(
+        TableName=table.table_name,
+        Key=codec.encode_key(orgId, userId),
+        **kwargs,
+    )
+    return codec.decode_item(response['Item']) if 'Item' in response else None
+
+@trace.traced('user.find_pages')
+def find_pages(table: any, orgId: str, limit: int | None = None, cursor: str | None = None, verbose: bool = False, fields: list[str] | None = None, records: bool = False):
+    # records=True yields compact codec.UserRecord objects instead of dicts
+    decode = codec.UserRecord.from_wire if records else codec.decode_item
+    yield from query_pages(table, project(_find_all_conditions(orgId), fields), limit, cursor, decode)
+
+@trace.traced('user.find_page')
+def find_page(table: any, orgId: str, limit: int | None = None, cursor: str | None = None, verbose: bool = False, fields: list[str] | None = None, records: bool = False):
+    return next(find_pages(table, orgId, limit, cursor, verbose, fields, records))
+
+@trace.traced('user.find_all')
+def find_all(table: any, orgId: str, verbose: bool = False, limit: int | None = None, cursor: str | None = None, fields: list[str] | None = None):
     users = []
     try:
-        response = table.query(**query_conditions)
-        users = []
-        if 'Items' in response:
-            for user in response['Items']:
-                user["createdAt"] = int(user["createdAt"])
-                user["updatedAt"] = int(user["updatedAt"])
-                if 'deletedAt' in user:
-                    user["deletedAt"] = int(user["deletedAt"])
-                users.append(user)
+        users = query_all(table, project(_find_all_conditions(orgId), fields), limit, cursor)
     except Exception as e:
         print(f"Error: {e}")
-        response = e
         # TODO: return an error object instead
 
     return users
 
-def find(table: any, orgId: str, userId: str, verbose: bool = False):
-    if verbose:
-        print(f"function: user find()")
-        print(f"table name: {table.table_name}")
-        print(f"org id: {orgId}")
-        print(f"user id: {userId}")
+def _select(user: dict, fields: list[str] | None):
+    fields = parse_fields(fields)
+    return {k: user[k] for k in fields if k in user} if fields else user
 
+@trace.traced('user.find')
+def find(table: any, orgId: str, userId: str, verbose: bool = False, fields: list[str] | None = None, consistent: bool = False):
     # TODO: Verify its a valid orgId
     # TODO: Verify its a valid userId
 
+    # consistent reads always go to the table, and refresh the cache
+    if not consistent:
+        user = cache.get_user(orgId, userId)
+        if user is not None:
+            return _select(user, fields)
+
     user = {}
     try:
-        response = table.get_item(
-            Key={
-                'hashKey': orgId,
-                'rangeKey': userId,
-            }
-        )
-        if 'Item' in response:
-            user = response['Item']
-            user["createdAt"] = int(user["createdAt"])
-            user["updatedAt"] = int(user["updatedAt"])
+        # a projected read cannot fill the cache, so only full reads do
+        if fields and not consistent:
+            response = _get(table, orgId, userId, **project({}, fields))
+        else:
+            response = _get(table, orgId, userId, ConsistentRead=consistent)
+            if response:
+                cache.set_user(response)
 
-            if 'deletedAt' in user:
-                user["deletedAt"] = int(user["deletedAt"])
+        if response:
+            user = _select(response, fields)
 
     except Exception as e:
         print(f"Error: {e}")
         response = e
         # TODO: return an error object instead
 
-    if verbose:
-        print(f"response: {response}")
-        print(f"user: {user}")
-
     return user
 
-def find_by_email(table: any, email: str, verbose: bool = False):
-    if verbose:
-        print(f"function: user find_by_email()")
-        print(f"table name: {table.table_name}")
-        print(f"email: {email}")
-
-    query_conditions = {
-        'KeyConditionExpression': 'itemType = :t and id = :i',
-        'ExpressionAttributeValues': {
-            ':t': OBJECT_TYPE,
-            ':i': email,
-        },
-        'IndexName': 'itemTypeIdIndex'
-    }
+@trace.traced('user.find_many')
+def find_many(table: any, orgId: str, userIds: list[str], verbose: bool = False, fields: list[str] | None = None):
+    # userId is needed to put the results back in order
+    if fields:
+        fields = ['userId', *fields]
+
+    keys = [{'hashKey': orgId, 'rangeKey': userId} for userId in userIds]
+    found = {user['userId']: user for user in batch_get(table, keys, verbose=verbose, fields=fields)}
+
+    # return users in the order they were asked for
+    return [found[userId] for userId in dict.fromkeys(userIds) if userId in found]
+
+@trace.traced('user.find_each')
+def find_each(table: any, orgId: str, userIds: list[str], verbose: bool = False, fields: list[str] | None = None):
+    """Like calling `find` for each of `userIds`, but misses share BatchGetItem calls.
+
+    Returns one result per userId, in order, with {} for users that do not exist.
+    """
+    found = {}
+    for userId in userIds:
+        user = cache.get_user(orgId, userId)
+        if user is not None:
+            found[userId] = user
+
+    missing = [userId for userId in dict.fromkeys(userIds) if userId not in found]
+    if missing:
+        # only full reads can fill the cache, like in find
+        for user in find_many(table, orgId, missing, verbose, fields):
+            if not fields:
+                cache.set_user(user)
+            found[user['userId']] = user
+
+    return [_select(found[userId], fields) if userId in found else {} for userId in userIds]
+
+@trace.traced('user.find_by_email')
+def find_by_email(table: any, email: str, verbose: bool = False, fields: list[str] | None = None, consistent: bool = False):
+    if not consistent:
+        user = cache.get_user_by_email(email)
+        if user is not None:
+            return _select(user, fields)
+
+    # The GSI cannot be read consistently, but the email's lock item can
+    if consistent:
+        lock = low_level_client(table).get_item(
+            TableName=table.table_name,
+            Key=codec.encode_item(_email_key(email)),
+            ConsistentRead=True,
+        ).get('Item')
+        if lock:
+            lock = codec.decode_item(lock)
+            return find(table, lock['orgId'], lock['userId'], verbose, fields, consistent)
+
+    # an email is in one shard, so this reads a single partition
+    if shard.SHARDED_READS:
+        query_conditions = {
+            'KeyConditionExpression': 'itemTypeShard = :t and id = :i',
+            'ExpressionAttributeValues': {
+                ':t': shard.shard(OBJECT_TYPE, email),
+                ':i': email,
+            },
+            'IndexName': 'itemTypeShardIndex',
+        }
+    else:
+        query_conditions = {
+            'KeyConditionExpression': 'itemType = :t and id = :i',
+            'ExpressionAttributeValues': {
+                ':t': OBJECT_TYPE,
+                ':i': email,
+            },
+            'IndexName': 'itemTypeIdIndex'
+        }
 
     user = {}
     try:
-        response = table.query(**query_conditions)
-        if 'Items' in response:
-            user = response['Items'][0]
-            user["createdAt"] = int(user["createdAt"])
-            user["updatedAt"] = int(user["updatedAt"])
-
-            if 'deletedAt' in user:
-                user["deletedAt"] = int(user["deletedAt"])
-
+        items, _ = query_page(table, project(query_conditions, fields))
+        if items:
+            user = items[0]
+            if not fields:
+                cache.set_user(user)
         else:
             user = {}
     except Exception as e:
@@ -0,0 +1,34 @@
+import base64, json
+from decimal import Decimal
+
+# orjson is several times faster than the standard library on large bodies;
+# it is used when the deployment package includes it.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode(body: any):
+    if orjson is not None:
+        return orjson.dumps(body, default=_default).decode()
+
+    return json.dumps(body, default=_default, separators=(',', ':'), ensure_ascii=False)
+
+def respond(status: int, body: any):
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json'},
+        'body': encode(body),
+    }
@@ -0,0 +1,150 @@
+import re
+from .refactor_db import id, org, user
+
+# Per-action event schemas for the user handler. Each is compiled once, at
+# import, into a tuple of (field, required, check) so validating an event is
+# a few dict lookups and type checks, with no DynamoDB call. Fields an
+# action does not declare are ignored.
+MAX_ID_LENGTH = 128
+# RFC 5321 path limit
+MAX_EMAIL_LENGTH = 254
+MAX_NAME_LENGTH = 256
+MAX_CURSOR_LENGTH = 4096
+MAX_FIELDS = 32
+MAX_FIELD_LENGTH = 255
+MAX_USER_IDS = 1000
+# user.batch_add is built for 10k users per invocation
+MAX_BATCH_ADD_USERS = 10000
+MAX_CONNECTIONS = 50
+MAX_LIMIT = 10000
+# the longest value an error message repeats
+MAX_SHOWN = 100
+
+# something@domain.tld, without whitespace; the address itself is not checked
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+def _shown(value: any):
+    shown = str(value)
+    return shown if len(shown) <= MAX_SHOWN else shown[:MAX_SHOWN] + '...'
+
+# A check returns True when a field's value is valid, and False or an
+# error message when it is not.
+
+def _id(type: str):
+    if type not in id.OBJECT_TYPE:
+        raise Exception(f"Invalid object type: {type}")
+
+    prefix = f'{type}-'
+    return lambda value: isinstance(value, str) and value.startswith(prefix) and len(value) <= MAX_ID_LENGTH
+
+def _email(value: any):
+    return isinstance(value, str) and len(value) <= MAX_EMAIL_LENGTH and EMAIL_PATTERN.fullmatch(value) is not None
+
+def _string(max_length: int):
+    return lambda value: isinstance(value, str) and 0 < len(value) <= max_length
+
+def _integer(minimum: int, maximum: int):
+    # bool is an int, but `"limit": true` is a mistake
+    return lambda value: isinstance(value, int) and not isinstance(value, bool) and minimum <= value <= maximum
+
+def _boolean(value: any):
+    return isinstance(value, bool)
+
+def _object(value: any):
+    return isinstance(value, dict)
+
+def _list(item: callable, max_length: int, name: str):
+    def check(value: any):
+        if not isinstance(value, list) or not value:
+            return False
+        if len(value) > max_length:
+            return f"Error: too many {name}: {len(value)}, at most {max_length}"
+        return all(item(v) for v in value)
+    return check
+
+_field_name = _string(MAX_FIELD_LENGTH)
+
+def _fields(value: any):
+    # a list of names, or one comma separated string (see projection.parse_fields)
+    if isinstance(value, str):
+        value = value.split(',')
+    return isinstance(value, list) and len(value) <= MAX_FIELDS and all(_field_name(v) for v in value)
+
+def _any(value: any):
+    return True
+
+ORG_ID = _id(org.OBJECT_TYPE)
+USER_ID = _id(user.OBJECT_TYPE)
+NAME = _string(MAX_NAME_LENGTH)
+
+# fields every action accepts
+COMMON = {'verbose': _any, 'profile': _any}
+
+# action -> (required fields, optional fields)
+SCHEMAS = {
+    'warmup': ({}, {'connections': _integer(1, MAX_CONNECTIONS)}),
+    'cache_stats': ({}, {}),
+    'add': ({'orgId': ORG_ID, 'email': _email, 'username': NAME}, {'userId': USER_ID}),
+    # each user is checked by user.batch_add, which reports errors per user
+    'batch_add': ({'users': _list(_object, MAX_BATCH_ADD_USERS, 'users')}, {'orgId': ORG_ID}),
+    'find': ({'orgId': ORG_ID, 'userId': USER_ID}, {'fields': _fields, 'consistent': _boolean}),
+    'find_many': ({'orgId': ORG_ID, 'userIds': _list(USER_ID, MAX_USER_IDS, 'userIds')}, {'fields': _fields}),
+    'find_by_email': ({'email': _email}, {'fields': _fields, 'consistent': _boolean}),
+    'find_all': ({'orgId': ORG_ID}, {'limit': _integer(1, MAX_LIMIT), 'cursor': _string(MAX_CURSOR_LENGTH), 'fields': _fields}),
+    'update': ({'orgId': ORG_ID, 'userId': USER_ID, 'email': _email, 'username': NAME}, {}),
+    'delete': ({'orgId': ORG_ID, 'userId': USER_ID}, {}),
+    'restore': ({'orgId': ORG_ID, 'userId': USER_ID}, {}),
+    'destroy': ({'orgId': ORG_ID, 'userId': USER_ID}, {}),
+    'force_destroy': ({'orgId': ORG_ID, 'userId': USER_ID}, {}),
+    # the operations are counted and checked with check_all by the handler,
+    # once the batch's orgId is applied to them
+    'batch': ({'operations': lambda value: isinstance(value, list) and all(_object(v) for v in value)}, {'orgId': ORG_ID}),
+}
+
+def _compile(required: dict, optional: dict):
+    """The (field, required, check) tuple a schema is validated with."""
+    return tuple(
+        [(field, True, check) for field, check in required.items()] +
+        [(field, False, check) for field, check in {**COMMON, **optional}.items() if field not in required]
+    )
+
+_COMPILED = {action: _compile(*schema) for action, schema in SCHEMAS.items()}
+
+def check(event: any):
+    """The first thing wrong with `event`, as an error message, or None."""
+    if not isinstance(event, dict):
+        return "Error: event is not an object"
+
+    action = event.get('action')
+    if action is None:
+        return "Error: action is required"
+
+    fields = _COMPILED.get(action) if isinstance(action, str) else None
+    if fields is None:
+        return f"Error: unknown action: {_shown(action)}"
+
+    for field, required, valid in fields:
+        if field not in event:
+            if required:
+                return f"Error: {field} is required"
+            continue
+
+        result = valid(event[field])
+        if result is not True:
+            return result or f"Error: {field} is not valid: {_shown(event[field])}"
+
+    return None
+
+def check_all(events: list, nested: bool = True):
+    """(index, error) for each invalid event in `events`, checked in one pass."""
+    errors = []
+    for i, event in enumerate(events):
+        if not nested and isinstance(event, dict) and event.get('action') == 'batch':
+            errors.append((i, "Error: batches cannot be nested"))
+            continue
+
+        error = check(event)
+        if error is not None:
+            errors.append((i, error))
+
+    return errors
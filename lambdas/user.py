@@ -1,91 +1,212 @@
 from typing import cast
-import boto3, os
-from .refactor_db import user, id, org
-
-def handler(event, context):
+from concurrent.futures import ThreadPoolExecutor
+from .refactor_db import user, connection, cache, metrics, profiling, trace
+from .refactor_db.projection import parse_fields
+from .response import respond
+from . import schema
+
+# Most sub-events a single `batch` event may carry
+MAX_BATCH_OPERATIONS = 25
+BATCH_WORKERS = 8
+# Actions that see or change many users; a batch runs them on their own,
+# after everything before them and before everything after them
+BATCH_BARRIERS = {'warmup', 'cache_stats', 'batch_add', 'find_all'}
+
+def validate(event):
+    """Raise if `event` is not an action the handler can run."""
+    error = schema.check(event)
+    if error is not None:
+        raise Exception(error)
+
+    if event['action'] == 'batch':
+        operations = _batch_operations(event)
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            raise Exception(f"Error: a batch can have at most {MAX_BATCH_OPERATIONS} operations")
+
+        # every operation is checked before any of them runs
+        errors = schema.check_all(operations, nested=False)
+        if errors:
+            raise Exception(f"Error: invalid batch operations: {'; '.join(f'[{i}] {error}' for i, error in errors)}")
+
+def dispatch(table: any, event: dict):
+    """Run a validated action and return its response."""
     VERBOSE = True if 'verbose' in event else False
     FORCE = True
+    FIELDS = event.get('fields')
+    CONSISTENT = event.get('consistent', False)
 
-    # Initialize the DynamoDB client
-    dynamodb = boto3.resource('dynamodb', region_name=os.environ["AWS_REGION"])  # Replace with your region if different
-
-    # Select your table
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
-
-    # TODO: check there is an action
-    
     match event['action']:
+        case 'warmup':
+            response = connection.warmup(table, int(event.get('connections', 1)), VERBOSE)
+        case 'cache_stats':
+            response = cache.stats()
         case 'add':
-            # TODO: Validate email format
-            if 'userId' in event and not id.is_valid_id(user.OBJECT_TYPE, event['userId']):
-                raise Exception(f"Error: userId is not valid: {event['userId']}")
-
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
             response = user.add(table, cast(user.User, event), VERBOSE)
+        case 'batch_add':
+            users = [{'orgId': event['orgId'], **item} if 'orgId' in event else item for item in event['users']]
+            response = user.batch_add(table, cast(list[user.User], users), VERBOSE)
         case 'find':
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
-            if not id.is_valid_id(user.OBJECT_TYPE, event['userId']):
-                raise Exception(f"Error: userId is not valid: {event['userId']}")
-
-            response = user.find(table, event['orgId'], event['userId'], VERBOSE)
+            response = user.find(table, event['orgId'], event['userId'], VERBOSE, FIELDS, CONSISTENT)
+        case 'find_many':
+            response = user.find_many(table, event['orgId'], event['userIds'], VERBOSE, FIELDS)
         case 'find_by_email':
-            # TODO: Validate email format
-            response = user.find_by_email(table, event['email'], VERBOSE)
+            response = user.find_by_email(table, event['email'], VERBOSE, FIELDS, CONSISTENT)
         case 'find_all':
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
-            response = user.find_all(table, event['orgId'], VERBOSE)
+            if 'limit' in event or 'cursor' in event:
+                users, next_cursor = user.find_page(table, event['orgId'], event.get('limit'), event.get('cursor'), VERBOSE, FIELDS)
+                response = {'users': users, 'nextCursor': next_cursor}
+            else:
+                response = user.find_all(table, event['orgId'], VERBOSE, fields=FIELDS)
         case 'update':
-            # TODO: Validate email format
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
             response = user.update(table, cast(user.User, event), VERBOSE)
         case 'delete':
-            if not id.is_valid_id(user.OBJECT_TYPE, event['userId']):
-                raise Exception(f"Error: userId is not valid: {event['userId']}")
-
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
             response = user.delete(table, cast(user.User, event), VERBOSE)
         case 'restore':
-            if not id.is_valid_id(user.OBJECT_TYPE, event['userId']):
-                raise Exception(f"Error: userId is not valid: {event['userId']}")
-
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
             response = user.restore(table, event['orgId'], event['userId'], VERBOSE)
         case 'destroy':
-            if not id.is_valid_id(user.OBJECT_TYPE, event['userId']):
-                raise Exception(f"Error: userId is not valid: {event['userId']}")
-
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
             response = user.destroy(table, event['orgId'], event['userId'], VERBOSE)
         case 'force_destroy':
-            if not id.is_valid_id(user.OBJECT_TYPE, event['userId']):
-                raise Exception(f"Error: userId is not valid: {event['userId']}")
-
-            if not id.is_valid_id(org.OBJECT_TYPE, event['orgId']):
-                raise Exception(f"Error: orgId is not valid: {event['orgId']}")
-
             response = user.destroy(table, event['orgId'], event['userId'], VERBOSE, FORCE)
+        case 'batch':
+            response = {'results': run_batch(table, _batch_operations(event))}
+
+    return response
+
+def _batch_operations(event):
+    # a top level orgId applies to every operation that does not have its own
+    operations = event['operations']
+    if 'orgId' in event:
+        operations = [{'orgId': event['orgId'], **operation} for operation in operations]
+
+    return operations
+
+def _error(e: Exception):
+    message = str(e)
+    return {'error': message if message.startswith('Error') else f"Error: {message}"}
+
+def _run(table: any, event: dict):
+    try:
+        return dispatch(table, event)
+    except Exception as e:
+        return _error(e)
+
+def operation_keys(event):
+    """The users and emails an operation reads or writes."""
+    keys = set()
+    if 'userId' in event:
+        keys.add(('user', event.get('orgId'), event['userId']))
+    for userId in event.get('userIds', []):
+        keys.add(('user', event.get('orgId'), userId))
+    if 'email' in event:
+        keys.add(('email', event['email']))
+
+    return keys
+
+def _lanes(operations: list, indexes: list[int]):
+    """Split operations into lanes that share no user or email.
+
+    Operations in a lane run in order; different lanes run concurrently.
+    """
+    lanes = []
+    for i in indexes:
+        keys = operation_keys(operations[i])
+        joined = [lane for lane in lanes if lane[1] & keys]
+        lane = [[], set()]
+        for other in joined:
+            lane[0].extend(other[0])
+            lane[1] |= other[1]
+            lanes.remove(other)
+
+        lane[0] = sorted(lane[0]) + [i]
+        lane[1] |= keys
+        lanes.append(lane)
+
+    return [lane[0] for lane in lanes]
+
+def _stages(operations: list):
+    stage = []
+    for i, operation in enumerate(operations):
+        if operation['action'] in BATCH_BARRIERS:
+            if stage:
+                yield stage
+            yield [i]
+            stage = []
+        else:
+            stage.append(i)
+
+    if stage:
+        yield stage
+
+def run_batch(table: any, operations: list, max_workers: int = BATCH_WORKERS):
+    """Run validated operations and return their results in order.
+
+    Operations that touch different users run concurrently; those that share
+    a userId or email keep their order. Plain `find`s of users nobody else
+    in the batch touches are grouped into BatchGetItem calls. A failed
+    operation has an `error` result and does not stop the others.
+    """
+    results = [None] * len(operations)
+
+    def run_lane(lane):
+        for i in lane:
+            results[i] = _run(table, operations[i])
+
+    def run_finds(orgId, fields, indexes):
+        try:
+            found = user.find_each(table, orgId, [operations[i]['userId'] for i in indexes], fields=fields)
+        except Exception as e:
+            found = [_error(e)] * len(indexes)
+
+        for i, result in zip(indexes, found):
+            results[i] = result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for stage in _stages(operations):
+            finds = {}
+            futures = []
+            for lane in _lanes(operations, stage):
+                operation = operations[lane[0]]
+                if len(lane) == 1 and operation['action'] == 'find' and not operation.get('consistent'):
+                    fields = tuple(parse_fields(operation.get('fields')) or ())
+                    finds.setdefault((operation['orgId'], fields), []).append(lane[0])
+                else:
+                    futures.append(executor.submit(run_lane, lane))
+
+            for (orgId, fields), indexes in finds.items():
+                futures.append(executor.submit(run_finds, orgId, list(fields) or None, indexes))
+
+            for future in futures:
+                future.result()
+
+    return results
 
-    if 'error' in response:
-        return {
-            'statusCode': 400,
-            'body': f'{response}'
-        }
-
-    return {
-        'statusCode': 200,
-        'body': f'{response}'
-    }
\ No newline at end of file
+def handler(event, context):
+    # one metrics record per invocation: DynamoDB calls, capacity and latency
+    metrics.begin()
+    # a trace of the action's calls when the event has `verbose` or is sampled
+    trace.begin(event.get('action'), 'verbose' in event)
+    # a CPU profile when the event has `profile` or is sampled
+    profiler = profiling.begin('profile' in event)
+    status = 400
+    try:
+        # invalid events are rejected before any DynamoDB call
+        validate(event)
+        status = 500
+
+        # Reuse the container's DynamoDB resource and connection pool
+        table = connection.table()
+
+        response = dispatch(table, event)
+
+        status = 400 if 'error' in response else 200
+        result = respond(status, response)
+    finally:
+        summary = profiling.end(profiler, event.get('action'), status)
+        trace.end(status=status)
+        metrics.end(event.get('action'), status, context)
+
+    # the caller asked for the profile, so it gets the summary back too
+    if summary is not None and 'profile' in event:
+        result['profile'] = summary
+
+    return result
@@ -0,0 +1,95 @@
+import json
+from .refactor_db import connection, errors, metrics, trace
+from .user import validate, run_batch, operation_keys
+
+# Failures that a retry cannot fix; these messages are dropped, not retried
+PERMANENT_ERRORS = {errors.ALREADY_EXISTS, errors.NOT_FOUND}
+
+def _parse(record: dict):
+    event = json.loads(record['body'])
+    if event.get('action') == 'batch':
+        raise Exception("Error: batch actions cannot be queued")
+
+    validate(event)
+    return event
+
+def collapse(events: list[tuple[str, dict]]):
+    """Merge repeated writes to the same user into one operation.
+
+    An `update` following another `update` of the same user, with nothing
+    else touching that user or email in between, is merged into it with the
+    later fields winning. A delete, restore or destroy repeating the
+    operation just before it is dropped. Returns (operations, messageIds)
+    where messageIds[i] lists the messages behind operations[i].
+    """
+    operations = []
+    messageIds = []
+    # index of the last operation that touched each user or email
+    last = {}
+    for messageId, event in events:
+        keys = operation_keys(event)
+        previous = {last[key] for key in keys if key in last}
+        if len(previous) == 1:
+            j = previous.pop()
+            if all(last.get(key) == j for key in operation_keys(operations[j])):
+                if event['action'] == 'update' and operations[j]['action'] == 'update':
+                    operations[j] = {**operations[j], **event}
+                    messageIds[j].append(messageId)
+                    last.update(dict.fromkeys(operation_keys(operations[j]), j))
+                    continue
+
+                if event['action'] in ('delete', 'restore', 'destroy', 'force_destroy') and event == operations[j]:
+                    messageIds[j].append(messageId)
+                    continue
+
+        last.update(dict.fromkeys(keys, len(operations)))
+        operations.append(event)
+        messageIds.append([messageId])
+
+    return operations, messageIds
+
+def handler(event, context):
+    """Process an SQS batch of user actions.
+
+    Each message body is a user handler event. Invalid messages and
+    operations that fail with a retryable error are reported in
+    `batchItemFailures`, so SQS only redelivers those messages.
+    """
+    metrics.begin()
+    trace.begin('queue', 'verbose' in event)
+    status = 500
+    failures = []
+    try:
+        _process(event, failures)
+        # a batch with messages to retry counts as an error
+        status = 400 if failures else 200
+    finally:
+        trace.end(status=status, failures=len(failures))
+        metrics.end('queue', status, context)
+
+    return {'batchItemFailures': [{'itemIdentifier': messageId} for messageId in failures]}
+
+def _process(event: dict, failures: list):
+    events = []
+    for record in event['Records']:
+        try:
+            events.append((record['messageId'], _parse(record)))
+        except Exception as e:
+            print(f"Error: message {record['messageId']} is not valid: {e}")
+            failures.append(record['messageId'])
+
+    operations, messageIds = collapse(events)
+    trace.current().set(messages=len(event['Records']), operations=len(operations))
+
+    if operations:
+        # Reuse the container's DynamoDB resource and connection pool
+        table = connection.table()
+        results = run_batch(table, operations)
+
+        for ids, result in zip(messageIds, results):
+            if isinstance(result, dict) and 'error' in result:
+                if result.get('code') in PERMANENT_ERRORS:
+                    print(f"{result['error']} (messages {ids} dropped)")
+                else:
+                    print(f"{result['error']} (messages {ids} will be retried)")
+                    failures.extend(ids)
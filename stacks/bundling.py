@@ -0,0 +1,85 @@
+import compileall, fnmatch, os, py_compile, shlex, shutil
+import jsii
+from aws_cdk import (
+    BundlingOptions,
+    ILocalBundling,
+    aws_lambda as _lambda,
+)
+
+# Left out of the Lambda asset: caches and tooling that only runs from a
+# workstation (bulk import/export, the shard backfill, the asyncio API, the
+# in-memory table)
+LAMBDA_EXCLUDES = [
+    '**/__pycache__',
+    '**/*.pyc',
+    '**/.pytest_cache',
+    'refactor_db/importer.py',
+    'refactor_db/exporter.py',
+    'refactor_db/backfill.py',
+    'refactor_db/aio',
+    'refactor_db/memory.py',
+]
+
+@jsii.implements(ILocalBundling)
+class CompiledPythonBundling:
+    """Copy the asset and byte-compile it on the machine running `cdk synth`.
+
+    The Lambda filesystem is read-only, so without this every cold start
+    compiles every module it imports. Unchecked-hash .pyc files are used
+    because the asset zip does not keep source modification times.
+    """
+
+    def __init__(self, source: str):
+        self.source = os.path.abspath(source)
+
+    def _ignore(self, directory: str, names: list[str]):
+        relative = os.path.relpath(directory, self.source)
+        return [
+            name for name in names
+            if any(
+                fnmatch.fnmatch(os.path.normpath(os.path.join(relative, name)), pattern.removeprefix('**/'))
+                or fnmatch.fnmatch(name, pattern.removeprefix('**/'))
+                for pattern in LAMBDA_EXCLUDES
+            )
+        ]
+
+    def try_bundle(self, output_dir: str, *, image, **kwargs) -> bool:
+        shutil.copytree(self.source, output_dir, dirs_exist_ok=True, ignore=self._ignore)
+        return compileall.compile_dir(
+            output_dir,
+            quiet=1,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+
+def _remove_excludes():
+    """Shell commands deleting LAMBDA_EXCLUDES from the current directory."""
+    commands = []
+    paths = [pattern for pattern in LAMBDA_EXCLUDES if not pattern.startswith('**/')]
+    if paths:
+        commands.append('rm -rf ' + ' '.join(shlex.quote(path) for path in paths))
+    for pattern in LAMBDA_EXCLUDES:
+        if pattern.startswith('**/'):
+            name = shlex.quote(pattern.removeprefix('**/'))
+            commands.append(f'find . -name {name} -prune -exec rm -rf {{}} +')
+    return commands
+
+def lambda_code(path: str, compile: bool = False):
+    """Code for a Lambda function from `path`, optionally byte-compiled."""
+    if not compile:
+        return _lambda.Code.from_asset(path, exclude=LAMBDA_EXCLUDES)
+
+    return _lambda.Code.from_asset(
+        path,
+        exclude=LAMBDA_EXCLUDES,
+        bundling=BundlingOptions(
+            image=_lambda.Runtime.PYTHON_3_11.bundling_image,
+            # only used when local bundling is not possible
+            command=['bash', '-c', ' && '.join([
+                'cp -r /asset-input/. /asset-output',
+                'cd /asset-output',
+                *_remove_excludes(),
+                'python -m compileall -q --invalidation-mode unchecked-hash .',
+            ])],
+            local=CompiledPythonBundling(path),
+        ),
+    )
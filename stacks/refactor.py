@@ -4,9 +4,11 @@ from aws_cdk import (
     Stack,
     aws_dynamodb as dynamodb,
     aws_lambda as _lambda,
+    aws_lambda_event_sources as event_sources,
+    aws_sqs as sqs,
 )
 from constructs import Construct
-# import python_minifier as minifier
+from .bundling import lambda_code
 
 class RefactorStack(Stack):
 
@@ -44,15 +46,41 @@ class RefactorStack(Stack):
             )
         )
 
+        # Add the itemTypeShardIndex (itemTypeShard, id); itemTypeShard spreads
+        # each itemType over several partitions, e.g. USER#0 to USER#15
+        table.add_global_secondary_index(
+            index_name='itemTypeShardIndex',
+            partition_key=dynamodb.Attribute(
+                name='itemTypeShard',
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name='id',
+                type=dynamodb.AttributeType.STRING
+            )
+        )
+
         #######################################################################
         # Lambda
 
+        # cdk deploy -c lambdaBytecode=true ships byte-compiled modules
+        code = lambda_code('./lambdas', compile=str(self.node.try_get_context('lambdaBytecode')).lower() == 'true')
+
+        # Every function must agree on the shard count, and reads only move
+        # to the sharded index once it is backfilled, e.g.
+        # cdk deploy -c itemTypeShards=32 -c shardedReads=true
+        item_type_shards = int(self.node.try_get_context('itemTypeShards') or 16)
+        sharded_reads = str(self.node.try_get_context('shardedReads')).lower() == 'true'
+        environment = {
+            'TABLE_NAME': 'REFACTOR_TABLE',
+            'DDB_ITEM_TYPE_SHARDS': str(item_type_shards),
+            'DDB_SHARDED_READS': '1' if sharded_reads else '0',
+        }
+
         user_lambda = _lambda.Function(
             self, 'UserLambda',
-            code=_lambda.Code.from_asset('./lambdas'),
-            environment={
-                'TABLE_NAME': 'REFACTOR_TABLE'
-            },
+            code=code,
+            environment=environment,
             handler='user.handler',
             runtime=_lambda.Runtime.PYTHON_3_11,
             timeout=Duration.seconds(900),
@@ -60,4 +88,47 @@ class RefactorStack(Stack):
 
         # Grant the Lambda function permissions full access to the DynamoDB table
         table.grant_read_write_data(user_lambda)
+
+        #######################################################################
+        # Queue
+
+        # Batching is tunable per deployment, e.g.
+        # cdk deploy -c userQueueBatchSize=100 -c userQueueBatchingWindow=5
+        batch_size = int(self.node.try_get_context('userQueueBatchSize') or 10)
+        batching_window = int(self.node.try_get_context('userQueueBatchingWindow') or 0)
+        max_receive_count = int(self.node.try_get_context('userQueueMaxReceiveCount') or 5)
+        queue_timeout = Duration.seconds(60)
+
+        user_dlq = sqs.Queue(
+            self, 'UserDeadLetterQueue',
+            retention_period=Duration.days(14),
+        )
+
+        user_queue = sqs.Queue(
+            self, 'UserQueue',
+            # AWS recommends at least 6x the consumer's timeout
+            visibility_timeout=Duration.seconds(queue_timeout.to_seconds() * 6),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=max_receive_count,
+                queue=user_dlq,
+            ),
+        )
+
+        user_queue_lambda = _lambda.Function(
+            self, 'UserQueueLambda',
+            code=code,
+            environment=environment,
+            handler='user_queue.handler',
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            timeout=queue_timeout,
+        )
+
+        user_queue_lambda.add_event_source(event_sources.SqsEventSource(
+            user_queue,
+            batch_size=batch_size,
+            max_batching_window=Duration.seconds(batching_window) if batching_window else None,
+            report_batch_item_failures=True,
+        ))
+
+        table.grant_read_write_data(user_queue_lambda)
         
\ No newline at end of file
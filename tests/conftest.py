@@ -0,0 +1,24 @@
+from dotenv import load_dotenv
+import os
+import pytest
+from lambdas.refactor_db import cache, connection
+from lambdas.refactor_db.memory import MemoryTable
+
+load_dotenv()
+
+# Tests run against an in-memory table unless LIVE_DYNAMODB=1, in which case
+# they use the real TABLE_NAME table and AWS credentials from .env
+LIVE = os.environ.get('LIVE_DYNAMODB', '').lower() in ('1', 'true')
+
+if not LIVE:
+    os.environ.setdefault('TABLE_NAME', 'REFACTOR_TABLE')
+    table = connection.register(MemoryTable(os.environ['TABLE_NAME']))
+
+@pytest.fixture(autouse=True)
+def memory_table():
+    if not LIVE:
+        table.clear()
+        cache.users.clear()
+        cache.emails.clear()
+
+    yield
@@ -0,0 +1,58 @@
+from dotenv import load_dotenv
+import asyncio, threading, time
+from lambdas.refactor_db import connection, user
+from lambdas.refactor_db.aio import executor, user as aio_user
+
+load_dotenv()
+
+def test_aio_user_matches_sync_api():
+    table = connection.table()
+    orgId = "ORG-123AIO"
+    users = [
+        {"orgId": orgId, "userId": f"USER-123AIO{i}", "email": f"aio{i}@test.com", "username": "aio tester"}
+        for i in range(5)
+    ]
+
+    async def main():
+        added = await asyncio.gather(*(aio_user.add(table, u) for u in users))
+        duplicate = await aio_user.add(table, users[0])
+        found = await asyncio.gather(*(aio_user.find(table, orgId, u["userId"], consistent=True) for u in users))
+        pages = [page async for page in aio_user.find_pages(table, orgId, 2)]
+        return added, duplicate, found, pages
+
+    added, duplicate, found, pages = asyncio.run(main())
+    expected = [user.find(table, orgId, u["userId"], consistent=True) for u in users]
+    sync_pages = list(user.find_pages(table, orgId, 2))
+    sync_duplicate = user.add(table, users[0])
+
+    for u in users:
+        user.destroy(table, orgId, u["userId"], force=True)
+
+    assert [a["userId"] for a in added] == [u["userId"] for u in users]
+    assert duplicate == sync_duplicate
+    assert duplicate["code"] == "ALREADY_EXISTS"
+    assert found == expected
+    assert pages == sync_pages
+    assert sorted(u["userId"] for page, _ in pages for u in page) == [u["userId"] for u in users]
+
+def test_aio_concurrency_is_limited(monkeypatch):
+    monkeypatch.setattr(executor, 'MAX_CONCURRENCY', 2)
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def call():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(executor.wrap(call)() for _ in range(8)))
+
+    asyncio.run(main())
+
+    assert peak == 2
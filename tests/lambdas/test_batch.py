@@ -0,0 +1,80 @@
+import pytest
+from lambdas.refactor_db import batch, codec, user
+from lambdas.refactor_db.memory import MemoryTable
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    # retries are what is tested, not how long they wait
+    monkeypatch.setattr(batch, 'BACKOFF_BASE', 0.001)
+
+def test_batch_add_throttled():
+    table = MemoryTable(throttle_rate=0.3, seed=1)
+    items = [
+        {"orgId": "ORG-123", "userId": f"USER-123THROTTLED{i:03d}", "email": f"throttled{i}@test.com", "username": "throttled tester"}
+        for i in range(120)
+    ]
+
+    results = user.batch_add(table, items)
+    table.low_level_client.throttle_rate = 0
+    locks = batch.batch_get(table, [user._email_key(item["email"]) for item in items])
+
+    assert [r.get("error") for r in results] == [None] * len(items)
+    assert len(user.find_all(table, "ORG-123")) == len(items)
+    assert len(locks) == len(items)
+    assert table.calls["TransactWriteItems"] > 3
+
+def test_transact_groups_fails_only_the_group_with_a_failed_condition():
+    table = MemoryTable()
+    table.put_item(Item={"hashKey": "A", "rangeKey": "1"})
+    groups = [
+        [{'Put': {'TableName': table.table_name, 'Item': codec.encode_item({"hashKey": h, "rangeKey": r}), 'ConditionExpression': 'attribute_not_exists(hashKey)'}} for r in ("1", "2")]
+        for h in ("A", "B", "C")
+    ]
+
+    failed = batch.transact_groups(table, groups)
+
+    assert failed == {0: (0, "Error: the conditional request failed")}
+    assert table.get_item(Key={"hashKey": "A", "rangeKey": "2"}).get("Item") is None
+    assert table.get_item(Key={"hashKey": "C", "rangeKey": "2"})["Item"] == {"hashKey": "C", "rangeKey": "2"}
+
+def test_batch_write_retries_unprocessed_items():
+    table = MemoryTable(throttle_rate=0.3, seed=2)
+    items = [{"hashKey": "ORG-123", "rangeKey": f"USER-123WRITE{i:03d}", "n": i} for i in range(200)]
+
+    failed = batch.batch_write(table, items)
+    deleted = batch.batch_delete(table, [{"hashKey": item["hashKey"], "rangeKey": item["rangeKey"]} for item in items[:100]])
+    table.low_level_client.throttle_rate = 0
+    stored = table.query(KeyConditionExpression="hashKey = :h", ExpressionAttributeValues={":h": "ORG-123"})["Items"]
+
+    assert failed == {}
+    assert deleted == {}
+    assert sorted(item["rangeKey"] for item in stored) == [item["rangeKey"] for item in items[100:]]
+    # 12 requests without retries
+    assert table.calls["BatchWriteItem"] > 12
+
+def test_batch_get_retries_unprocessed_keys():
+    table = MemoryTable()
+    items = [{"hashKey": "ORG-123", "rangeKey": f"USER-123GET{i:03d}", "n": i} for i in range(250)]
+    batch.batch_write(table, items)
+    table.low_level_client.throttle_rate = 0.3
+
+    # duplicates are read once; missing keys are left out
+    keys = [{"hashKey": item["hashKey"], "rangeKey": item["rangeKey"]} for item in items] * 2
+    found = batch.batch_get(table, keys + [{"hashKey": "ORG-123", "rangeKey": "USER-123MISSING"}])
+
+    assert sorted(found, key=lambda item: item["n"]) == items
+    # 3 requests without retries
+    assert table.calls["BatchGetItem"] > 3
+
+def test_find_many_throttled():
+    table = MemoryTable()
+    user.batch_add(table, [
+        {"orgId": "ORG-123", "userId": f"USER-123MANY{i:03d}", "email": f"many{i}@test.com", "username": "many tester"}
+        for i in range(150)
+    ])
+    table.low_level_client.throttle_rate = 0.3
+
+    userIds = [f"USER-123MANY{i:03d}" for i in range(150)]
+    found = user.find_many(table, "ORG-123", userIds)
+
+    assert [u["userId"] for u in found] == userIds
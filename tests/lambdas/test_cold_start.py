@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _modules_after(statement):
+    probe = f"import sys; {statement}; print(' '.join(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+def test_handler_import_defers_boto3():
+    modules = _modules_after("import lambdas.user, lambdas.user_queue")
+
+    assert "boto3" not in modules
+    assert "botocore.config" not in modules
+    assert "botocore.exceptions" not in modules
+    assert "cProfile" not in modules
+
+def test_handler_import_skips_tooling():
+    modules = _modules_after("import lambdas.user")
+
+    assert "lambdas.refactor_db.importer" not in modules
+    assert "lambdas.refactor_db.exporter" not in modules
+    assert "lambdas.refactor_db.backfill" not in modules
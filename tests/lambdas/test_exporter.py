@@ -0,0 +1,55 @@
+from dotenv import load_dotenv
+import pytest
+from lambdas.refactor_db import connection, exporter, org, user
+
+load_dotenv()
+
+class FailingClient:
+    """Pass scans through to `client` until `pages` have been read."""
+
+    def __init__(self, client: any, pages: int):
+        self.client = client
+        self.pages = pages
+
+    def scan(self, **kwargs):
+        if self.pages == 0:
+            raise Exception("connection lost")
+        self.pages -= 1
+        return self.client.scan(**kwargs)
+
+def _ours(items: list, orgId: str):
+    return [item for item in items if item['hashKey'] == orgId or item['hashKey'].startswith('EMAIL#export')]
+
+def test_export_resumes_after_interruption(tmp_path, monkeypatch):
+    table = connection.table()
+    orgId = "ORG-123EXPORT"
+    org.add(table, {"orgId": orgId, "name": "export tester"})
+    user.batch_add(table, [
+        {"orgId": orgId, "userId": f"USER-123EXPORT{i:02d}", "email": f"export{i}@test.com", "username": "export tester"}
+        for i in range(10)
+    ])
+
+    client = connection.low_level_client(table)
+    monkeypatch.setattr(exporter, 'low_level_client', lambda table: FailingClient(client, 2))
+    with pytest.raises(Exception, match="connection lost"):
+        exporter.export_segment(table, str(tmp_path), 0, 1, page_size=3)
+    interrupted = exporter._read_checkpoint(exporter.segment_paths(str(tmp_path), 0)[1])
+
+    monkeypatch.setattr(exporter, 'low_level_client', lambda table: client)
+    report = exporter.export_table(table, str(tmp_path / "all"), workers=1, page_size=3)
+    resumed = exporter.export_segment(table, str(tmp_path), 0, 1, page_size=3)
+    orgs = exporter.export_table(table, str(tmp_path / "orgs"), workers=2, itemTypes=["ORG"])
+
+    org.destroy(table, orgId, force=True)
+
+    items = _ours(list(exporter.read_export(str(tmp_path))), orgId)
+    keys = [(item['hashKey'], item['rangeKey']) for item in items]
+    assert (interrupted['items'], interrupted['complete']) == (6, False)
+    assert resumed['complete']
+    assert resumed['items'] == report['items']
+    # the org, its users and their email locks, each once
+    assert len(keys) == len(set(keys)) == 21
+    assert sorted(keys) == sorted((item['hashKey'], item['rangeKey']) for item in _ours(list(exporter.read_export(str(tmp_path / "all"))), orgId))
+    assert all(type(item['createdAt']) is int for item in items if 'createdAt' in item)
+    assert orgs['items'] >= 1
+    assert {item['itemType'] for item in exporter.read_export(str(tmp_path / "orgs"))} == {"ORG"}
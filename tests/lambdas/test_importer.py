@@ -0,0 +1,39 @@
+from dotenv import load_dotenv
+import json
+from lambdas.refactor_db import connection, importer, user
+
+load_dotenv()
+
+def test_import_users(tmp_path):
+    table = connection.table()
+    orgId = "ORG-123IMPORT"
+    lines = [
+        json.dumps({"userId": "USER-123IMPORT1", "email": "import1@test.com", "username": "import tester"}),
+        json.dumps({"email": "import2@test.com", "username": "import tester"}),
+        json.dumps({"userId": "USER-123IMPORT3", "username": "import tester"}),
+        '{"userId": "USER-123IMPORT4", ',
+        json.dumps({"userId": "bogus", "email": "import5@test.com", "username": "import tester"}),
+        # the same email, which a one record chunk could hand to another worker
+        json.dumps({"userId": "USER-123IMPORT6", "email": "import1@test.com", "username": "import tester"}),
+    ]
+    path = tmp_path / "users.jsonl"
+    path.write_text('\n'.join(lines) + '\n')
+    rejects_path = tmp_path / "rejects.jsonl"
+
+    report = importer.import_users(table, str(path), orgId=orgId, rejects_path=str(rejects_path), workers=4, chunk_size=1, report_every=None)
+
+    users = user.find_all(table, orgId)
+    for u in users:
+        user.destroy(table, orgId, u["userId"], force=True)
+
+    rejects = sorted((json.loads(line) for line in rejects_path.read_text().splitlines()), key=lambda r: r["line"])
+
+    assert (report["read"], report["imported"], report["rejected"]) == (6, 2, 4)
+    assert sorted(u["email"] for u in users) == ["import1@test.com", "import2@test.com"]
+    generated = next(u for u in users if u["email"] == "import2@test.com")
+    assert generated["userId"].startswith("USER-")
+    assert [r["line"] for r in rejects] == [3, 4, 5, 6]
+    assert "email" in rejects[0]["error"]
+    assert "not valid JSON" in rejects[1]["error"]
+    assert rejects[2]["error"] == "Error: userId is not valid: bogus"
+    assert "import1@test.com" in rejects[3]["error"]
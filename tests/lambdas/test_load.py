@@ -0,0 +1,18 @@
+from benchmarks.load import load_templates, parse_mix, run, summarize
+from lambdas.refactor_db import connection
+
+def test_default_mix_runs_without_errors():
+    templates = load_templates()
+    result = run(connection.table(), parse_mix(None, templates), templates, concurrency=4, duration=30, requests=300, users=20, seed_value=1)
+    summary = summarize(result)
+
+    assert summary['requests'] == 300
+    assert summary['errors'] == 0, summary['actions']
+    assert {'find', 'update', 'delete'} <= set(summary['actions'])
+
+def test_invalid_fixture_errors_are_reported():
+    templates = load_templates()
+    result = run(connection.table(), parse_mix('add-bad-org=1', templates), templates, concurrency=2, requests=10, users=1)
+    summary = summarize(result)
+
+    assert summary['actions']['add-bad-org']['error_rate'] == 1.0
@@ -0,0 +1,76 @@
+import pytest, time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from lambdas.refactor_db import codec, connection
+from lambdas.refactor_db.memory import MemoryClient
+
+@pytest.mark.parametrize("request_", [
+    {"KeyConditionExpression": "hashKey = :h", "FilterExpression": "rangeKey <> :h"},
+    {"KeyConditionExpression": "itemType = :h", "FilterExpression": "id <> :h", "IndexName": "itemTypeIdIndex"},
+])
+def test_query_filter_on_a_key_attribute_is_rejected(request_):
+    table = connection.table()
+    client = connection.low_level_client(table)
+
+    with pytest.raises(ClientError, match="ValidationException"):
+        client.query(TableName=table.table_name, ExpressionAttributeValues={":h": {"S": "ORG-123"}}, **request_)
+
+def test_query_start_key_from_another_partition_is_rejected():
+    client = MemoryClient()
+    for orgId in ("ORG-1", "ORG-2"):
+        client.put_item(TableName=client.table_name, Item=codec.encode_item({"hashKey": orgId, "rangeKey": "USER-1"}))
+
+    with pytest.raises(ClientError, match="outside query boundaries"):
+        client.query(
+            TableName=client.table_name,
+            KeyConditionExpression="hashKey = :h",
+            ExpressionAttributeValues={":h": {"S": "ORG-1"}},
+            ExclusiveStartKey=codec.encode_key("ORG-2", "USER-1"),
+        )
+
+def test_throttled_calls():
+    client = MemoryClient(throttle_rate=1.0)
+    item = codec.encode_item({"hashKey": "ORG-1", "rangeKey": "USER-1"})
+
+    with pytest.raises(ClientError, match="ProvisionedThroughputExceededException"):
+        client.put_item(TableName=client.table_name, Item=item)
+    written = client.batch_write_item(RequestItems={client.table_name: [{"PutRequest": {"Item": item}}]})
+    read = client.batch_get_item(RequestItems={client.table_name: {"Keys": [codec.encode_key("ORG-1", "USER-1")]}})
+    with pytest.raises(ClientError) as cancelled:
+        client.transact_write_items(TransactItems=[{"Put": {"TableName": client.table_name, "Item": item}}])
+
+    assert written["UnprocessedItems"] == {client.table_name: [{"PutRequest": {"Item": item}}]}
+    assert read["UnprocessedKeys"][client.table_name]["Keys"] == [codec.encode_key("ORG-1", "USER-1")]
+    assert read["Responses"][client.table_name] == []
+    assert cancelled.value.response["CancellationReasons"][0]["Code"] == "ThrottlingError"
+    # nothing was written
+    client.throttle_rate = 0.0
+    assert "Item" not in client.get_item(TableName=client.table_name, Key=codec.encode_key("ORG-1", "USER-1"))
+
+def test_partly_throttled_batches_return_the_rest_as_unprocessed():
+    client = MemoryClient(throttle_rate=0.5, seed=1)
+    items = [codec.encode_item({"hashKey": "ORG-1", "rangeKey": f"USER-{i:02d}"}) for i in range(25)]
+
+    written = client.batch_write_item(RequestItems={client.table_name: [{"PutRequest": {"Item": item}} for item in items]})
+    unprocessed = written["UnprocessedItems"].get(client.table_name, [])
+    client.throttle_rate = 0.0
+    stored = client.query(TableName=client.table_name, KeyConditionExpression="hashKey = :h", ExpressionAttributeValues={":h": {"S": "ORG-1"}})
+
+    assert 0 < len(unprocessed) < len(items)
+    assert stored["Count"] + len(unprocessed) == len(items)
+
+def test_latency_overlaps_between_threads():
+    client = MemoryClient(latency=0.05)
+    key = codec.encode_key("ORG-1", "USER-1")
+
+    started = time.monotonic()
+    client.get_item(TableName=client.table_name, Key=key)
+    single = time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: client.get_item(TableName=client.table_name, Key=key), range(8)))
+    concurrent = time.monotonic() - started
+
+    assert single >= 0.05
+    assert concurrent < 0.05 * 4
@@ -0,0 +1,42 @@
+import json
+import lambdas.user as user
+
+def _records(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+def test_handler_emits_one_metrics_record(capsys):
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-metrics",
+        "email": "metrics@test.com",
+        "username": "tester",
+    }
+    user.handler(event_add, {})
+    capsys.readouterr()
+
+    response = user.handler({"action": "find", "orgId": "ORG-123", "userId": "USER-metrics", "consistent": True}, {})
+    records = _records(capsys.readouterr().out)
+    user.handler({"action": "force_destroy", "orgId": "ORG-123", "userId": "USER-metrics"}, {})
+
+    assert response['statusCode'] == 200
+    assert len(records) == 1
+    record = records[0]
+    assert record["Action"] == "find"
+    assert record["DynamoDBCalls"] == 1
+    assert record["Operations"] == {"GetItem": 1}
+    assert record["ReadCapacityUnits"] > 0
+    assert len(record["DynamoDBLatency"]) == 1
+    metrics = record["_aws"]["CloudWatchMetrics"][0]
+    assert {metric["Name"] for metric in metrics["Metrics"]} <= set(record)
+    # capacity is requested for the metrics only; callers do not see it
+    assert "ConsumedCapacity" not in json.loads(response['body'])
+
+def test_failed_action_is_counted_as_an_error(capsys):
+    response = user.handler({"action": "destroy", "orgId": "ORG-123", "userId": "USER-missing"}, {})
+    record, = _records(capsys.readouterr().out)
+
+    assert response['statusCode'] == 400
+    assert record["Action"] == "destroy"
+    assert record["Errors"] == 1
+    assert record["StatusCode"] == 400
@@ -0,0 +1,16 @@
+import json
+from benchmarks.operations import CASES, main
+
+def test_operations_benchmark_runs_every_case(tmp_path, capsys):
+    output = tmp_path / "before.json"
+    main(["--users", "1,3", "--repeat", "2", "--heavy-repeat", "1", "--output", str(output)])
+    report = json.loads(output.read_text())
+
+    main(["--users", "1,3", "--repeat", "2", "--heavy-repeat", "1", "--baseline", str(output)])
+    compared = capsys.readouterr().out.splitlines()
+
+    assert [(r["function"], r["users"]) for r in report["results"]] == [(name, users) for users in (1, 3) for name in CASES]
+    assert all(r["round_trips"] >= 0 and r["wall_ms"]["p50"] >= 0 for r in report["results"])
+    assert next(r for r in report["results"] if r["function"] == "user.find (cached)")["round_trips"] == 0
+    assert len(compared) == 2 * len(CASES)
+    assert all(" wall x" in line for line in compared)
@@ -0,0 +1,197 @@
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+from lambdas.refactor_db import backfill, cache, cascade, connection, org, shard, user
+
+load_dotenv()
+
+def test_org_delete_restore_cascade():
+    table = connection.table()
+    org.add(table, {"orgId": "ORG-123CASCADE", "name": "cascade tester"})
+    user.batch_add(table, [
+        {"orgId": "ORG-123CASCADE", "userId": f"USER-123CASCADE{i}", "email": f"cascade{i}@test.com", "username": "cascade tester"}
+        for i in range(3)
+    ])
+
+    deleted = org.delete(table, {"orgId": "ORG-123CASCADE"})
+    deleted_users = user.find_all(table, "ORG-123CASCADE")
+
+    restored = org.restore(table, "ORG-123CASCADE")
+    restored_users = user.find_all(table, "ORG-123CASCADE")
+
+    destroyed = org.destroy(table, "ORG-123CASCADE", force=True)
+
+    assert deleted["cascade"]["complete"]
+    assert deleted["cascade"]["processed"] == 3
+    assert all(u["deletedAt"] == deleted["deletedAt"] for u in deleted_users)
+    assert 'deletedAt' not in restored
+    assert all('deletedAt' not in u for u in restored_users)
+    assert destroyed["cascade"]["processed"] == 3
+    assert user.find_all(table, "ORG-123CASCADE") == []
+    assert user.find_by_email(table, "cascade0@test.com", consistent=True) == {}
+
+def test_org_destroy_missing_org_keeps_collection():
+    table = connection.table()
+    user.add(table, {"orgId": "ORG-123NOORG", "userId": "USER-123NOORG", "email": "noorg@test.com", "username": "no org tester"})
+
+    response = org.destroy(table, "ORG-123NOORG")
+    users = user.find_all(table, "ORG-123NOORG")
+
+    user.destroy(table, "ORG-123NOORG", "USER-123NOORG", force=True)
+
+    assert response["code"] == "NOT_FOUND"
+    assert [u["userId"] for u in users] == ["USER-123NOORG"]
+
+def test_org_find_all_across_shards(monkeypatch):
+    monkeypatch.setattr(shard, 'SHARDED_READS', True)
+    table = connection.table()
+    orgIds = sorted(f"ORG-123SHARD{i:02d}" for i in range(20))
+    for orgId in orgIds:
+        org.add(table, {"orgId": orgId, "name": "shard tester"})
+
+    found = [o["orgId"] for o in org.find_all(table, None) if o["orgId"] in orgIds]
+    paged = []
+    cursor = None
+    while True:
+        orgs, cursor = org.find_page(table, 3, cursor)
+        assert len(orgs) <= 3
+        paged.extend(o["orgId"] for o in orgs if o["orgId"] in orgIds)
+        if cursor is None:
+            break
+
+    for orgId in orgIds:
+        org.destroy(table, orgId, force=True)
+
+    # find_all merges the shards back into id order; pages are per shard
+    assert found == orgIds
+    assert sorted(paged) == orgIds
+def test_org_destroy_read_error_is_not_not_found(monkeypatch):
+    class ThrottledClient:
+        def get_item(self, **kwargs):
+            raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "throttled"}}, "GetItem")
+
+    table = connection.table()
+    monkeypatch.setattr(org, 'low_level_client', lambda table: ThrottledClient())
+    found = org.find(table, "ORG-123THROTTLED")
+    destroyed = org.destroy(table, "ORG-123THROTTLED")
+    restored = org.restore(table, "ORG-123THROTTLED")
+
+    assert "ProvisionedThroughputExceededException" in found["error"]
+    assert "code" not in destroyed and "ProvisionedThroughputExceededException" in destroyed["error"]
+    assert "code" not in restored and "ProvisionedThroughputExceededException" in restored["error"]
+
+def test_org_destroy_with_failures_keeps_org(monkeypatch):
+    table = connection.table()
+    org.add(table, {"orgId": "ORG-123FAILDESTROY", "name": "failure tester"})
+    user.batch_add(table, [
+        {"orgId": "ORG-123FAILDESTROY", "userId": f"USER-123FAILDESTROY{i}", "email": f"faildestroy{i}@test.com", "username": "failure tester"}
+        for i in range(3)
+    ])
+    org.delete(table, {"orgId": "ORG-123FAILDESTROY"})
+
+    batch_delete = cascade.batch_delete
+    def failing_delete(table, keys, max_workers):
+        failed = {(key['hashKey'], key['rangeKey']): "Error: throttled" for key in keys if key['rangeKey'].endswith('0')}
+        return {**batch_delete(table, [key for key in keys if (key['hashKey'], key['rangeKey']) not in failed], max_workers), **failed}
+
+    monkeypatch.setattr(cascade, 'batch_delete', failing_delete)
+    failed = org.destroy(table, "ORG-123FAILDESTROY")
+    kept = org.find(table, "ORG-123FAILDESTROY", consistent=True)
+    monkeypatch.setattr(cascade, 'batch_delete', batch_delete)
+    retried = org.destroy(table, "ORG-123FAILDESTROY", cursor=failed["cascade"]["cursor"])
+
+    assert failed["cascade"]["failed"] == 1
+    assert not failed["cascade"]["complete"]
+    assert failed["cascade"]["cursor"] is None
+    assert kept["orgId"] == "ORG-123FAILDESTROY"
+    assert retried["cascade"]["complete"]
+    assert user.find_all(table, "ORG-123FAILDESTROY") == []
+    assert org.find(table, "ORG-123FAILDESTROY", consistent=True) == {}
+
+def test_org_restore_with_failures_keeps_deleted_at(monkeypatch):
+    table = connection.table()
+    org.add(table, {"orgId": "ORG-123FAILRESTORE", "name": "failure tester"})
+    user.batch_add(table, [
+        {"orgId": "ORG-123FAILRESTORE", "userId": f"USER-123FAILRESTORE{i}", "email": f"failrestore{i}@test.com", "username": "failure tester"}
+        for i in range(3)
+    ])
+    org.delete(table, {"orgId": "ORG-123FAILRESTORE"})
+
+    update_items = cascade._update_items
+    def failing_update(table, items, operation, deletedAt):
+        return 0, 0, [{'rangeKey': item['rangeKey'], 'error': "Error: throttled"} for item in items]
+
+    monkeypatch.setattr(cascade, '_update_items', failing_update)
+    failed = org.restore(table, "ORG-123FAILRESTORE")
+    monkeypatch.setattr(cascade, '_update_items', update_items)
+    retried = org.restore(table, "ORG-123FAILRESTORE", cursor=failed["cascade"]["cursor"])
+    users = user.find_all(table, "ORG-123FAILRESTORE")
+
+    org.destroy(table, "ORG-123FAILRESTORE", force=True)
+
+    assert failed["cascade"]["failed"] == 3
+    assert not failed["cascade"]["complete"]
+    assert 'deletedAt' in failed
+    assert 'deletedAt' not in retried
+    assert retried["cascade"]["processed"] == 3
+    assert all('deletedAt' not in u for u in users)
+
+def test_user_email_change_moves_shard():
+    table = connection.table()
+    user.add(table, {"orgId": "ORG-123MOVE", "userId": "USER-123MOVE", "email": "move@test.com", "username": "move tester"})
+
+    updated = user.update(table, {"orgId": "ORG-123MOVE", "userId": "USER-123MOVE", "email": "moved@test.com", "username": "move tester"})
+    cached = user.find(table, "ORG-123MOVE", "USER-123MOVE")
+    stored = user.find(table, "ORG-123MOVE", "USER-123MOVE", consistent=True)
+
+    user.destroy(table, "ORG-123MOVE", "USER-123MOVE", force=True)
+
+    assert stored["itemTypeShard"] == shard.shard(user.OBJECT_TYPE, "moved@test.com")
+    assert updated["itemTypeShard"] == stored["itemTypeShard"]
+    assert cached["itemTypeShard"] == stored["itemTypeShard"]
+
+def test_backfill_sets_item_type_shards(monkeypatch):
+    monkeypatch.setattr(shard, 'SHARDED_READS', True)
+    table = connection.table()
+    org.add(table, {"orgId": "ORG-123BACKFILL", "name": "backfill tester"})
+    user.add(table, {"orgId": "ORG-123BACKFILL", "userId": "USER-123BACKFILL", "email": "backfill@test.com", "username": "backfill tester"})
+    # items written before the sharded index existed
+    for key in ({"hashKey": "ORG-123BACKFILL", "rangeKey": "ORG-123BACKFILL"}, {"hashKey": "ORG-123BACKFILL", "rangeKey": "USER-123BACKFILL"}):
+        table.update_item(Key=key, UpdateExpression="REMOVE itemTypeShard")
+    cache.users.clear()
+    cache.emails.clear()
+
+    missing = user.find_by_email(table, "backfill@test.com", fields=["userId"])
+    report = backfill.backfill(table, workers=2)
+    found = user.find_by_email(table, "backfill@test.com", fields=["userId"])
+    again = backfill.backfill(table, workers=2, dry_run=True)
+
+    org.destroy(table, "ORG-123BACKFILL", force=True)
+
+    assert missing == {}
+    assert report["updated"] >= 2
+    assert found == {"userId": "USER-123BACKFILL"}
+    assert again["updated"] == 0
+
+def test_backfill_writes_missing_email_locks():
+    table = connection.table()
+    user.add(table, {"orgId": "ORG-123LOCKS", "userId": "USER-123LOCKS1", "email": "locks1@test.com", "username": "lock tester"})
+    user.add(table, {"orgId": "ORG-123LOCKS", "userId": "USER-123LOCKS2", "email": "locks2@test.com", "username": "lock tester"})
+    # users written before email locks existed
+    for email in ("locks1@test.com", "locks2@test.com"):
+        table.delete_item(Key={"hashKey": f"EMAIL#{email}", "rangeKey": f"EMAIL#{email}"})
+    # which let another user take the same email
+    duplicate = user.add(table, {"orgId": "ORG-123LOCKS", "userId": "USER-123LOCKS3", "email": "locks2@test.com", "username": "lock tester"})
+
+    dry_run = backfill.backfill(table, workers=2, dry_run=True)
+    report = backfill.backfill(table, workers=2)
+    again = backfill.backfill(table, workers=2)
+    claimed = user.add(table, {"orgId": "ORG-123LOCKS", "userId": "USER-123LOCKS4", "email": "locks1@test.com", "username": "lock tester"})
+
+    for userId in ("USER-123LOCKS1", "USER-123LOCKS2", "USER-123LOCKS3"):
+        user.destroy(table, "ORG-123LOCKS", userId, force=True)
+
+    assert duplicate["userId"] == "USER-123LOCKS3"
+    assert dry_run["locked"] == 1
+    assert (report["locked"], report["duplicates"]) == (1, 1)
+    assert (again["locked"], again["duplicates"]) == (0, 1)
+    assert claimed["code"] == "ALREADY_EXISTS"
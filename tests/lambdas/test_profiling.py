@@ -0,0 +1,24 @@
+import json, os
+import lambdas.user as user
+from lambdas.refactor_db import profiling
+
+def test_profile_event_returns_a_summary(capsys, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    response = user.handler({"action": "find_all", "orgId": "ORG-123", "profile": True}, {})
+    output = capsys.readouterr().out
+
+    assert response['statusCode'] == 200
+    summary = response['profile']
+    assert summary["profile"] == "find_all"
+    assert summary["areas_ms"].keys() <= {"boto3", "refactor_db", "response", "handler", "other"}
+    assert any("find_all" in function["function"] for function in summary["top"])
+    assert os.path.dirname(summary["stats"]) == str(tmp_path)
+    assert os.path.exists(summary["stats"])
+    # the summary is logged as well, one line
+    assert [json.loads(line) for line in output.splitlines() if line.startswith('{"profile"')] == [summary]
+
+def test_unprofiled_event_has_no_summary(capsys):
+    response = user.handler({"action": "find_all", "orgId": "ORG-123"}, {})
+
+    assert 'profile' not in response
+    assert '{"profile"' not in capsys.readouterr().out
@@ -0,0 +1,53 @@
+import glob, json, os
+import pytest
+import lambdas.user as user
+from lambdas import schema
+from lambdas.refactor_db import connection
+
+def test_every_event_fixture_is_valid():
+    root = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'events', 'user')
+    for path in glob.glob(os.path.join(root, '*.json')):
+        with open(path) as f:
+            event = json.load(f)
+        if 'action' not in event:
+            continue
+        error = schema.check(event)
+        # add-bad-org.json is meant to fail
+        assert (error is not None) == path.endswith('add-bad-org.json'), (path, error)
+
+@pytest.mark.parametrize("event, error", [
+    ({"orgId": "ORG-123"}, "action is required"),
+    ({"action": "find", "orgId": "ORG-123"}, "userId is required"),
+    ({"action": "find", "orgId": "ORG-123", "userId": "USER-" + "1" * 200}, "userId is not valid"),
+    ({"action": "add", "orgId": "ORG-123", "email": "not an email", "username": "tester"}, "email is not valid"),
+    ({"action": "find_all", "orgId": "ORG-123", "limit": "10"}, "limit is not valid"),
+    ({"action": "find_many", "orgId": "ORG-123", "userIds": ["USER-1", "BAD-2"]}, "userIds is not valid"),
+    ({"action": "update", "orgId": "ORG-123", "userId": "USER-123", "email": "update@test.com"}, "username is required"),
+    ({"action": "batch_add", "orgId": "ORG-123", "users": [{}] * (schema.MAX_BATCH_ADD_USERS + 1)}, "too many users: 10001"),
+])
+def test_invalid_events_are_rejected_without_a_call(event, error):
+    table = connection.table()
+    calls = dict(getattr(table, 'calls', {}))
+
+    assert error in schema.check(event)
+    with pytest.raises(Exception, match=error):
+        user.handler(event, {})
+    assert dict(getattr(table, 'calls', {})) == calls
+
+def test_check_all_reports_every_invalid_event():
+    events = [
+        {"action": "find", "orgId": "ORG-123", "userId": "USER-123"},
+        {"action": "batch", "operations": []},
+        {"action": "find_by_email", "email": "find@test.com"},
+        {"action": "restore", "orgId": "ORG-123"},
+    ]
+
+    assert schema.check_all(events, nested=False) == [
+        (1, "Error: batches cannot be nested"),
+        (3, "Error: userId is required"),
+    ]
+
+def test_large_batch_add_is_valid():
+    users = [{"email": f"large{i}@test.com", "username": "large tester"} for i in range(5000)]
+
+    assert schema.check({"action": "batch_add", "orgId": "ORG-123", "users": users}) is None
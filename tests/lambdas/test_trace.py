@@ -0,0 +1,32 @@
+import json
+import lambdas.user as user
+
+def _traces(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"trace"')]
+
+def test_verbose_event_logs_one_trace(capsys):
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-trace",
+        "email": "trace@test.com",
+        "username": "tester",
+    }
+    user.handler(event_add, {})
+    assert _traces(capsys.readouterr().out) == []
+
+    user.handler({"action": "find", "orgId": "ORG-123", "userId": "USER-trace", "consistent": True, "verbose": True}, {})
+    traces = _traces(capsys.readouterr().out)
+    user.handler({"action": "force_destroy", "orgId": "ORG-123", "userId": "USER-trace"}, {})
+
+    assert len(traces) == 1
+    trace = traces[0]
+    assert trace["name"] == "find"
+    assert trace["reason"] == "verbose"
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert spans["find"]["fields"]["status"] == 200
+    # the DynamoDB call is nested under the refactor_db call that made it
+    assert spans["user.find"]["parent"] == spans["find"]["id"]
+    assert spans["user.find"]["fields"]["args"]["userId"] == "USER-trace"
+    assert spans["dynamodb.GetItem"]["parent"] == spans["user.find"]["id"]
+    assert spans["dynamodb.GetItem"]["fields"]["rcu"] > 0
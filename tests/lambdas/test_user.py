@@ -22,7 +22,7 @@ def test_user_create():
     }
     user.handler(event_destroy, {})
 
-    new_user = json.loads(response['body'].replace("'", '"'))
+    new_user = json.loads(response['body'])
     assert new_user["orgId"] == event_add["orgId"]
     assert new_user["userId"] == event_add["userId"]
     assert new_user["email"] == event_add["email"]
@@ -36,7 +36,7 @@ def test_user_create_no_id():
         "username": "no id tester",
     }
     response = user.handler(event_add, {})
-    new_user = json.loads(response['body'].replace("'", '"'))
+    new_user = json.loads(response['body'])
 
     event_destroy = {
         "action": "force_destroy",
@@ -97,7 +97,7 @@ def test_user_update():
     }
     user.handler(event_destroy, {})
 
-    updated_user = json.loads(response['body'].replace("'", '"'))
+    updated_user = json.loads(response['body'])
     assert updated_user["email"] == event_update["email"]
     assert updated_user["username"] == event_update["username"]
 
@@ -127,7 +127,7 @@ def test_user_delete():
     }
     user.handler(event_destroy, {})
 
-    deleted_user = json.loads(response['body'].replace("'", '"'))
+    deleted_user = json.loads(response['body'])
     assert deleted_user["email"] == event_delete["email"]
     assert deleted_user["username"] == event_delete["username"]
 
@@ -147,7 +147,7 @@ def test_user_restore():
         "userId": "USER-123RESTORE",
     }
     response = user.handler(event_delete, {})
-    deleted_user = json.loads(response['body'].replace("'", '"'))
+    deleted_user = json.loads(response['body'])
     assert 'deletedAt' in deleted_user
 
     event_restore = {
@@ -157,7 +157,7 @@ def test_user_restore():
     }
     response = user.handler(event_restore, {})
 
-    restored_user = json.loads(response['body'].replace("'", '"'))
+    restored_user = json.loads(response['body'])
     assert 'deletedAt' not in restored_user
 
     event_destroy = {
@@ -191,7 +191,7 @@ def test_user_destroy():
     }
     user.handler(event_destroy, {})
 
-    destroyed_user = json.loads(response['body'].replace("'", '"'))
+    destroyed_user = json.loads(response['body'])
     assert destroyed_user["userId"] == event_delete["userId"]
     assert 'email' in destroyed_user
     assert "username" in destroyed_user
@@ -246,7 +246,7 @@ def test_user_find():
     }
     user.handler(event_destroy, {})
 
-    found_user = json.loads(response['body'].replace("'", '"'))
+    found_user = json.loads(response['body'])
     assert found_user["userId"] == event_add["userId"]
     assert found_user["email"] == event_add["email"]
 
@@ -284,7 +284,7 @@ def test_user_find_all():
         }
         user.handler(event_destroy, {})
 
-    found_users = json.loads(response['body'].replace("'", '"'))
+    found_users = json.loads(response['body'])
     assert found_users[0]["userId"] == event_add1["userId"]
     assert found_users[1]["email"] == event_add2["email"]
 
@@ -311,6 +311,515 @@ def test_user_find_by_email():
     }
     user.handler(event_destroy, {})
 
-    found_user = json.loads(response['body'].replace("'", '"'))
+    found_user = json.loads(response['body'])
     assert found_user["userId"] == event_add["userId"]
-    assert found_user["email"] == event_add["email"]
\ No newline at end of file
+    assert found_user["email"] == event_add["email"]
+
+def test_user_warmup():
+    event_warmup = {
+        "action": "warmup",
+        "connections": 2,
+    }
+    response = user.handler(event_warmup, {})
+
+    warmup = json.loads(response['body'])
+    assert response['statusCode'] == 200
+    assert warmup["warm"] == True
+    assert warmup["connections"] == 2
+
+def test_user_find_all_paginated():
+    userIds = [f"USER-123PAGE{i}" for i in range(3)]
+    for userId in userIds:
+        event_add = {
+            "action": "add",
+            "orgId": "ORG-123PAGE",
+            "userId": userId,
+            "email": f"{userId.lower()}@test.com",
+            "username": "page tester",
+        }
+        user.handler(event_add, {})
+
+    event_find_all = {
+        "action": "find_all",
+        "orgId": "ORG-123PAGE",
+        "limit": 2,
+    }
+    response = user.handler(event_find_all, {})
+    first_page = json.loads(response['body'])
+
+    event_find_all["cursor"] = first_page["nextCursor"]
+    response = user.handler(event_find_all, {})
+    second_page = json.loads(response['body'])
+
+    for userId in userIds:
+        event_destroy = {
+            "action": "force_destroy",
+            "orgId": "ORG-123PAGE",
+            "userId": userId,
+        }
+        user.handler(event_destroy, {})
+
+    assert len(first_page["users"]) == 2
+    assert first_page["nextCursor"] is not None
+    found = [u["userId"] for u in first_page["users"] + second_page["users"]]
+    assert found == userIds
+
+def test_user_find_all_cursor_from_another_org():
+    for orgId in ("ORG-123CURSOR1", "ORG-123CURSOR2"):
+        for i in range(2):
+            event_add = {
+                "action": "add",
+                "orgId": orgId,
+                "userId": f"USER-123CURSOR{i}",
+                "email": f"{orgId.lower()}-{i}@test.com",
+                "username": "cursor tester",
+            }
+            user.handler(event_add, {})
+
+    event_find_all = {
+        "action": "find_all",
+        "orgId": "ORG-123CURSOR1",
+        "limit": 1,
+    }
+    first_page = json.loads(user.handler(event_find_all, {})['body'])
+
+    event_find_all["orgId"] = "ORG-123CURSOR2"
+    event_find_all["cursor"] = first_page["nextCursor"]
+    with pytest.raises(Exception, match="cursor is not valid"):
+        user.handler(event_find_all, {})
+
+    for orgId in ("ORG-123CURSOR1", "ORG-123CURSOR2"):
+        for i in range(2):
+            user.handler({"action": "force_destroy", "orgId": orgId, "userId": f"USER-123CURSOR{i}"}, {})
+
+def test_user_batch_add():
+    event_batch_add = {
+        "action": "batch_add",
+        "orgId": "ORG-123",
+        "users": [
+            {"userId": "USER-123BATCH1", "email": "batch1@test.com", "username": "batch1 tester"},
+            {"email": "batch2@test.com", "username": "batch2 tester"},
+            {"userId": "USER-123BATCH3", "email": "batch1@test.com", "username": "duplicate tester"},
+            {"userId": "BUSER-123BATCH4", "email": "batch4@test.com", "username": "bad id tester"},
+        ],
+    }
+    response = user.handler(event_batch_add, {})
+    results = json.loads(response['body'])
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123BATCH1",
+    }
+    found_user = json.loads(user.handler(event_find, {})['body'])
+
+    for result in results:
+        if 'userId' in result:
+            event_destroy = {
+                "action": "force_destroy",
+                "orgId": "ORG-123",
+                "userId": result["userId"],
+            }
+            user.handler(event_destroy, {})
+
+    assert response['statusCode'] == 200
+    assert results[0]["userId"] == "USER-123BATCH1"
+    assert results[1]["userId"].startswith("USER-")
+    assert results[1]["email"] == "batch2@test.com"
+    assert 'error' in results[2]
+    assert 'error' in results[3]
+    assert found_user["email"] == "batch1@test.com"
+
+def test_user_batch_add_existing_user():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123BATCHEXISTS",
+        "email": "batchexists@test.com",
+        "username": "existing tester",
+    }
+    added = json.loads(user.handler(event_add, {})['body'])
+
+    event_batch_add = {
+        "action": "batch_add",
+        "orgId": "ORG-123",
+        "users": [
+            {"userId": "USER-123BATCHEXISTS", "email": "batchexists2@test.com", "username": "overwrite tester"},
+        ],
+    }
+    results = json.loads(user.handler(event_batch_add, {})['body'])
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123BATCHEXISTS",
+        "consistent": True,
+    }
+    found_user = json.loads(user.handler(event_find, {})['body'])
+    # the new email was not claimed, so another user can still take it
+    event_add_other = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123BATCHOTHER",
+        "email": "batchexists2@test.com",
+        "username": "other tester",
+    }
+    other = json.loads(user.handler(event_add_other, {})['body'])
+
+    for userId in ("USER-123BATCHEXISTS", "USER-123BATCHOTHER"):
+        user.handler({"action": "force_destroy", "orgId": "ORG-123", "userId": userId}, {})
+
+    assert results[0]["code"] == "ALREADY_EXISTS"
+    assert "userId" in results[0]["error"]
+    assert found_user["email"] == "batchexists@test.com"
+    assert found_user["createdAt"] == added["createdAt"]
+    assert other["userId"] == "USER-123BATCHOTHER"
+
+def test_user_batch_add_across_transactions():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123BATCHTAKEN",
+        "email": "batchtaken@test.com",
+        "username": "taken tester",
+    }
+    user.handler(event_add, {})
+
+    users = [
+        {"userId": f"USER-123BATCHMANY{i:02d}", "email": f"batchmany{i}@test.com", "username": "many tester"}
+        for i in range(60)
+    ]
+    # one in each transaction of 50 users
+    users[10]["email"] = "batchtaken@test.com"
+    users[55]["userId"] = "USER-123BATCHTAKEN"
+    event_batch_add = {
+        "action": "batch_add",
+        "orgId": "ORG-123",
+        "users": users,
+    }
+    results = json.loads(user.handler(event_batch_add, {})['body'])
+
+    # every added user claimed its email
+    event_add_again = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123BATCHAGAIN",
+        "email": "batchmany0@test.com",
+        "username": "again tester",
+    }
+    again = json.loads(user.handler(event_add_again, {})['body'])
+    event_find_by_email = {
+        "action": "find_by_email",
+        "email": "batchmany10@test.com",
+        "consistent": True,
+    }
+    unclaimed = json.loads(user.handler(event_find_by_email, {})['body'])
+
+    for r in results + [{"userId": "USER-123BATCHTAKEN"}]:
+        if "userId" in r:
+            user.handler({"action": "force_destroy", "orgId": "ORG-123", "userId": r["userId"]}, {})
+
+    assert results[10]["code"] == "ALREADY_EXISTS"
+    assert "email" in results[10]["error"]
+    assert results[55]["code"] == "ALREADY_EXISTS"
+    assert "userId" in results[55]["error"]
+    assert sum("error" not in r for r in results) == 58
+    assert again["code"] == "ALREADY_EXISTS"
+    assert unclaimed == {}
+
+def test_user_find_many():
+    userIds = ["USER-123MANY1", "USER-123MANY2"]
+    for userId in userIds:
+        event_add = {
+            "action": "add",
+            "orgId": "ORG-123",
+            "userId": userId,
+            "email": f"{userId.lower()}@test.com",
+            "username": "find many tester",
+        }
+        user.handler(event_add, {})
+
+    event_find_many = {
+        "action": "find_many",
+        "orgId": "ORG-123",
+        "userIds": ["USER-123MANY2", "USER-123MISSING", "USER-123MANY1"],
+    }
+    response = user.handler(event_find_many, {})
+
+    for userId in userIds:
+        event_destroy = {
+            "action": "force_destroy",
+            "orgId": "ORG-123",
+            "userId": userId,
+        }
+        user.handler(event_destroy, {})
+
+    found_users = json.loads(response['body'])
+    assert [u["userId"] for u in found_users] == ["USER-123MANY2", "USER-123MANY1"]
+    assert isinstance(found_users[0]["createdAt"], int)
+
+def test_user_email_unique():
+    event_add1 = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123UNIQUE1",
+        "email": "unique1@test.com",
+        "username": "unique1 tester",
+    }
+    event_add2 = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123UNIQUE2",
+        "email": "unique2@test.com",
+        "username": "unique2 tester",
+    }
+    user.handler(event_add1, {})
+    user.handler(event_add2, {})
+
+    # email claimed by another user
+    response_add = user.handler({**event_add1, "userId": "USER-123UNIQUE3"}, {})
+    response_update = user.handler({**event_add2, "action": "update", "email": "unique1@test.com"}, {})
+
+    # email released by an update can be claimed again
+    user.handler({**event_add2, "action": "update", "email": "unique2b@test.com"}, {})
+    response_reuse = user.handler({**event_add2, "userId": "USER-123UNIQUE3"}, {})
+
+    for userId in ["USER-123UNIQUE1", "USER-123UNIQUE2", "USER-123UNIQUE3"]:
+        event_destroy = {
+            "action": "force_destroy",
+            "orgId": "ORG-123",
+            "userId": userId,
+        }
+        user.handler(event_destroy, {})
+
+    assert response_add['statusCode'] == 400
+    assert response_update['statusCode'] == 400
+    assert response_reuse['statusCode'] == 200
+
+def test_user_create_existing_id():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123EXISTS",
+        "email": "exists@test.com",
+        "username": "exists tester",
+    }
+    user.handler(event_add, {})
+    response = user.handler({**event_add, "email": "exists2@test.com"}, {})
+
+    event_destroy = {
+        "action": "force_destroy",
+        "orgId": "ORG-123",
+        "userId": "USER-123EXISTS",
+    }
+    user.handler(event_destroy, {})
+
+    error = json.loads(response['body'])
+    assert response['statusCode'] == 400
+    assert error["code"] == "ALREADY_EXISTS"
+
+def test_user_delete_missing():
+    event_delete = {
+        "action": "delete",
+        "orgId": "ORG-123",
+        "userId": "USER-123MISSING",
+    }
+    response = user.handler(event_delete, {})
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123MISSING",
+    }
+    found_user = json.loads(user.handler(event_find, {})['body'])
+
+    error = json.loads(response['body'])
+    assert response['statusCode'] == 400
+    assert error["code"] == "NOT_FOUND"
+    assert found_user == {}
+
+def test_user_find_fields():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123FIELDS",
+        "email": "fields@test.com",
+        "username": "fields tester",
+    }
+    user.handler(event_add, {})
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123FIELDS",
+        "fields": ["userId", "email"],
+    }
+    response = user.handler(event_find, {})
+
+    event_find_all = {
+        "action": "find_all",
+        "orgId": "ORG-123",
+        "fields": "userId",
+    }
+    response_all = user.handler(event_find_all, {})
+
+    event_destroy = {
+        "action": "force_destroy",
+        "orgId": "ORG-123",
+        "userId": "USER-123FIELDS",
+    }
+    user.handler(event_destroy, {})
+
+    found_user = json.loads(response['body'])
+    assert found_user == {"userId": event_add["userId"], "email": event_add["email"]}
+
+    found_users = json.loads(response_all['body'])
+    assert {"userId": event_add["userId"]} in found_users
+
+def test_user_find_native_ints():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123CODEC",
+        "email": "codec@test.com",
+        "username": "codec tester",
+    }
+    user.handler(event_add, {})
+
+    event_delete = {
+        "action": "delete",
+        "orgId": "ORG-123",
+        "userId": "USER-123CODEC",
+    }
+    user.handler(event_delete, {})
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123CODEC",
+    }
+    response = user.handler(event_find, {})
+
+    event_destroy = {
+        "action": "force_destroy",
+        "orgId": "ORG-123",
+        "userId": "USER-123CODEC",
+    }
+    user.handler(event_destroy, {})
+
+    found_user = json.loads(response['body'])
+    assert isinstance(found_user["createdAt"], int)
+    assert isinstance(found_user["deletedAt"], int)
+
+def test_user_json_body():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123JSON",
+        "email": "o'json@test.com",
+        "username": "O'Json \"tester\"",
+    }
+    response = user.handler(event_add, {})
+
+    event_destroy = {
+        "action": "force_destroy",
+        "orgId": "ORG-123",
+        "userId": "USER-123JSON",
+    }
+    user.handler(event_destroy, {})
+
+    new_user = json.loads(response['body'])
+    assert response['headers']['Content-Type'] == 'application/json'
+    assert new_user["username"] == event_add["username"]
+    assert isinstance(new_user["createdAt"], int)
+
+def test_user_find_cached():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123CACHE",
+        "email": "cache@test.com",
+        "username": "cache tester",
+    }
+    user.handler(event_add, {})
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123CACHE",
+    }
+    stats_before = json.loads(user.handler({"action": "cache_stats"}, {})['body'])
+    user.handler(event_find, {})
+    user.handler({**event_find, "consistent": True}, {})
+    stats_after = json.loads(user.handler({"action": "cache_stats"}, {})['body'])
+
+    event_update = {**event_add, "action": "update", "username": "cache tester 2"}
+    user.handler(event_update, {})
+    found_user = json.loads(user.handler(event_find, {})['body'])
+
+    event_destroy = {
+        "action": "force_destroy",
+        "orgId": "ORG-123",
+        "userId": "USER-123CACHE",
+    }
+    user.handler(event_destroy, {})
+    destroyed_user = json.loads(user.handler(event_find, {})['body'])
+
+    assert stats_after["users"]["hits"] == stats_before["users"]["hits"] + 1
+    assert found_user["username"] == "cache tester 2"
+    assert destroyed_user == {}
+
+def test_user_batch():
+    userIds = ["USER-123BATCH1", "USER-123BATCH2"]
+    for userId in userIds:
+        event_add = {
+            "action": "add",
+            "orgId": "ORG-123",
+            "userId": userId,
+            "email": f"{userId.lower()}@test.com",
+            "username": "batch tester",
+        }
+        user.handler(event_add, {})
+
+    event_batch = {
+        "action": "batch",
+        "orgId": "ORG-123",
+        "operations": [
+            {"action": "find", "userId": "USER-123BATCH1"},
+            {"action": "find", "userId": "USER-123BATCH2", "fields": "email"},
+            {"action": "update", "userId": "USER-123BATCH1", "email": "user-123batch1@test.com", "username": "updated"},
+            {"action": "find", "userId": "USER-123BATCH1", "consistent": True},
+            {"action": "find", "userId": "USER-123MISSING"},
+            {"action": "restore", "userId": "USER-123MISSING"},
+        ],
+    }
+    response = user.handler(event_batch, {})
+
+    for userId in userIds:
+        event_destroy = {
+            "action": "force_destroy",
+            "orgId": "ORG-123",
+            "userId": userId,
+        }
+        user.handler(event_destroy, {})
+
+    assert response['statusCode'] == 200
+    results = json.loads(response['body'])['results']
+    assert results[0]["username"] == "batch tester"
+    assert results[1] == {"email": "user-123batch2@test.com"}
+    assert results[2]["username"] == "updated"
+    assert results[3]["username"] == "updated"
+    assert results[4] == {}
+    assert "error" in results[5]
+
+def test_user_batch_invalid():
+    event_batch = {
+        "action": "batch",
+        "orgId": "ORG-123",
+        "operations": [
+            {"action": "find", "userId": "USER-123"},
+            {"action": "find", "userId": "BAD-123"},
+        ],
+    }
+    with pytest.raises(Exception, match=r"\[1\] Error: userId is not valid"):
+        user.handler(event_batch, {})
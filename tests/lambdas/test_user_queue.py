@@ -0,0 +1,67 @@
+from dotenv import load_dotenv
+import json
+import lambdas.user as user
+import lambdas.user_queue as user_queue
+
+load_dotenv()
+
+def _record(messageId, body):
+    return {
+        "messageId": messageId,
+        "receiptHandle": f"receipt-{messageId}",
+        "body": json.dumps(body),
+        "eventSource": "aws:sqs",
+    }
+
+def test_user_queue():
+    event_add = {
+        "action": "add",
+        "orgId": "ORG-123",
+        "userId": "USER-123QUEUE",
+        "email": "queue@test.com",
+        "username": "queue tester",
+    }
+    user.handler(event_add, {})
+
+    event_sqs = {
+        "Records": [
+            _record("1", {"action": "update", "orgId": "ORG-123", "userId": "USER-123QUEUE", "email": "queue@test.com", "username": "first"}),
+            _record("2", {"action": "update", "orgId": "ORG-123", "userId": "USER-123QUEUE", "email": "queue@test.com", "username": "second"}),
+            _record("3", {"action": "find", "orgId": "ORG-123", "userId": "BAD-123"}),
+            _record("4", {"action": "delete", "orgId": "ORG-123", "userId": "USER-123MISSING"}),
+        ],
+    }
+    response = user_queue.handler(event_sqs, {})
+
+    event_find = {
+        "action": "find",
+        "orgId": "ORG-123",
+        "userId": "USER-123QUEUE",
+        "consistent": True,
+    }
+    found_user = json.loads(user.handler(event_find, {})['body'])
+
+    event_destroy = {
+        "action": "force_destroy",
+        "orgId": "ORG-123",
+        "userId": "USER-123QUEUE",
+    }
+    user.handler(event_destroy, {})
+
+    # only the invalid message is retried; a missing user cannot be fixed by a retry
+    assert response == {"batchItemFailures": [{"itemIdentifier": "3"}]}
+    assert found_user["username"] == "second"
+
+def test_user_queue_collapse():
+    events = [
+        ("1", {"action": "update", "orgId": "ORG-1", "userId": "USER-1", "username": "a"}),
+        ("2", {"action": "update", "orgId": "ORG-1", "userId": "USER-2", "username": "b"}),
+        ("3", {"action": "update", "orgId": "ORG-1", "userId": "USER-1", "email": "c@test.com"}),
+        ("4", {"action": "delete", "orgId": "ORG-1", "userId": "USER-2"}),
+        ("5", {"action": "delete", "orgId": "ORG-1", "userId": "USER-2"}),
+        ("6", {"action": "update", "orgId": "ORG-1", "userId": "USER-2", "username": "d"}),
+    ]
+    operations, messageIds = user_queue.collapse(events)
+
+    assert messageIds == [["1", "3"], ["2"], ["4", "5"], ["6"]]
+    assert operations[0] == {"action": "update", "orgId": "ORG-1", "userId": "USER-1", "username": "a", "email": "c@test.com"}
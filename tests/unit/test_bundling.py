@@ -0,0 +1,17 @@
+import os
+
+from stacks.bundling import CompiledPythonBundling, _remove_excludes
+
+def test_local_bundling_leaves_out_workstation_tools(tmp_path):
+    assert CompiledPythonBundling('./lambdas').try_bundle(str(tmp_path), image=None)
+
+    assert os.path.exists(tmp_path / 'user.py')
+    for path in ('refactor_db/importer.py', 'refactor_db/exporter.py', 'refactor_db/backfill.py', 'refactor_db/aio', 'refactor_db/memory.py'):
+        assert not os.path.exists(tmp_path / path)
+
+def test_docker_bundling_removes_the_same_excludes():
+    command = ' && '.join(_remove_excludes())
+
+    assert 'refactor_db/backfill.py' in command
+    assert 'refactor_db/aio' in command
+    assert 'find . -name __pycache__ -prune -exec rm -rf {} +' in command
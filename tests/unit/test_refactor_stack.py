@@ -3,13 +3,63 @@ import aws_cdk.assertions as assertions
 
 from stacks.refactor import RefactorStack
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in refactor/refactor_stack.py
 def test_sqs_queue_created():
     app = core.App()
     stack = RefactorStack(app, "refactor")
     template = assertions.Template.from_stack(stack)
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+    template.resource_count_is("AWS::SQS::Queue", 2)
+    template.has_resource_properties("AWS::SQS::Queue", {
+        "VisibilityTimeout": 360,
+        "RedrivePolicy": {
+            "maxReceiveCount": 5,
+        },
+    })
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 10,
+        "FunctionResponseTypes": ["ReportBatchItemFailures"],
+    })
+
+def test_sqs_batching_from_context():
+    app = core.App(context={
+        "userQueueBatchSize": 100,
+        "userQueueBatchingWindow": 5,
+    })
+    stack = RefactorStack(app, "refactor")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 100,
+        "MaximumBatchingWindowInSeconds": 5,
+    })
+
+def test_sharded_item_type_index():
+    app = core.App(context={"itemTypeShards": 32})
+    stack = RefactorStack(app, "refactor")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "IndexName": "itemTypeShardIndex",
+                "KeySchema": [
+                    {"AttributeName": "itemTypeShard", "KeyType": "HASH"},
+                    {"AttributeName": "id", "KeyType": "RANGE"},
+                ],
+            }),
+        ]),
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "user.handler",
+        "Environment": {"Variables": assertions.Match.object_like({"DDB_ITEM_TYPE_SHARDS": "32", "DDB_SHARDED_READS": "0"})},
+    })
+
+def test_sharded_reads_opt_in():
+    app = core.App(context={"shardedReads": "true"})
+    stack = RefactorStack(app, "refactor")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "user.handler",
+        "Environment": {"Variables": assertions.Match.object_like({"DDB_SHARDED_READS": "1"})},
+    })